@@ -0,0 +1,94 @@
+"""So sánh thời gian trích xuất mỗi ASIN: find_element từng trường (DOM), page_source + HtmlExtractor (HTML)
+và một lần execute_script (JS)
+
+Ví dụ:
+    python benchmark_extraction.py --pages saved_pages/          # các file <ASIN>.html đã lưu
+    python benchmark_extraction.py --asins B0XXXXXXX1 B0XXXXXXX2  # tải trực tiếp từ Amazon
+"""
+import time
+import argparse
+import logging
+import statistics
+from pathlib import Path
+
+from config import CONFIG
+from script_loader import load_script
+
+
+class RoundTripCounter:
+    """Đếm số lệnh WebDriver gửi tới chromedriver (mọi find_element/get_attribute đều qua driver.execute)"""
+
+    def __init__(self, driver):
+        self.count = 0
+        self._execute = driver.execute
+
+        def counting_execute(*args, **kwargs):
+            self.count += 1
+            return self._execute(*args, **kwargs)
+
+        driver.execute = counting_execute
+
+    def reset(self):
+        self.count = 0
+
+
+def run_benchmark(targets, repeat=3):
+    csv3 = load_script("get file csv3.py", "get_file_csv3")
+    # Bỏ các sleep cố ý trong get_price/get_images để chỉ đo thời gian trích xuất
+    csv3.time.sleep = lambda seconds: None
+
+    logger = logging.getLogger("benchmark")
+    scraper = csv3.AmazonScraper(logger=logger)
+    counter = RoundTripCounter(scraper.driver)
+    results = []
+
+    try:
+        for asin, url in targets:
+            scraper.driver.get(url)
+            row = {"asin": asin}
+            modes = (("dom", scraper.extract_fields_dom), ("html", scraper.extract_fields),
+                     ("js", scraper.extract_fields_js))
+            for mode, extract in modes:
+                timings = []
+                for _ in range(repeat):
+                    counter.reset()
+                    start = time.perf_counter()
+                    fields = extract(asin)
+                    timings.append(time.perf_counter() - start)
+                row[f"{mode}_seconds"] = statistics.median(timings)
+                row[f"{mode}_round_trips"] = counter.count
+                row[f"{mode}_title"] = bool(fields.get("title"))
+            results.append(row)
+            print(f"{asin}: " + " | ".join(
+                f"{mode.upper()} {row[f'{mode}_seconds'] * 1000:8.1f} ms ({row[f'{mode}_round_trips']} lệnh)"
+                for mode, _ in modes))
+    finally:
+        scraper.driver.quit()
+
+    if results:
+        dom_mean = statistics.mean(r["dom_seconds"] for r in results)
+        for mode in ("html", "js"):
+            mode_mean = statistics.mean(r[f"{mode}_seconds"] for r in results)
+            print(f"Trung bình mỗi ASIN: DOM {dom_mean * 1000:.1f} ms, {mode.upper()} {mode_mean * 1000:.1f} ms "
+                  f"(nhanh hơn {dom_mean / mode_mean:.1f} lần)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark trích xuất DOM và HTML cho mỗi ASIN')
+    parser.add_argument('--pages', help='Thư mục chứa các trang đã lưu dạng <ASIN>.html')
+    parser.add_argument('--asins', nargs='*', default=[], help='Danh sách ASIN tải trực tiếp')
+    parser.add_argument('--repeat', type=int, default=3, help='Số lần đo mỗi chế độ (lấy trung vị)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    targets = [(asin, f"{CONFIG.BASE_URL}{asin}") for asin in args.asins]
+    if args.pages:
+        for page in sorted(Path(args.pages).glob("*.html")):
+            targets.append((page.stem, page.resolve().as_uri()))
+
+    if not targets:
+        parser.error("Cần --pages hoặc --asins")
+
+    run_benchmark(targets, args.repeat)
@@ -0,0 +1,137 @@
+"""Đo khả năng mở rộng khi chia ASIN cho 1..N tiến trình (process_pool.iter_sharded_results)
+
+Mỗi ASIN giả được gán một trang đã lưu trong --pages; worker parse trang đó (đọc file hoặc mở bằng
+Chrome với --browser) nên phép đo không phụ thuộc mạng. --latency giả lập thời gian chờ tải trang.
+Kết quả của mọi số tiến trình được so với lần chạy 1 tiến trình để kiểm tra việc gộp là tất định.
+
+Ví dụ:
+    python benchmark_processes.py --pages saved_pages/ --rows 2000 --max-processes 8
+    python benchmark_processes.py --pages saved_pages/ --rows 200 --browser --browsers 2
+"""
+import os
+import re
+import csv
+import time
+import argparse
+import logging
+import tempfile
+import functools
+from pathlib import Path
+
+import unidecode
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from browser_profile import apply_resource_policy, block_resources
+from html_extractor import extract_product
+from input_reader import InputReader
+from process_pool import iter_sharded_results
+
+
+def slugify(text):
+    text = unidecode.unidecode(text)
+    text = re.sub(r"[^\w\s-]", '', text).strip().lower()
+    return re.sub(r"[-\s]+", '-', text)
+
+
+class SavedPageWorker:
+    """Worker thay cho trình duyệt thật: ASIN B<số> dùng trang thứ (số % số trang) trong thư mục pages"""
+
+    def __init__(self, pages, use_browser=False, latency=0.0, logger=None):
+        self.pages = sorted(Path(pages).glob("*.html"))
+        self.latency = latency
+        self.logger = logger or logging.getLogger(__name__)
+        self.sources = {}
+        self.driver = None
+        if use_browser:
+            chrome_options = Options()
+            chrome_options.add_argument("--headless")
+            apply_resource_policy(chrome_options)
+            self.driver = block_resources(webdriver.Chrome(options=chrome_options))
+
+    def page_source(self, page):
+        if self.driver is not None:
+            self.driver.get(page.resolve().as_uri())
+            return self.driver.page_source
+        if page not in self.sources:
+            self.sources[page] = page.read_text(encoding='utf-8')
+        return self.sources[page]
+
+    def scrape(self, asin):
+        if self.latency:
+            time.sleep(self.latency)
+        page = self.pages[int(asin[1:]) % len(self.pages)]
+        fields = extract_product(self.page_source(page), asin)
+        return {
+            "Handle": slugify(fields["title"]) + "-" + asin[-4:],
+            "Title": fields["title"],
+            "Body (HTML)": fields["feature_text"],
+            "Variant Price": fields["price"],
+            "Image Src": ",".join(fields["images"]),
+        }
+
+    def close(self):
+        if self.driver is not None:
+            self.driver.quit()
+
+
+def quiet_logger(name):
+    """Logger của tiến trình con: chỉ in cảnh báo để không lẫn vào bảng kết quả"""
+    logging.basicConfig(level=logging.WARNING, format=f'%(asctime)s - {name} - %(levelname)s - %(message)s')
+    return logging.getLogger(name)
+
+
+def write_input(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Variant SKU"])
+        for index in range(rows):
+            writer.writerow([f"B{index:09d}"])
+
+
+def run_benchmark(pages, rows, max_processes, browsers=1, use_browser=False, latency=0.0):
+    logger = logging.getLogger("benchmark")
+    create_worker = functools.partial(SavedPageWorker, pages, use_browser, latency)
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, "input.csv")
+        write_input(input_path, rows)
+
+        timings = {}
+        baseline = None
+        for processes in range(1, max_processes + 1):
+            start = time.perf_counter()
+            results = [result for _, _, result in iter_sharded_results(
+                [InputReader(input_path)], [input_path], create_worker, processes, browsers, logger,
+                directory=os.path.join(directory, f"p{processes}"), get_asin=lambda item: item[2],
+                setup_logger=quiet_logger
+            )]
+            timings[processes] = time.perf_counter() - start
+            if baseline is None:
+                baseline = results
+            elif results != baseline:
+                print(f"CẢNH BÁO: kết quả với {processes} tiến trình khác với 1 tiến trình")
+
+    print(f"{rows} ASIN, {browsers} worker mỗi tiến trình, {len(list(Path(pages).glob('*.html')))} trang mẫu")
+    print(f"{'tiến trình':>10} {'giây':>8} {'ASIN/giây':>10} {'tăng tốc':>9} {'hiệu suất':>10}")
+    for processes, seconds in timings.items():
+        speedup = timings[1] / seconds
+        print(f"{processes:>10} {seconds:>8.2f} {rows / seconds:>10.1f} {speedup:>8.2f}x {speedup / processes:>10.0%}")
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark chạy nhiều tiến trình: thời gian theo số tiến trình')
+    parser.add_argument('--pages', required=True, help='Thư mục chứa các trang đã lưu dạng <ASIN>.html')
+    parser.add_argument('--rows', type=int, default=1000, help='Số ASIN giả trong input')
+    parser.add_argument('--max-processes', type=int, default=os.cpu_count() or 1, help='Đo từ 1 tới N tiến trình')
+    parser.add_argument('--browsers', type=int, default=1, help='Số worker (trình duyệt) mỗi tiến trình')
+    parser.add_argument('--browser', action='store_true', help='Mở trang bằng Chrome thay vì đọc file')
+    parser.add_argument('--latency', type=float, default=0.0, help='Giây chờ giả lập mỗi trang')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if not list(Path(args.pages).glob("*.html")):
+        parser.error(f"Không có file .html trong {args.pages}")
+
+    run_benchmark(args.pages, args.rows, args.max_processes, args.browsers, args.browser, args.latency)
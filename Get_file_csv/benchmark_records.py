@@ -0,0 +1,126 @@
+"""So sánh bộ nhớ và thời gian tạo dòng output: template_row.copy() (pandas Series) + DataFrame.to_csv
+so với TemplateSchema/VariantRecord + csv.writer
+
+Ví dụ:
+    python benchmark_records.py --rows 20000
+    python benchmark_records.py --template products_export.csv --rows 50000
+"""
+import io
+import csv
+import time
+import argparse
+import tracemalloc
+
+import pandas as pd
+
+from records import TemplateSchema
+
+# Cột của file export Shopify, dùng khi không truyền --template
+SHOPIFY_COLUMNS = [
+    "Handle", "Title", "Body (HTML)", "Vendor", "Product Category", "Type", "Tags", "Published",
+    "Option1 Name", "Option1 Value", "Option2 Name", "Option2 Value", "Option3 Name", "Option3 Value",
+    "Variant SKU", "Variant Grams", "Variant Inventory Tracker", "Variant Inventory Qty",
+    "Variant Inventory Policy", "Variant Fulfillment Service", "Variant Price", "Variant Compare At Price",
+    "Variant Requires Shipping", "Variant Taxable", "Variant Barcode", "Image Src", "Image Position",
+    "Image Alt Text", "Gift Card", "SEO Title", "SEO Description", "Variant Image", "Variant Weight Unit",
+    "Variant Tax Code", "Cost per item", "Status",
+]
+
+FIELDS_FROM_AMZ = [
+    "Handle", "Title", "Body (HTML)", "Tags",
+    "Variant Grams", "Variant Price", "Variant Barcode"
+]
+
+
+def default_template():
+    row = {column: "" for column in SHOPIFY_COLUMNS}
+    row.update({"Published": "TRUE", "Option1 Name": "Title", "Option1 Value": "Default Title",
+                "Variant Grams": 0.0, "Variant Inventory Policy": "deny", "Variant Fulfillment Service": "manual",
+                "Variant Requires Shipping": "TRUE", "Variant Taxable": "TRUE", "Gift Card": "FALSE",
+                "Variant Weight Unit": "kg", "Status": "active"})
+    return pd.DataFrame([row], columns=SHOPIFY_COLUMNS)
+
+
+def fake_results(count):
+    """Kết quả scrape giả lập: (dòng input, amz_info)"""
+    results = []
+    for n in range(count):
+        asin = f"B0{n:08d}"
+        amz_info = {
+            "Handle": f"product-{n // 3}",
+            "Title": f"Sample product {n} with a reasonably long Amazon title",
+            "Body (HTML)": "<ul>" + "".join(f"<li>Feature {k} of product {n}</li>" for k in range(5)) + "</ul>",
+            "Tags": "Brand",
+            "Variant Grams": 0,
+            "Variant Price": f"{10 + n % 90}.99",
+            "Variant Barcode": asin,
+        }
+        results.append(({"Variant SKU": asin, "Vendor": "Amazon"}, amz_info))
+    return results
+
+
+def series_rows(sample_df, results):
+    """Cách cũ: mỗi dòng một bản copy Series, cuối cùng dựng DataFrame và to_csv"""
+    template_row = sample_df.iloc[0].copy()
+    rows = []
+    for row, amz_info in results:
+        new_row = template_row.copy()
+        new_row["Variant SKU"] = row["Variant SKU"]
+        new_row["Vendor"] = row.get("Vendor", "Amazon")
+        for field in FIELDS_FROM_AMZ:
+            new_row[field] = amz_info.get(field, new_row.get(field, ""))
+        rows.append(new_row)
+    output = io.StringIO()
+    pd.DataFrame(rows, columns=list(sample_df.columns)).to_csv(output, index=False)
+    return output.getvalue()
+
+
+def record_rows(sample_df, results):
+    """Cách mới: schema biên dịch một lần, mỗi dòng là một list giá trị đã định dạng"""
+    schema = TemplateSchema(sample_df.columns, sample_df.iloc[0], FIELDS_FROM_AMZ)
+    records = []
+    for row, amz_info in results:
+        record = schema.new_variant()
+        record["Variant SKU"] = row["Variant SKU"]
+        record["Vendor"] = row.get("Vendor", "Amazon")
+        schema.apply_amazon(record, amz_info)
+        records.append(record)
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(schema.columns)
+    writer.writerows(record.as_row() for record in records)
+    return output.getvalue()
+
+
+def measure(build, sample_df, results):
+    tracemalloc.start()
+    start = time.perf_counter()
+    text = build(sample_df, results)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, text
+
+
+def run_benchmark(sample_df, count):
+    results = fake_results(count)
+    series_time, series_peak, series_text = measure(series_rows, sample_df, results)
+    record_time, record_peak, record_text = measure(record_rows, sample_df, results)
+
+    same = list(csv.reader(io.StringIO(series_text))) == list(csv.reader(io.StringIO(record_text)))
+    print(f"{count} dòng, {len(sample_df.columns)} cột (output giống nhau: {'có' if same else 'KHÔNG'})")
+    print(f"  Series : {series_time * 1000:9.1f} ms, đỉnh bộ nhớ {series_peak / 1024 / 1024:7.1f} MB")
+    print(f"  Record : {record_time * 1000:9.1f} ms, đỉnh bộ nhớ {record_peak / 1024 / 1024:7.1f} MB")
+    print(f"  Nhanh hơn {series_time / record_time:.1f} lần, bộ nhớ giảm {series_peak / record_peak:.1f} lần")
+    return {"rows": count, "series_seconds": series_time, "series_peak_bytes": series_peak,
+            "record_seconds": record_time, "record_peak_bytes": record_peak, "same_output": same}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark tạo dòng output: pandas Series và VariantRecord')
+    parser.add_argument('--template', help='File CSV template Shopify (mặc định dùng bộ cột chuẩn)')
+    parser.add_argument('--rows', type=int, default=20000, help='Số dòng giả lập')
+    args = parser.parse_args()
+
+    sample_df = pd.read_csv(args.template) if args.template else default_template()
+    run_benchmark(sample_df, args.rows)
@@ -0,0 +1,105 @@
+"""So sánh số byte tải về và thời gian tải trang khi bật / tắt chặn tài nguyên (browser_profile)
+
+Ví dụ:
+    python benchmark_resources.py --asins B0XXXXXXX1 B0XXXXXXX2
+    python benchmark_resources.py --pages saved_pages/ --repeat 5
+"""
+import json
+import time
+import argparse
+import logging
+import statistics
+from pathlib import Path
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from config import CONFIG
+from browser_profile import apply_resource_policy, block_resources
+from readiness import PageReadiness
+
+
+def create_driver(blocking):
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    if blocking:
+        apply_resource_policy(chrome_options, enabled=True)
+    else:
+        chrome_options.page_load_strategy = "normal"
+    driver = webdriver.Chrome(options=chrome_options)
+    # Không dùng cache của trình duyệt để mỗi lần đo đều tải lại toàn bộ
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": True})
+    block_resources(driver, enabled=blocking)
+    return driver
+
+
+def transferred(driver):
+    """Tổng byte đã tải (Network.loadingFinished trong performance log) và số request kể từ lần gọi trước"""
+    total = 0
+    requests = 0
+    for entry in driver.get_log('performance'):
+        message = json.loads(entry['message'])['message']
+        if message['method'] == 'Network.loadingFinished':
+            total += message['params'].get('encodedDataLength', 0)
+            requests += 1
+    return total, requests
+
+
+def measure(driver, url):
+    transferred(driver)  # bỏ log của lần trước
+    start = time.perf_counter()
+    driver.get(url)
+    PageReadiness(driver).wait(("title", "price", "images"))
+    elapsed = time.perf_counter() - start
+    total, requests = transferred(driver)
+    return elapsed, total, requests
+
+
+def run_benchmark(targets, repeat=3):
+    results = {}
+    for mode, blocking in (("off", False), ("on", True)):
+        driver = create_driver(blocking)
+        try:
+            for asin, url in targets:
+                samples = [measure(driver, url) for _ in range(repeat)]
+                results[(mode, asin)] = {
+                    "seconds": statistics.median(s[0] for s in samples),
+                    "bytes": statistics.median(s[1] for s in samples),
+                    "requests": statistics.median(s[2] for s in samples),
+                }
+        finally:
+            driver.quit()
+
+    for asin, _ in targets:
+        off, on = results[("off", asin)], results[("on", asin)]
+        print(f"{asin}: tắt chặn {off['seconds'] * 1000:7.0f} ms, {off['bytes'] / 1024:8.0f} KB, {off['requests']:4.0f} request | "
+              f"bật chặn {on['seconds'] * 1000:7.0f} ms, {on['bytes'] / 1024:8.0f} KB, {on['requests']:4.0f} request")
+
+    for key, label in (("seconds", "thời gian"), ("bytes", "dung lượng")):
+        off_total = sum(results[("off", asin)][key] for asin, _ in targets)
+        on_total = sum(results[("on", asin)][key] for asin, _ in targets)
+        if on_total:
+            print(f"Tổng {label}: giảm {(1 - on_total / off_total):.0%} ({off_total / on_total:.1f} lần)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark chặn tài nguyên trình duyệt: byte tải về và thời gian tải trang')
+    parser.add_argument('--pages', help='Thư mục chứa các trang đã lưu dạng <ASIN>.html')
+    parser.add_argument('--asins', nargs='*', default=[], help='Danh sách ASIN tải trực tiếp')
+    parser.add_argument('--repeat', type=int, default=3, help='Số lần đo mỗi chế độ (lấy trung vị)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    targets = [(asin, f"{CONFIG.BASE_URL}{asin}") for asin in args.asins]
+    if args.pages:
+        for page in sorted(Path(args.pages).glob("*.html")):
+            targets.append((page.stem, page.resolve().as_uri()))
+
+    if not targets:
+        parser.error("Cần --pages hoặc --asins")
+
+    run_benchmark(targets, args.repeat)
@@ -0,0 +1,337 @@
+"""Bộ benchmark offline: các trang sản phẩm đã lưu (benchmarks/pages) được phục vụ qua HTTP server cục bộ
+và chạy qua từng đường trích xuất, đo độ trễ mỗi ASIN (p50/p90/p99), số round trip tới driver/server
+và độ chính xác từng trường so với kết quả chuẩn (benchmarks/golden)
+
+Kết quả mỗi lần chạy được ghi nối vào benchmarks/results.jsonl và so với lần chạy trước để thấy hồi quy.
+
+Ví dụ:
+    python benchmark_suite.py                          # đường html + http, không cần Chrome
+    python benchmark_suite.py --browser --repeat 5     # thêm get_amazon_info (csv2, csv5), get_product_info (csv3)
+    python benchmark_suite.py --record-golden          # tạo golden cho trang mới (cần kiểm tra lại bằng tay)
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import logging
+import threading
+import statistics
+import subprocess
+from pathlib import Path
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from config import CONFIG
+from html_extractor import HtmlExtractor, extract_product
+from http_fetcher import HttpFetcher
+from page_cache import set_cache_mode
+from script_loader import load_script
+from benchmark_extraction import RoundTripCounter
+
+SUITE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+FIELDS = ("title", "price", "brand", "images", "description")
+
+
+class FixtureServer:
+    """HTTP server cục bộ trả <pages>/<ASIN>.html cho đường dẫn /dp/<ASIN>, 404 cho ASIN không có"""
+
+    def __init__(self, pages):
+        self.pages = Path(pages)
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                asin = self.path.rstrip('/').rsplit('/', 1)[-1].split('?')[0]
+                page = server.pages / f"{asin}.html"
+                if not self.path.startswith('/dp/') or not page.is_file():
+                    self.send_error(404)
+                    return
+                body = page.read_bytes()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_port}/dp/"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def image_ids(urls):
+    """Mã ảnh Amazon (phần sau /I/), để so ảnh mà không phụ thuộc hậu tố kích thước"""
+    ids = []
+    for url in urls:
+        match = re.search(r'/I/([^./_]+)', url or "")
+        key = match.group(1) if match else url
+        if key and key not in ids:
+            ids.append(key)
+    return ids
+
+
+def normalize(output):
+    """Đưa kết quả của mọi đường trích xuất (fields thô hoặc dict thông tin Shopify) về cùng dạng"""
+    if not output:
+        return {}
+    if "Title" in output:
+        normalized = {
+            "title": output["Title"],
+            "price": output.get("Variant Price", ""),
+            "images": image_ids(output["Image Src"].split(',') if output.get("Image Src") else []),
+            "description": bool(output.get("Body (HTML)")),
+        }
+        if "Brand" in output:
+            normalized["brand"] = output["Brand"]
+        return normalized
+    return {
+        "title": output.get("title", ""),
+        "price": output.get("price", ""),
+        "brand": output.get("brand", ""),
+        "images": image_ids(output.get("images", [])),
+        "description": bool(output.get("bullets") or output.get("feature_text") or output.get("detailed_description")),
+    }
+
+
+def wrong_fields(normalized, golden):
+    """Các trường khác golden; trường mà đường trích xuất không trả về thì không tính"""
+    if not normalized:
+        return [field for field in FIELDS if field in golden]
+    return [field for field in FIELDS if field in golden and field in normalized and normalized[field] != golden[field]]
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def offline_paths(pages, server):
+    """Các đường không cần trình duyệt: parse HTML đã lưu, tải qua HTTP (aiohttp) rồi parse"""
+    extractor = HtmlExtractor()
+    fetcher = HttpFetcher(base_url=server.base_url)
+
+    def html_path(asin):
+        return extract_product((Path(pages) / f"{asin}.html").read_text(encoding='utf-8'), asin), 0
+
+    def http_path(asin):
+        before = server.requests
+        page_source = fetcher.fetch([asin]).get(asin)
+        fields = extractor.extract(page_source, asin) if page_source else {}
+        return fields, server.requests - before
+
+    return {"html": (html_path, None), "http": (http_path, None)}
+
+
+def browser_paths(logger):
+    """get_amazon_info (csv2, csv5) và get_product_info (csv3, theo từng chế độ trích xuất) trên một Chrome"""
+    csv2 = load_script("get file csv2.py", "get_file_csv2")
+    csv3 = load_script("get file csv3.py", "get_file_csv3")
+    csv5 = load_script("get file csv5.py", "get_file_csv5")
+
+    owner = csv3.AmazonScraper(logger=logger)
+    driver = owner.driver
+    counter = RoundTripCounter(driver)
+    scrapers = {mode: csv3.AmazonScraper(driver=driver, logger=logger, extraction_mode=mode)
+                for mode in ("html", "js", "dom")}
+
+    def counted(call):
+        def run(asin):
+            counter.reset()
+            return call(asin), counter.count
+        return run
+
+    paths = {
+        # PageSession mới cho mỗi lần đo, nếu không trang đã tải được dùng lại
+        "csv2.get_amazon_info": counted(lambda asin: csv2.get_amazon_info(asin, driver, logger, csv2.PageSession(driver, logger))),
+        "csv5.get_amazon_info": counted(lambda asin: csv5.get_amazon_info(asin, driver, logger)),
+    }
+    for mode, scraper in scrapers.items():
+        paths[f"csv3.get_product_info[{mode}]"] = counted(scraper.get_product_info)
+    return {name: (run, owner.close) for name, run in paths.items()}
+
+
+def measure(paths, asins, golden, repeat):
+    report = {}
+    for name, (run, _) in paths.items():
+        samples = []
+        round_trips = []
+        per_asin = {}
+        correct = {field: 0 for field in FIELDS}
+        compared = {field: 0 for field in FIELDS}
+        for asin in asins:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                output, trips = run(asin)
+                timings.append(time.perf_counter() - start)
+            samples.extend(timings)
+            round_trips.append(trips)
+
+            normalized = normalize(output)
+            wrong = wrong_fields(normalized, golden.get(asin, {}))
+            for field in FIELDS:
+                if field in golden.get(asin, {}) and (field in normalized or not normalized):
+                    compared[field] += 1
+                    correct[field] += field not in wrong
+            per_asin[asin] = {"median_ms": statistics.median(timings) * 1000, "round_trips": trips, "wrong": wrong}
+
+        accuracy = {field: correct[field] / compared[field] for field in FIELDS if compared[field]}
+        report[name] = {
+            "p50_ms": percentile(samples, 50) * 1000,
+            "p90_ms": percentile(samples, 90) * 1000,
+            "p99_ms": percentile(samples, 99) * 1000,
+            "mean_ms": statistics.mean(samples) * 1000,
+            "round_trips": statistics.mean(round_trips),
+            "accuracy": accuracy,
+            "accuracy_overall": sum(correct.values()) / max(1, sum(compared.values())),
+            "per_asin": per_asin,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{'đường trích xuất':<30} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'round trip':>10} {'chính xác':>10}")
+    for name, row in report.items():
+        print(f"{name:<30} {row['p50_ms']:>8.1f} {row['p90_ms']:>8.1f} {row['p99_ms']:>8.1f} "
+              f"{row['round_trips']:>10.1f} {row['accuracy_overall']:>10.0%}")
+        misses = {asin: info["wrong"] for asin, info in row["per_asin"].items() if info["wrong"]}
+        for asin, wrong in misses.items():
+            print(f"{'':<4}{asin}: sai {', '.join(wrong)}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=SUITE_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(report, history, threshold):
+    """So với lần chạy gần nhất có cùng đường trích xuất, trả về danh sách hồi quy"""
+    regressions = []
+    for name, row in report.items():
+        previous = next((entry for entry in reversed(history) if name in entry["paths"]), None)
+        if previous is None:
+            continue
+        before = previous["paths"][name]
+        change = (row["p50_ms"] - before["p50_ms"]) / before["p50_ms"] if before["p50_ms"] else 0.0
+        line = (f"{name}: p50 {before['p50_ms']:.1f} -> {row['p50_ms']:.1f} ms ({change:+.0%}), "
+                f"round trip {before['round_trips']:.1f} -> {row['round_trips']:.1f}, "
+                f"chính xác {before['accuracy_overall']:.0%} -> {row['accuracy_overall']:.0%} "
+                f"(so với {previous.get('commit') or previous['timestamp']})")
+        if change > threshold or row["round_trips"] > before["round_trips"] \
+                or row["accuracy_overall"] < before["accuracy_overall"]:
+            regressions.append(line)
+            line = "HỒI QUY " + line
+        print(line)
+    return regressions
+
+
+def record_golden(pages, golden_dir):
+    """Tạo golden cho trang chưa có từ đường html; file mới cần được kiểm tra lại bằng tay"""
+    os.makedirs(golden_dir, exist_ok=True)
+    for page in sorted(Path(pages).glob("*.html")):
+        path = Path(golden_dir) / f"{page.stem}.json"
+        if path.exists():
+            continue
+        normalized = normalize(extract_product(page.read_text(encoding='utf-8'), page.stem))
+        path.write_text(json.dumps(normalized, ensure_ascii=False, indent=2) + "\n", encoding='utf-8')
+        print(f"Đã tạo {path}, hãy kiểm tra lại giá trị")
+
+
+def run_suite(pages, golden_dir, results_path, repeat=3, browser=False, label=None, threshold=0.1, store=True):
+    asins = sorted(page.stem for page in Path(pages).glob("*.html"))
+    golden = {asin: json.loads((Path(golden_dir) / f"{asin}.json").read_text(encoding='utf-8'))
+              for asin in asins if (Path(golden_dir) / f"{asin}.json").exists()}
+    missing = [asin for asin in asins if asin not in golden]
+    if missing:
+        print(f"Chưa có golden cho {', '.join(missing)} (chạy --record-golden), chỉ đo thời gian")
+
+    # Không dùng page cache và không giới hạn nhịp yêu cầu: mọi lần đo đều tải và trích xuất thật.
+    # Trang mẫu không được ghi vào thống kê selector hay kho sản phẩm của các lần chạy thật
+    set_cache_mode("bypass")
+    CONFIG.REQUESTS_PER_SECOND = 1000
+    CONFIG.SELECTOR_STATS_FILE = None
+    CONFIG.STORE_FILE = None
+    logger = logging.getLogger("benchmark")
+
+    with FixtureServer(pages) as server:
+        CONFIG.BASE_URL = server.base_url
+        paths = offline_paths(pages, server)
+        if browser:
+            paths.update(browser_paths(logger))
+        try:
+            report = measure(paths, asins, golden, repeat)
+        finally:
+            for close in dict.fromkeys(close for _, close in paths.values() if close):
+                close()
+
+    print(f"{len(asins)} trang, {repeat} lần đo mỗi ASIN")
+    print_report(report)
+
+    history = load_history(results_path)
+    regressions = compare(report, history, threshold)
+
+    if store:
+        entry = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "commit": git_commit(),
+            "label": label,
+            "repeat": repeat,
+            "asins": asins,
+            "paths": report,
+        }
+        with open(results_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        print(f"Đã lưu kết quả vào {results_path}")
+    return report, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark offline các đường trích xuất trên trang sản phẩm đã lưu')
+    parser.add_argument('--pages', default=os.path.join(SUITE_DIR, "pages"), help='Thư mục trang <ASIN>.html')
+    parser.add_argument('--golden', default=os.path.join(SUITE_DIR, "golden"), help='Thư mục kết quả chuẩn <ASIN>.json')
+    parser.add_argument('--results', default=os.path.join(SUITE_DIR, "results.jsonl"), help='File lịch sử kết quả')
+    parser.add_argument('--repeat', type=int, default=3, help='Số lần đo mỗi ASIN')
+    parser.add_argument('--browser', action='store_true', help='Đo cả các đường dùng Chrome (csv2, csv3, csv5)')
+    parser.add_argument('--label', help='Ghi chú cho lần chạy (vd. tên nhánh)')
+    parser.add_argument('--threshold', type=float, default=0.1, help='p50 chậm hơn tỉ lệ này thì coi là hồi quy')
+    parser.add_argument('--no-store', action='store_true', help='Không ghi kết quả vào lịch sử')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Thoát với mã 1 nếu có hồi quy')
+    parser.add_argument('--record-golden', action='store_true', help='Tạo golden cho các trang chưa có rồi thoát')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.record_golden:
+        record_golden(args.pages, args.golden)
+        sys.exit(0)
+
+    _, regressions = run_suite(args.pages, args.golden, args.results, args.repeat, args.browser,
+                               args.label, args.threshold, not args.no_store)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
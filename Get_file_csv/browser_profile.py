@@ -0,0 +1,36 @@
+import logging
+
+from config import CONFIG
+
+# Chrome prefs: 2 = chặn. Thuộc tính ảnh (src, data-old-hires, data-a-dynamic-image) vẫn có trong DOM
+BLOCKING_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.managed_default_content_settings.media_stream": 2,
+    "profile.managed_default_content_settings.notifications": 2,
+    "profile.managed_default_content_settings.plugins": 2,
+}
+
+
+def apply_resource_policy(chrome_options, enabled=None):
+    """Thêm chiến lược tải trang và prefs chặn tài nguyên vào Options trước khi tạo driver"""
+    enabled = CONFIG.BLOCK_RESOURCES if enabled is None else enabled
+    chrome_options.page_load_strategy = CONFIG.PAGE_LOAD_STRATEGY
+    if enabled:
+        chrome_options.add_experimental_option("prefs", BLOCKING_PREFS)
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    return chrome_options
+
+
+def block_resources(driver, enabled=None, patterns=None, logger=None):
+    """Chặn các URL theo CONFIG.BLOCKED_URL_PATTERNS qua CDP (CSS, font, video, quảng cáo, tracking)"""
+    enabled = CONFIG.BLOCK_RESOURCES if enabled is None else enabled
+    if not enabled:
+        return driver
+    logger = logger or logging.getLogger(__name__)
+    patterns = patterns if patterns is not None else CONFIG.BLOCKED_URL_PATTERNS
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+    except Exception as e:  # Driver không phải Chromium thì bỏ qua, chỉ còn prefs
+        logger.warning(f"Không bật được chặn URL qua CDP: {e}")
+    return driver
@@ -0,0 +1,92 @@
+import os
+import json
+import logging
+import threading
+
+from config import CONFIG
+
+
+class CheckpointJournal:
+    """Nhật ký chỉ ghi nối (JSON lines) các ASIN đã xử lý xong và thông tin đã lấy được
+
+    Mỗi dòng: {"asin": ..., "info": {...}}. Ghi flush ngay, fsync theo lô batch_size dòng.
+    Khi chạy lại với --resume, nhật ký được đọc lại để bỏ qua các ASIN đã xong.
+    """
+
+    def __init__(self, path=None, batch_size=None, resume=False, logger=None):
+        self.path = path or CONFIG.CHECKPOINT_FILE
+        self.batch_size = batch_size or CONFIG.CHECKPOINT_BATCH_SIZE
+        self.resume = resume
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._file = None
+        self._started = False
+        self._pending = 0
+
+    def load(self):
+        """Đọc lại nhật ký, trả về dict asin -> info (dòng cuối bị cắt dở do crash sẽ bị bỏ qua)"""
+        completed = {}
+        if not self.resume or not os.path.exists(self.path):
+            return completed
+        with open(self.path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    self.logger.warning(f"Bỏ qua dòng {line_number} hỏng trong {self.path}")
+                    continue
+                completed[entry["asin"]] = entry["info"]
+        self.logger.info(f"Resume: {len(completed)} ASIN đã xong trong {self.path}")
+        return completed
+
+    def _open(self):
+        if self._file is None:
+            # Lần mở đầu tiên: không resume thì bắt đầu nhật ký mới, các lần sau luôn ghi nối
+            mode = 'a' if self.resume or self._started else 'w'
+            self._file = open(self.path, mode, encoding='utf-8')
+            self._started = True
+            # Dòng cuối bị cắt dở (crash giữa chừng) thì xuống dòng trước khi ghi tiếp
+            if mode == 'a' and self._file.tell() > 0:
+                with open(self.path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        self._file.write("\n")
+        return self._file
+
+    def record(self, asin, info):
+        if not info:
+            return
+        line = json.dumps({"asin": asin, "info": info}, ensure_ascii=False)
+        with self._lock:
+            f = self._open()
+            f.write(line + "\n")
+            f.flush()
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                os.fsync(f.fileno())
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+                self._pending = 0
+
+
+_checkpoint = None
+
+
+def get_checkpoint():
+    """CheckpointJournal dùng chung cho cả lần chạy"""
+    global _checkpoint
+    if _checkpoint is None:
+        _checkpoint = CheckpointJournal()
+    return _checkpoint
+
+
+def set_resume(resume):
+    """Bật chế độ --resume: đọc lại nhật ký và ghi nối thay vì ghi đè"""
+    get_checkpoint().resume = resume
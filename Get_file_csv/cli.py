@@ -0,0 +1,49 @@
+import argparse
+
+from config import CONFIG
+from page_cache import set_cache_mode
+from checkpoint import set_resume
+from product_store import set_incremental
+from driver_lifecycle import install_signal_handlers
+
+
+def add_cache_arguments(parser):
+    """Thêm cờ điều khiển page cache vào parser"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--no-cache', action='store_true', help='Không đọc và không ghi page cache')
+    group.add_argument('--refresh-cache', action='store_true', help='Bỏ qua dữ liệu cũ trong cache, scrape lại và ghi đè')
+    return parser
+
+
+def apply_cache_arguments(args):
+    if args.no_cache:
+        set_cache_mode("bypass")
+    elif args.refresh_cache:
+        set_cache_mode("refresh")
+
+
+def build_arg_parser(description):
+    """Parser dùng chung cho các script: file input, template và các cờ tùy chọn"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--input', default=CONFIG.DEFAULT_INPUT, help="File CSV/JSONL chứa ASINs (cột Variant SKU), '-' để đọc CSV từ stdin")
+    parser.add_argument('--template', default=CONFIG.DEFAULT_TEMPLATE, help='Đường dẫn tới file CSV mẫu Shopify')
+    parser.add_argument('--resume', action='store_true', help='Đọc lại CONFIG.CHECKPOINT_FILE và bỏ qua các ASIN đã xong (với --queue: dùng lại kết quả đã có trong hàng đợi)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Chỉ scrape ASIN mới hoặc đã cũ, ASIN còn mới lấy từ kho CONFIG.STORE_FILE')
+    parser.add_argument('--max-age', type=float, help='Với --incremental: số ngày một ASIN trong kho còn được coi là mới')
+    parser.add_argument('--processes', type=int, default=CONFIG.PROCESSES, help='Số tiến trình chạy song song (0 = theo số lõi CPU)')
+    parser.add_argument('--browsers', type=int, default=CONFIG.BROWSERS_PER_PROCESS, help='Số trình duyệt mỗi tiến trình (mặc định CONFIG.WORKERS)')
+    parser.add_argument('--queue', help='Hàng đợi dùng chung cho nhiều máy (đường dẫn SQLite hoặc sqlite:///file)')
+    parser.add_argument('--role', choices=['coordinator', 'worker'], default='coordinator',
+                        help='Với --queue: coordinator đưa ASIN vào và ghép output, worker nhận ASIN và scrape')
+    add_cache_arguments(parser)
+    return parser
+
+
+def parse_args(description):
+    args = build_arg_parser(description).parse_args()
+    apply_cache_arguments(args)
+    set_resume(args.resume)
+    set_incremental(args.incremental, args.max_age)
+    install_signal_handlers()
+    return args
@@ -1,35 +1,227 @@
-class CONFIG:
-    # URL cơ sở cho Amazon
-    BASE_URL = 'https://www.amazon.com/dp/'
-    
-    # Thời gian chờ (giây)
-    TIMEOUT = 15
-    
-    # Khoảng thời gian chờ ngẫu nhiên giữa các yêu cầu (giây)
-    MIN_DELAY = 2.5
-    MAX_DELAY = 4.0
-    
-    # Đường dẫn mặc định
-    DEFAULT_INPUT = r"C:\Users\Dellpro\Documents\Shopify products\demo.csv"
-    DEFAULT_TEMPLATE = r"C:\Users\Dellpro\Documents\Shopify products\products_export\Decor\caytrangtri_export\caytrangtri_export_update.csv"
-    
-    # File checkpoint
-    CHECKPOINT_FILE = "checkpoint.json"
-    
-    # Danh sách proxy (thêm vào nếu có)
-    PROXIES = [
-        # 'http://proxy1:port',
-        # 'http://proxy2:port',
-    ]
-    
-    # Cấu hình selector cho các phần tử trên trang Amazon
-    SELECTORS = {
-        'product_title': '#productTitle',
-        'product_price': '#tp-tool-tip-subtotal-price-value',
-        'product_description': '#feature-bullets',
-        'image_selectors': [
-            {'main': "#landingImage", 'thumbs': "#altImages img"},
-            {'main': "#imgBlkFront", 'thumbs': "#imageBlockThumbs img"},
-            {'main': ".a-dynamic-image", 'thumbs': ".a-spacing-small.item img"}
-        ]
-    } 
\ No newline at end of file
+class CONFIG:
+    # URL cơ sở cho Amazon
+    BASE_URL = 'https://www.amazon.com/dp/'
+    
+    # Thời gian chờ (giây)
+    TIMEOUT = 15
+    
+    # Khoảng thời gian chờ ngẫu nhiên giữa các yêu cầu (giây)
+    MIN_DELAY = 2.5
+    MAX_DELAY = 4.0
+    
+    # Ngân sách yêu cầu chung cho mỗi host (mọi worker cộng lại): None thì tính từ MIN_DELAY/MAX_DELAY,
+    # RATE_LIMIT_BURST là số yêu cầu được gửi liền nhau khi đã nghỉ đủ lâu
+    REQUESTS_PER_SECOND = None
+    RATE_LIMIT_BURST = 1
+    
+    # Đường dẫn mặc định
+    DEFAULT_INPUT = r"C:\Users\Dellpro\Documents\Shopify products\demo.csv"
+    DEFAULT_TEMPLATE = r"C:\Users\Dellpro\Documents\Shopify products\products_export\Decor\caytrangtri_export\caytrangtri_export_update.csv"
+    
+    # File checkpoint (nhật ký JSON lines, mỗi dòng một ASIN đã xong) và số dòng giữa hai lần fsync
+    CHECKPOINT_FILE = "checkpoint.json"
+    CHECKPOINT_BATCH_SIZE = 20
+    
+    # Chờ theo điều kiện thay cho sleep cố định: hạn chờ tối đa (giây) của từng điều kiện,
+    # "dom" là khi DOM không còn thay đổi trong READY_QUIET_MS mili giây
+    READY_DEADLINES = {"title": TIMEOUT, "price": 5, "images": 5, "dom": 3}
+    READY_QUIET_MS = 500
+    READY_POLL_INTERVAL = 0.1
+    
+    # Số trang đã tải (kết quả trích xuất) PageSession giữ lại để dùng lại, trang cũ nhất bị bỏ trước
+    PAGE_SESSION_MAX_PAGES = 20
+    
+    # Phân loại trang ngay sau khi điều hướng (URL, mã HTTP, vài dấu hiệu DOM): trang không tìm thấy hay
+    # trang chặn (CAPTCHA, đăng nhập, lỗi) được bỏ qua ngay với lý do riêng thay vì chờ tiêu đề tới hết TIMEOUT;
+    # biến thể không bán (unavailable_selectors) vẫn được lấy thông tin, chỉ để trống giá và không chờ giá.
+    # Chưa đủ dấu hiệu sau PAGE_STATE_TIMEOUT giây thì xử lý như bình thường
+    PAGE_STATE_TIMEOUT = 1
+    PAGE_STATE_MARKERS = {
+        'interstitial_urls': ['/errors/validatecaptcha', '/ap/signin', '/captcha'],
+        'interstitial_selectors': ['form[action*="validateCaptcha"]', '#captchacharacters', 'input[name="amzn-captcha-submit"]'],
+        'interstitial_titles': ['Robot Check', 'Sorry! Something went wrong', 'Amazon Sign-In'],
+        'not_found_selectors': ['img[alt*="Dogs of Amazon"]', 'a[href*="ref=cs_404_logo"]', '#g img[src*="error"]'],
+        'not_found_titles': ['Page Not Found', 'Document Not Found'],
+        'product_selectors': ['#productTitle', '#dp-container', '#ppd', '#dp'],
+        'product_urls': ['/dp/', '/gp/product/'],
+        'availability_selector': '#availability',
+        'unavailable_selectors': ['#outOfStock', '#unqualifiedBuyBox'],
+        'unavailable_texts': ['Currently unavailable', 'This item cannot be shipped'],
+        'price_selectors': ['#corePrice_feature_div .a-price .a-offscreen', '#corePrice_desktop .a-price .a-offscreen',
+                            '#tp-tool-tip-subtotal-price-value', '.apexPriceToPay .a-offscreen'],
+    }
+    
+    # Chặn tài nguyên không cần cho trích xuất (ảnh, CSS, font, video, quảng cáo, tracking)
+    # và không chờ tải xong toàn trang ("eager": driver.get trả về khi DOM đã sẵn sàng)
+    BLOCK_RESOURCES = True
+    PAGE_LOAD_STRATEGY = "eager"
+    BLOCKED_URL_PATTERNS = [
+        '*.css', '*.woff', '*.woff2', '*.ttf', '*.otf',
+        '*.mp4', '*.webm', '*.m3u8', '*.ts',
+        '*.gif', '*.png', '*.jpg', '*.jpeg', '*.webp', '*.svg', '*.ico',
+        '*doubleclick.net*', '*googlesyndication.com*', '*google-analytics.com*',
+        '*amazon-adsystem.com*', '*fls-na.amazon.com*', '*unagi.amazon.com*', '*aax-us-east*',
+    ]
+    
+    # Số trình duyệt chạy song song, cùng lấy ASIN từ một hàng đợi
+    WORKERS = 3
+    
+    # Khởi động lại driver sau số trang này hoặc khi RSS cây tiến trình Chrome vượt ngưỡng (MB, cần psutil);
+    # ASIN đang dở khi driver chết được chạy lại tối đa DRIVER_REQUEUE_LIMIT lần trên driver mới
+    DRIVER_MAX_PAGES = 200
+    DRIVER_MAX_RSS_MB = 1500
+    DRIVER_REQUEUE_LIMIT = 1
+    # Driver còn sống / RSS chỉ được kiểm tra khi trang lỗi hoặc mỗi DRIVER_CHECK_EVERY trang
+    # / DRIVER_CHECK_INTERVAL giây (ping driver là một round trip, đo RSS duyệt cả cây tiến trình)
+    DRIVER_CHECK_EVERY = 20
+    DRIVER_CHECK_INTERVAL = 60
+    
+    # ASIN lỗi được hẹn chạy lại sau RETRY_BASE_DELAY * 2^(lần thử - 1) giây (tối đa RETRY_MAX_DELAY),
+    # trong lúc chờ các worker vẫn xử lý ASIN mới; tối đa RETRY_MAX_ATTEMPTS lần thử (1 = không chạy lại).
+    # Lỗi trong RETRY_PERMANENT_REASONS không chạy lại. ASIN lỗi vĩnh viễn được ghi vào <output>_failed.csv
+    RETRY_MAX_ATTEMPTS = 3
+    RETRY_BASE_DELAY = 30
+    RETRY_MAX_DELAY = 300
+    RETRY_PERMANENT_REASONS = ["not_found"]
+    
+    # Chạy nhiều tiến trình, mỗi tiến trình một phần ASIN (chia theo hash) với BROWSERS_PER_PROCESS
+    # trình duyệt riêng (None thì dùng WORKERS); 1 là chạy trong một tiến trình, 0 là theo số lõi CPU.
+    # Kết quả được gửi về tiến trình chính ngay khi xong; nhật ký của từng shard (đặt tên theo file input,
+    # dùng cho --resume kể cả khi đổi số tiến trình) nằm trong SHARD_DIR
+    PROCESSES = 1
+    BROWSERS_PER_PROCESS = None
+    SHARD_DIR = "shards"
+    
+    # Chạy trên nhiều máy qua một hàng đợi chung (--queue, --role coordinator|worker): worker thuê
+    # QUEUE_LEASE_SIZE ASIN mỗi lần (None = số trình duyệt), lease hết hạn sau QUEUE_VISIBILITY_TIMEOUT
+    # giây thì ASIN được giao cho worker khác, tối đa QUEUE_MAX_ATTEMPTS lần; worker thoát khi hàng đợi
+    # không còn việc trong QUEUE_IDLE_EXIT giây. Worker gửi heartbeat mỗi QUEUE_HEARTBEAT_INTERVAL giây,
+    # ngân sách yêu cầu (REQUESTS_PER_SECOND) được chia đều cho các worker còn heartbeat
+    QUEUE_FILE = "jobs.sqlite"
+    QUEUE_VISIBILITY_TIMEOUT = 600
+    QUEUE_MAX_ATTEMPTS = 3
+    QUEUE_LEASE_SIZE = None
+    QUEUE_POLL_INTERVAL = 2
+    QUEUE_IDLE_EXIT = 30
+    QUEUE_PROGRESS_EVERY = 30
+    QUEUE_HEARTBEAT_INTERVAL = 10
+    
+    # Daemon giữ sẵn trình duyệt giữa các job (scraper_daemon.py), scrape_client.py gửi job qua Unix socket
+    # DAEMON_SOCKET (tương đối thì nằm cạnh script); không có AF_UNIX (Windows) thì dùng 127.0.0.1:DAEMON_PORT
+    DAEMON_SOCKET = "scraper.sock"
+    DAEMON_PORT = 8766
+    DAEMON_SCRIPT = "get file csv5.py"
+    
+    # Tải HTML tĩnh bằng HTTP (asyncio) trước, chỉ mở Selenium cho ASIN thiếu trường bắt buộc; HTTP chạy
+    # song song với các trình duyệt theo từng nhóm HTTP_CONCURRENCY ASIN và ngừng hẳn sau HTTP_BLOCKED_LIMIT
+    # lần liên tiếp bị chặn (CAPTCHA, 403/429/503)
+    HTTP_FETCH = True
+    HTTP_CONCURRENCY = 8
+    HTTP_BLOCKED_LIMIT = 3
+    HTTP_REQUIRED_FIELDS = ['title', 'price', 'images']
+    
+    # Page cache trên đĩa: thời gian sống mỗi mục (giây) và dung lượng tối đa (byte), kiểm tra dung lượng
+    # và xóa mục hết hạn mỗi CACHE_EVICT_EVERY lần ghi
+    CACHE_FILE = "page_cache.sqlite"
+    CACHE_TTL = 24 * 3600
+    CACHE_MAX_BYTES = 500 * 1024 * 1024
+    CACHE_EVICT_EVERY = 100
+    
+    # Kho thông tin sản phẩm lần scrape gần nhất (không hết hạn): với --incremental, ASIN đã lấy trong
+    # STORE_MAX_AGE giây được lấy thẳng từ kho, chỉ ASIN mới hoặc đã cũ mới được scrape
+    STORE_FILE = "products.sqlite"
+    STORE_MAX_AGE = 7 * 24 * 3600
+    INCREMENTAL = False
+    
+    # Số dòng input đọc mỗi lần (đọc dần, không nạp cả file vào bộ nhớ)
+    INPUT_CHUNK_SIZE = 200
+    
+    # Số dòng CSV giữa hai lần flush file output
+    CSV_FLUSH_EVERY = 50
+    
+    # Metrics (thời gian theo giai đoạn, trang/phút, lỗi theo lý do, tỉ lệ khớp selector):
+    # ghi JSON và textfile Prometheus mỗi METRICS_INTERVAL giây và khi kết thúc, None để tắt từng file
+    METRICS_FILE = "metrics.json"
+    METRICS_TEXTFILE = "metrics.prom"
+    METRICS_INTERVAL = 60
+    
+    # Thống kê khớp/trượt của từng selector dự phòng, lưu qua các lần chạy: mọi chế độ trích xuất thử selector
+    # theo tỉ lệ khớp giảm dần và bỏ selector trượt liên tiếp SELECTOR_DEAD_AFTER lần (None = không bỏ);
+    # selector đã bỏ được thử lại mỗi SELECTOR_REPROBE_EVERY trang (None = không thử lại)
+    SELECTOR_STATS_FILE = "selector_stats.json"
+    SELECTOR_DEAD_AFTER = 500
+    SELECTOR_REPROBE_EVERY = 100
+    SELECTOR_STATS_SAVE_EVERY = 200
+    
+    # Danh sách proxy (thêm vào nếu có)
+    PROXIES = [
+        # 'http://proxy1:port',
+        # 'http://proxy2:port',
+    ]
+    
+    # Cấu hình selector cho các phần tử trên trang Amazon
+    SELECTORS = {
+        'product_title': '#productTitle',
+        'product_price': '#tp-tool-tip-subtotal-price-value',
+        'product_description': '#feature-bullets',
+        'image_selectors': [
+            {'main': "#landingImage", 'thumbs': "#altImages img"},
+            {'main': "#imgBlkFront", 'thumbs': "#imageBlockThumbs img"},
+            {'main': ".a-dynamic-image", 'thumbs': ".a-spacing-small.item img"}
+        ],
+
+        # Danh sách selector dự phòng cho từng trường (thử theo thứ tự)
+        'title_selectors': [
+            'span#productTitle',
+            '#productTitle'
+        ],
+        'bullet_selectors': [
+            '#feature-bullets li span.a-list-item'
+        ],
+        'detailed_description_selectors': [
+            '#productDescription',
+            '#aplus',
+            '#dpx-aplus-product-description_feature_div',
+            '#aplus3p_feature_div',
+            '#descriptionAndDetails'
+        ],
+        'price_selectors': [
+            'span.a-price > span.a-offscreen',
+            '#tp-tool-tip-subtotal-price-value',
+            '#priceblock_ourprice',
+            '#priceblock_dealprice',
+            ".apexPriceToPay > span[aria-hidden='true']",
+            '.a-price .a-offscreen',
+            '#corePrice_feature_div .a-price .a-offscreen',
+            '#corePrice_desktop .a-price .a-offscreen'
+        ],
+        'brand_selectors': [
+            'a#bylineInfo',
+            '#bylineInfo',
+            '.a-row.a-spacing-small .a-link-normal[href*="brandtextbin"]',
+            'a#brand',
+            '#brand',
+            'a[id*="brand"]',
+            # cssselect không hỗ trợ :has/:contains nên hàng "Brand" trong bảng thông số dùng XPath
+            'xpath://tr[contains(@class, "a-spacing-small")][th[contains(., "Brand")]]/td'
+        ],
+        'main_image_selectors': [
+            '#landingImage',
+            '#imgBlkFront'
+        ],
+        'main_image_attributes': ['data-old-hires', 'data-zoom-hires', 'src'],
+        'thumbnail_selectors': [
+            '#altImages li img',
+            'li.a-spacing-small.item img',
+            'li.image.item img',
+            '#altImages .a-button-thumbnail img'
+        ],
+        'thumbnail_attributes': ['data-old-hires', 'data-large-image', 'src'],
+        'dynamic_image_selector': '[data-a-dynamic-image]'
+    }
+
+    # Số ảnh tối đa lấy cho mỗi sản phẩm
+    MAX_IMAGES = 5
+
+    # Cách trích xuất thông tin: "html" (parse page_source), "js" (một lần execute_script), "dom" (find_element từng trường)
+    EXTRACTION_MODE = "html" 
\ No newline at end of file
@@ -0,0 +1,229 @@
+import os
+import csv
+import math
+import logging
+
+from config import CONFIG
+
+
+def output_path_for(input_csv_path):
+    """File output CSV cùng tên input, thêm _update (input từ stdin ghi ra stdin_update.csv)"""
+    if input_csv_path == '-':
+        return "stdin_update.csv"
+    base, ext = os.path.splitext(input_csv_path)
+    if ext.lower() != '.csv':
+        ext = '.csv'
+    return f"{base}_update{ext}"
+
+
+def format_value(value):
+    """Định dạng giá trị giống DataFrame.to_csv (NaN/None thành ô trống)"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and math.isnan(value):
+        return ""
+    return str(value)
+
+
+class StreamingCsvWriter:
+    """Ghi CSV theo thứ tự cột của template ngay khi có dòng, không giữ cả bảng trong bộ nhớ
+
+    Dữ liệu được ghi vào file <output>.partial, flush định kỳ và chỉ đổi tên thành file output
+    khi close() thành công. Nếu lỗi giữa chừng, file .partial vẫn giữ các dòng đã ghi.
+    """
+
+    def __init__(self, output_csv_path, columns, flush_every=None, encoding='utf-8-sig', logger=None):
+        self.output_csv_path = output_csv_path
+        self.partial_path = f"{output_csv_path}.partial"
+        self.columns = list(columns)
+        self.encoding = encoding
+        self.flush_every = flush_every or CONFIG.CSV_FLUSH_EVERY
+        self.logger = logger or logging.getLogger(__name__)
+        self.rows_written = 0
+        self._file = open(self.partial_path, 'w', encoding=encoding, newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.columns)
+
+    def _values(self, row):
+        as_row = getattr(row, 'as_row', None)
+        if as_row is not None:
+            return as_row()
+        return [format_value(row.get(column)) for column in self.columns]
+
+    def write_row(self, row):
+        """row: VariantRecord (đã đúng thứ tự cột) hoặc dict / pandas Series, cột thiếu để trống,
+        cột thừa bị bỏ qua"""
+        self._writer.writerow(self._values(row))
+        self.rows_written += 1
+        if self.rows_written % self.flush_every == 0:
+            self._file.flush()
+
+    def insert_rows(self, insertions):
+        """Chèn dòng vào giữa các dòng đã ghi: insertions là dict số thứ tự dòng dữ liệu (từ 0) -> các dòng
+        chèn ngay sau dòng đó. File .partial được chép lại một lần, đọc và ghi từng dòng."""
+        self._file.flush()
+        self._file.close()
+        rewritten = f"{self.partial_path}.tmp"
+        with open(self.partial_path, encoding=self.encoding, newline='') as source, \
+                open(rewritten, 'w', encoding=self.encoding, newline='') as target:
+            reader = csv.reader(source)
+            writer = csv.writer(target)
+            writer.writerow(next(reader))
+            for index, values in enumerate(reader):
+                writer.writerow(values)
+                for row in insertions.get(index, ()):
+                    writer.writerow(self._values(row))
+        os.replace(rewritten, self.partial_path)
+        self.rows_written += sum(len(rows) for rows in insertions.values())
+        self._file = open(self.partial_path, 'a', encoding=self.encoding, newline='')
+        self._writer = csv.writer(self._file)
+
+    def close(self):
+        """Hoàn tất file output (rename nguyên tử), trả về đường dẫn hoặc None nếu không có dòng nào"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        if not self.rows_written:
+            os.remove(self.partial_path)
+            return None
+        os.replace(self.partial_path, self.output_csv_path)
+        return self.output_csv_path
+
+    def abort(self):
+        """Dừng do lỗi: giữ lại file .partial với các dòng đã ghi"""
+        if not self._file.closed:
+            self._file.flush()
+            self._file.close()
+        self.logger.error(f"Đã lưu {self.rows_written} dòng dở dang tại {self.partial_path}")
+
+
+class ProductGroupWriter:
+    """Gom các biến thể liên tiếp có cùng Handle thành một sản phẩm rồi ghi ngay
+
+    Biến thể đầu tiên nhận tất cả ảnh (mỗi ảnh một dòng), các biến thể còn lại để trống ảnh
+    (Shopify sẽ dùng chung ảnh). Handle xuất hiện lại sau khi nhóm của nó đã ghi (không liền nhau
+    trong input) thì các dòng đó được giữ lại và close() chèn chúng ngay sau nhóm đã ghi, ảnh mới
+    được thêm tiếp theo Image Position, nên mọi dòng của một Handle vẫn nằm liền nhau trong output.
+    """
+
+    def __init__(self, writer, logger=None):
+        self.writer = writer
+        self.logger = logger or logging.getLogger(__name__)
+        self.handle = None
+        self.items = []
+        # Handle đã ghi -> (số thứ tự dòng cuối của nhóm, các ảnh đã ghi)
+        self.written = {}
+        # Handle đã ghi nhưng xuất hiện lại -> các dòng chờ chèn sau nhóm khi close()
+        self.late = {}
+
+    def add(self, handle, row, images):
+        if handle != self.handle:
+            self.flush()
+            self.handle = handle
+        self.items.append((row, images))
+
+    def flush(self):
+        if not self.items:
+            return
+        handle = self.handle
+
+        # Gom tất cả ảnh của sản phẩm
+        all_images = []
+        for _, images in self.items:
+            for img in images:
+                if img and img not in all_images:
+                    all_images.append(img)
+
+        if handle in self.written:
+            self._hold(handle, all_images)
+            self.items = []
+            return
+        self.logger.info(f"Xử lý ảnh cho sản phẩm Handle={handle}")
+
+        # Gán ảnh cho các biến thể
+        for i, (row, _) in enumerate(self.items):
+            if i == 0 and all_images:  # Biến thể đầu tiên nhận tất cả ảnh
+                for img_index, img_url in enumerate(all_images):
+                    image_row = row.copy()
+                    image_row["Image Src"] = img_url
+                    image_row["Image Position"] = img_index + 1
+                    self.writer.write_row(image_row)
+            else:  # Các biến thể còn lại không cần ảnh (Shopify sẽ dùng chung ảnh)
+                row["Image Src"] = ""
+                row["Image Position"] = ""
+                self.writer.write_row(row)
+
+        self.written[handle] = (self.writer.rows_written - 1, all_images)
+        self.items = []
+
+    def _hold(self, handle, images):
+        """Giữ các biến thể của Handle đã ghi để chèn sau nhóm của nó; ảnh chưa có được thêm tiếp vị trí"""
+        self.logger.warning(f"Handle={handle} xuất hiện lại không liền nhóm, sẽ chèn vào sau nhóm đã ghi")
+        _, written_images = self.written[handle]
+        held = self.late.setdefault(handle, [])
+        new_images = [img for img in images if img not in written_images]
+        for row, _ in self.items:
+            if new_images:
+                for img_url in new_images:
+                    written_images.append(img_url)
+                    image_row = row.copy()
+                    image_row["Image Src"] = img_url
+                    image_row["Image Position"] = len(written_images)
+                    held.append(image_row)
+                new_images = []
+            else:
+                row["Image Src"] = ""
+                row["Image Position"] = ""
+                held.append(row)
+
+    def close(self):
+        """Ghi nhóm cuối và chèn các biến thể của Handle không liền nhau vào sau nhóm của chúng"""
+        self.flush()
+        if not self.late:
+            return
+        self.writer.insert_rows({self.written[handle][0]: rows for handle, rows in self.late.items()})
+        self.logger.info(f"Đã chèn {sum(len(rows) for rows in self.late.values())} dòng của "
+                         f"{len(self.late)} Handle không liền nhau vào sau nhóm của chúng")
+        self.late = {}
+
+
+def failed_path_for(output_csv_path):
+    """File liệt kê ASIN lỗi vĩnh viễn đi kèm file output: <output>_failed.csv"""
+    base, ext = os.path.splitext(output_csv_path)
+    return f"{base}_failed{ext or '.csv'}"
+
+
+class FailureReport:
+    """Danh sách dòng input không lấy được thông tin (sau mọi lần chạy lại) và lý do, theo thứ tự input
+
+    Lý do lấy từ metrics (get_metrics().failed_asins); không có thì là "unknown" (vd. kết quả từ
+    worker trên máy khác qua hàng đợi chung).
+    """
+
+    COLUMNS = ["Line", "ASIN", "Reason"]
+
+    def __init__(self, output_csv_path, logger=None):
+        self.path = failed_path_for(output_csv_path)
+        self.logger = logger or logging.getLogger(__name__)
+        self.rows = []
+
+    def add(self, line, asin, reason=None):
+        self.rows.append([line, asin, reason or "unknown"])
+
+    def close(self):
+        """Ghi file danh sách lỗi (xóa file cũ nếu lần này không có lỗi), trả về đường dẫn hoặc None"""
+        if not self.rows:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return None
+        with open(self.path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.COLUMNS)
+            writer.writerows(self.rows)
+        reasons = {}
+        for _, _, reason in self.rows:
+            reasons[reason] = reasons.get(reason, 0) + 1
+        self.logger.warning(f"{len(self.rows)} ASIN lỗi vĩnh viễn ("
+                            + ", ".join(f"{reason} {count}" for reason, count in reasons.items())
+                            + f"), danh sách tại {self.path}")
+        return self.path
@@ -0,0 +1,130 @@
+import time
+import atexit
+import signal
+import logging
+import threading
+
+from config import CONFIG
+
+try:
+    import psutil
+except ImportError:  # psutil là tùy chọn, thiếu thì chỉ khởi động lại driver theo số trang
+    psutil = None
+
+
+_live_drivers = set()
+_live_drivers_lock = threading.Lock()
+
+
+def register_driver(driver):
+    """Ghi nhận driver đang mở để quit_all_drivers() đóng được khi thoát bất thường"""
+    with _live_drivers_lock:
+        _live_drivers.add(driver)
+    return driver
+
+
+def quit_driver(driver, logger=None):
+    """Đóng driver (bỏ qua lỗi nếu Chrome đã chết) và bỏ khỏi danh sách đang mở"""
+    with _live_drivers_lock:
+        _live_drivers.discard(driver)
+    try:
+        driver.quit()
+    except Exception as e:
+        (logger or logging.getLogger(__name__)).debug(f"Lỗi khi đóng driver: {e}")
+
+
+def quit_all_drivers():
+    with _live_drivers_lock:
+        drivers = list(_live_drivers)
+    for driver in drivers:
+        quit_driver(driver)
+
+
+def _raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt(f"Nhận tín hiệu {signal.Signals(signum).name}")
+
+
+def install_signal_handlers():
+    """SIGTERM/SIGHUP được xử lý như Ctrl+C để các khối finally đóng driver và file output,
+    driver còn sót lại được đóng khi tiến trình thoát"""
+    for name in ("SIGTERM", "SIGHUP"):
+        signum = getattr(signal, name, None)
+        if signum is not None and threading.current_thread() is threading.main_thread():
+            signal.signal(signum, _raise_keyboard_interrupt)
+    atexit.register(quit_all_drivers)
+
+
+def driver_is_alive(driver):
+    try:
+        driver.execute_script("return 1")
+        return True
+    except Exception:
+        # chromedriver đã chết thì urllib3 báo lỗi kết nối chứ không phải WebDriverException
+        return False
+
+
+class DriverWatchdog:
+    """Theo dõi một driver: số trang đã tải, RSS của cả cây tiến trình Chrome và driver còn sống không
+
+    restart_reason() trả về lý do cần khởi động lại driver (hoặc None); WorkerPool dùng nó để tạo
+    worker mới và chạy lại ASIN đang dở nếu driver chết giữa chừng. Ping driver (một round trip) và
+    đo RSS chỉ chạy khi trang vừa lỗi hoặc mỗi check_every trang / check_interval giây, không sau mỗi trang.
+    """
+
+    def __init__(self, driver, max_pages=None, max_rss_mb=None, check_every=None, check_interval=None,
+                 logger=None):
+        self.driver = register_driver(driver)
+        self.max_pages = max_pages or CONFIG.DRIVER_MAX_PAGES
+        self.max_rss_mb = max_rss_mb or CONFIG.DRIVER_MAX_RSS_MB
+        self.check_every = check_every or CONFIG.DRIVER_CHECK_EVERY
+        self.check_interval = check_interval or CONFIG.DRIVER_CHECK_INTERVAL
+        self.logger = logger or logging.getLogger(__name__)
+        self.pages = 0
+        self._checked_pages = 0
+        self._checked_at = time.monotonic()
+
+    def record_page(self):
+        self.pages += 1
+
+    def rss_mb(self):
+        """Tổng RSS (MB) của chromedriver và mọi tiến trình Chrome con, None nếu không đo được"""
+        if psutil is None:
+            return None
+        try:
+            root = psutil.Process(self.driver.service.process.pid)
+            processes = [root] + root.children(recursive=True)
+        except (AttributeError, psutil.Error):
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / 1024 / 1024
+
+    def check_due(self):
+        """Đã tới lượt kiểm tra định kỳ (đủ check_every trang hoặc check_interval giây từ lần trước)"""
+        return (self.pages - self._checked_pages >= self.check_every
+                or time.monotonic() - self._checked_at >= self.check_interval)
+
+    def restart_reason(self, failed=False):
+        """failed: trang vừa rồi lỗi / không có kết quả, kiểm tra driver còn sống ngay"""
+        if self.pages >= self.max_pages:
+            return f"đã tải {self.pages} trang"
+        due = self.check_due()
+        if not (failed or due):
+            return None
+        self._checked_pages = self.pages
+        self._checked_at = time.monotonic()
+        if not driver_is_alive(self.driver):
+            return "driver không phản hồi"
+        if not due:
+            return None
+        rss = self.rss_mb()
+        if rss is not None and rss > self.max_rss_mb:
+            return f"RSS {rss:.0f} MB > {self.max_rss_mb} MB"
+        return None
+
+    def quit(self):
+        quit_driver(self.driver, self.logger)
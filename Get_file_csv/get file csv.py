@@ -1,142 +1,201 @@
-import pandas as pd  
-import time  
-import random  
-import re  
-import os  
-import unidecode  
-from selenium import webdriver  
-from selenium.webdriver.chrome.options import Options  
-from selenium.webdriver.common.by import By  
-from selenium.webdriver.support.ui import WebDriverWait  
-from selenium.webdriver.support import expected_conditions as EC  
-
-def slugify(text):  
-    text = unidecode.unidecode(text)  
-    text = re.sub(r"[^\w\s-]", '', text).strip().lower()  
-    return re.sub(r"[-\s]+", '-', text)  
-
-def convert_to_fullsize(img_url):  
-    if not img_url:  
-        return img_url  
-    return img_url.replace('_SS40_', '') \
-                  .replace('_SX40_', '') \
-                  .replace('_SY40_', '') \
-                  .replace('_AC_US40_', '') \
-                  .replace('_AC_US100_', '') \
-                  .replace('_AC_SY400_', '') \
-                  .replace('_AC_SY879_', '') \
-                  .replace('_AC_SR38,50_', '') \
-                  .replace('_CR40,40,400,400_', '')  
-
-
-
-
-def get_amazon_info(asin, driver):  
-    url = f'https://www.amazon.com/dp/{asin}'  
-    driver.get(url)  
-    try:  
-        wait = WebDriverWait(driver, 10)  
-        wait.until(EC.presence_of_element_located((By.ID, "landingImage")))  
-    except:  
-        return {}  # Không truy cập được  
-
-    title, desc, price, image = '', '', '', ''  
-    try:  
-        title = driver.find_element(By.ID, "productTitle").text.strip()  
-    except: pass  
-    try:  
-        desc = driver.find_element(By.ID, "feature-bullets").text.strip().replace('\n', '<br>')  
-    except: pass  
-    try:  
-        price = driver.find_element(By.CSS_SELECTOR, 'span.a-price > span.a-offscreen').text.replace("$", "").replace(",", "")  
-    except: pass  
-    try:  
-        image = driver.find_element(By.ID, "landingImage").get_attribute('src')  
-        image = convert_to_fullsize(image)  
-    except: image = ""  
-    info = {  
-        "Handle": (slugify(title) + "-" + asin[-4:]) if title else asin,  
-        "Title": title,  
-        "Body (HTML)": desc,  
-        "Vendor": "Amazon",  
-        "Tags": f"Amazon Import,{asin}",  
-        "Variant Grams": "",  
-        "Variant Price": price,  
-        "Variant Barcode": asin,  
-        "Image Src": image,  
-        "Image Position": 1  
-    }  
-    return info  
-
-def create_driver():  
-    chrome_options = Options()  
-    chrome_options.add_argument("--headless")  
-    chrome_options.add_argument('--disable-blink-features=AutomationControlled')  
-    chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])  
-    chrome_options.add_experimental_option('useAutomationExtension', False)  
-    driver = webdriver.Chrome(options=chrome_options)  
-    return driver  
-
-def process_file(input_csv_path, sample_template_path):  
-    # Đọc file mẫu đầy đủ  
-    sample_df = pd.read_csv(sample_template_path)  
-    template_row = sample_df.iloc[0].copy()  # Lấy giá trị mặc định từ dòng đầu tiên  
-
-    # Đọc file input  
-    asin_df = pd.read_csv(input_csv_path)  
-    if 'Variant SKU' not in asin_df.columns:  
-        print("File input phải có cột 'Variant SKU' (ASIN)")  
-        return  
-
-    # Các trường cần lấy và mapping  
-    fields_from_amz = [  
-        "Handle", "Title", "Body (HTML)", "Vendor",  
-        "Tags", "Variant Grams", "Variant Price",  
-        "Variant Barcode", "Image Src", "Image Position"  
-    ]  
-    all_columns = list(sample_df.columns)  
-
-    driver = create_driver()  
-
-    rows_full = []  
-    for i, row in asin_df.iterrows():  
-        asin = row.get('Variant SKU')  
-        if isinstance(asin, float) and pd.isna(asin):  
-            print(f"Bỏ qua dòng {i+1} vì ASIN là NaN")  
-            continue  
-        asin = str(asin).strip()  
-        if not asin:  
-            print(f"Đã xử lý hết danh sách ASIN! Dừng chương trình tại dòng {i+1}.")  
-            break 
-        amz_info = get_amazon_info(asin, driver)  
-        if not amz_info or not amz_info.get("Title"):  
-            print(f"Không lấy được thông tin cho ASIN {asin}")  
-            continue  
-
-        new_row = template_row.copy()  
-        for field in fields_from_amz:  
-            new_row[field] = amz_info.get(field, "")  
-        rows_full.append(new_row)  
-        print(f"✓ Imported ASIN {asin}: {amz_info['Title'][:40]}")  
-        time.sleep(random.uniform(2.5, 4))
-
-    driver.quit()  
-
-    if not rows_full:  
-        print("Không có dòng nào được import.")  
-        return  
-
-    out_df = pd.DataFrame(rows_full, columns=all_columns)  
-
-    # Output file cùng tên input, thêm _update  
-    base, ext = os.path.splitext(input_csv_path)  
-    output_csv_path = f"{base}_update{ext}"  
-
-    out_df.to_csv(output_csv_path, index=False, encoding='utf-8-sig')  
-    print(f"Đã xuất ra file đúng format: {output_csv_path}")  
-
-if __name__ == "__main__":  
-    # Cập nhật các đường dẫn file phù hợp  
-    asin_input = r"C:\Users\Dellpro\Documents\Shopify products\demo.csv"  # hoặc file đang dùng, có cột 'Variant SKU'  
-    template_file = r"C:\Users\Dellpro\Documents\Shopify products\products_export\Decor\caytrangtri_export\caytrangtri_export_update.csv"  
+import pandas as pd  
+import re  
+import unidecode  
+from selenium import webdriver  
+from selenium.webdriver.chrome.options import Options  
+from selenium.webdriver.common.by import By  
+from selenium.webdriver.support.ui import WebDriverWait  
+from selenium.webdriver.support import expected_conditions as EC  
+
+from html_extractor import extract_product
+from browser_profile import apply_resource_policy, block_resources
+from driver_lifecycle import DriverWatchdog, install_signal_handlers
+from page_cache import get_page_cache
+from rate_limiter import get_rate_limiter
+from input_reader import InputReader
+from metrics import get_metrics, MetricsExporter
+from selector_stats import get_selector_stats
+from readiness import PageReadiness, FAILED_PAGE_STATES
+from retry_queue import iter_with_retries
+from records import TemplateSchema
+from csv_writer import StreamingCsvWriter, FailureReport, output_path_for
+
+def slugify(text):  
+    text = unidecode.unidecode(text)  
+    text = re.sub(r"[^\w\s-]", '', text).strip().lower()  
+    return re.sub(r"[-\s]+", '-', text)  
+
+def convert_to_fullsize(img_url):  
+    if not img_url:  
+        return img_url  
+    return img_url.replace('_SS40_', '') \
+                  .replace('_SX40_', '') \
+                  .replace('_SY40_', '') \
+                  .replace('_AC_US40_', '') \
+                  .replace('_AC_US100_', '') \
+                  .replace('_AC_SY400_', '') \
+                  .replace('_AC_SY879_', '') \
+                  .replace('_AC_SR38,50_', '') \
+                  .replace('_CR40,40,400,400_', '')  
+
+
+
+
+def get_amazon_info(asin, driver):  
+    # Kiểm tra page cache trước khi mở trang  
+    cache = get_page_cache()  
+    fields = cache.get(asin)  
+    if not fields:  
+        metrics = get_metrics()  
+        url = f'https://www.amazon.com/dp/{asin}'  
+        with metrics.phase("rate_limit"):  
+            get_rate_limiter().acquire(url)  # chờ tới lượt theo ngân sách yêu cầu chung  
+        with metrics.phase("navigate"):  
+            driver.get(url)  
+        # Trang không tìm thấy / bị chặn: bỏ qua ngay, không chờ landingImage  
+        with metrics.phase("classify"):  
+            state = PageReadiness(driver).classify()  
+        if state in FAILED_PAGE_STATES:  
+            metrics.note_failure(state)  
+            return {}  
+        try:  
+            with metrics.phase("wait"):  
+                wait = WebDriverWait(driver, 10)  
+                wait.until(EC.presence_of_element_located((By.ID, "landingImage")))  
+        except:  
+            metrics.note_failure("page_timeout")  
+            return {}  # Không truy cập được  
+
+        # Parse page_source một lần thay vì gọi find_element cho từng trường  
+        with metrics.phase("extract"):  
+            fields = extract_product(driver.page_source, asin)  
+        if fields["title"]:  
+            cache.put(asin, fields)  
+
+    title = fields["title"]  
+    desc = fields["feature_text"]  
+    price = fields["price"]  
+    image = fields["images"][0] if fields["images"] else ""  
+    info = {  
+        "Handle": (slugify(title) + "-" + asin[-4:]) if title else asin,  
+        "Title": title,  
+        "Body (HTML)": desc,  
+        "Vendor": "Amazon",  
+        "Tags": f"Amazon Import,{asin}",  
+        "Variant Grams": "",  
+        "Variant Price": price,  
+        "Variant Barcode": asin,  
+        "Image Src": image,  
+        "Image Position": 1  
+    }  
+    return info  
+
+def create_driver():  
+    chrome_options = Options()  
+    chrome_options.add_argument("--headless")  
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')  
+    chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])  
+    chrome_options.add_experimental_option('useAutomationExtension', False)  
+    # Không tải ảnh/CSS/font/quảng cáo, driver.get trả về khi DOM sẵn sàng (CONFIG.BLOCK_RESOURCES)  
+    apply_resource_policy(chrome_options)  
+    driver = webdriver.Chrome(options=chrome_options)  
+    block_resources(driver)  
+    return driver  
+
+def process_file(input_csv_path, sample_template_path):  
+    # Đọc file mẫu đầy đủ  
+    sample_df = pd.read_csv(sample_template_path)  
+
+    # Đọc dần file input (theo từng khối), chỉ kiểm tra header trước  
+    reader = InputReader(input_csv_path)  
+    header = reader.read_header()  
+    if header is not None and 'Variant SKU' not in header:  
+        print("File input phải có cột 'Variant SKU' (ASIN)")  
+        return  
+
+    # Các trường cần lấy và mapping  
+    fields_from_amz = [  
+        "Handle", "Title", "Body (HTML)", "Vendor",  
+        "Tags", "Variant Grams", "Variant Price",  
+        "Variant Barcode", "Image Src", "Image Position"  
+    ]  
+    all_columns = list(sample_df.columns)  
+    # Giá trị mặc định từ dòng đầu tiên, định dạng sẵn một lần; mỗi dòng mới chỉ là một lần copy list  
+    schema = TemplateSchema(sample_df.columns, sample_df.iloc[0], fields_from_amz)  
+
+    driver = create_driver()  
+    watchdog = DriverWatchdog(driver)  
+
+    def fetch(asin):  
+        # Chromedriver chết thì urllib3 báo lỗi kết nối chứ không phải WebDriverException: ghi lý do lỗi,  
+        # trả về rỗng để driver được thay và ASIN vào hàng đợi chạy lại thay vì dừng cả lần chạy  
+        try:  
+            return get_amazon_info(asin, driver)  
+        except Exception as e:  
+            print(f"Lỗi driver khi xử lý ASIN {asin}: {e}")  
+            get_metrics().note_failure(type(e).__name__)  
+            return {}  
+
+    def scrape(item):  
+        nonlocal driver, watchdog  
+        line, row, asin = item  
+        watchdog.record_page()  
+        amz_info = fetch(asin)  
+
+        # Driver chết hoặc đã quá số trang / RSS: thay driver mới, ASIN chưa lấy được thì chạy lại một lần  
+        reason = watchdog.restart_reason(failed=not amz_info)  
+        if reason:  
+            print(f"Khởi động lại driver ({reason})")  
+            watchdog.quit()  
+            driver = create_driver()  
+            watchdog = DriverWatchdog(driver)  
+            if not amz_info:  
+                get_metrics().take_failure()  
+                amz_info = fetch(asin)  
+
+        return amz_info, get_metrics().record_page(amz_info, asin=asin)  
+
+    # Output file cùng tên input, thêm _update, ghi dần từng dòng; ASIN lỗi vĩnh viễn ghi vào <output>_failed.csv  
+    writer = StreamingCsvWriter(output_path_for(input_csv_path), all_columns)  
+    failures = FailureReport(writer.output_csv_path)  
+
+    # Metrics ghi định kỳ trong lúc chạy và một lần cuối (CONFIG.METRICS_FILE, CONFIG.METRICS_TEXTFILE)  
+    with MetricsExporter():  
+        try:  
+            # ASIN lỗi được hẹn chạy lại (backoff lũy thừa) xen giữa các ASIN mới, kết quả vẫn theo thứ tự input  
+            for (line, row, asin), amz_info in iter_with_retries(reader, scrape, get_asin=lambda item: item[2]):  
+                failure = get_metrics().failed_asins.get(asin)  
+                if failure or not amz_info:  
+                    print(f"Không lấy được thông tin cho ASIN {asin} ({failure})")  
+                    failures.add(line, asin, failure)  
+                    continue  
+
+                with get_metrics().phase("csv"):  
+                    new_row = schema.new_variant()  
+                    schema.apply_amazon(new_row, amz_info)  
+                    writer.write_row(new_row)  
+                print(f"✓ Imported ASIN {asin}: {amz_info['Title'][:40]}")  
+        except BaseException:  
+            # Lỗi giữa chừng: các dòng đã ghi vẫn nằm trong file .partial  
+            writer.abort()  
+            raise  
+        finally:  
+            watchdog.quit()  
+        failures.close()  
+        print(get_page_cache().summary())  
+        print(get_rate_limiter().summary())  
+        print(get_metrics().summary())  
+        print(get_selector_stats().summary())  
+
+        output_csv_path = writer.close()  
+        if output_csv_path is None:  
+            print("Không có dòng nào được import.")  
+            return  
+        print(f"Đã xuất ra file đúng format: {output_csv_path}")  
+
+if __name__ == "__main__":  
+    install_signal_handlers()  
+    # Cập nhật các đường dẫn file phù hợp  
+    asin_input = r"C:\Users\Dellpro\Documents\Shopify products\demo.csv"  # hoặc file đang dùng, có cột 'Variant SKU'  
+    template_file = r"C:\Users\Dellpro\Documents\Shopify products\products_export\Decor\caytrangtri_export\caytrangtri_export_update.csv"  
     process_file(asin_input, template_file)
\ No newline at end of file
@@ -1,306 +1,301 @@
-import pandas as pd  
-import time  
-import random  
-import re  
-import os  
-import unidecode  
-import logging  
-import sys  
-import csv  
-from collections import defaultdict  
-from concurrent.futures import ThreadPoolExecutor  
-
-from selenium import webdriver  
-from selenium.webdriver.chrome.options import Options  
-from selenium.webdriver.common.by import By  
-from selenium.webdriver.support.ui import WebDriverWait  
-from selenium.webdriver.support import expected_conditions as EC  
-
-def setup_logger(name):  
-    logger = logging.getLogger(name)  
-    logger.setLevel(logging.INFO)  
-
-    if logger.hasHandlers():  
-        logger.handlers.clear()  
-
-    formatter = logging.Formatter(f'%(asctime)s - {name} - %(levelname)s - %(message)s')  
-
-    ch = logging.StreamHandler(sys.stdout)  
-    ch.setFormatter(formatter)  
-    logger.addHandler(ch)  
-
-    return logger  
-
-def slugify(text):  
-    text = unidecode.unidecode(text)  
-    text = re.sub(r"[^\w\s-]", '', text).strip().lower()  
-    return re.sub(r"[-\s]+", '-', text)  
-
-def convert_to_fullsize(img_url):  
-    if not img_url:  
-        return img_url  
-    return img_url.replace('_SS40_', '') \
-                  .replace('_SX40_', '') \
-                  .replace('_SY40_', '') \
-                  .replace('_AC_US40_', '') \
-                  .replace('_AC_US100_', '') \
-                  .replace('_AC_SY400_', '') \
-                  .replace('_AC_SY879_', '') \
-                  .replace('_AC_SR38,50_', '') \
-                  .replace('_CR40,40,400,400_', '')  
-
-def get_amazon_images(asin, driver, logger):  
-    url = f'https://www.amazon.com/dp/{asin}'  
-    driver.get(url)  
-    try:  
-        wait = WebDriverWait(driver, 15)  
-        wait.until(EC.presence_of_element_located((By.ID, "landingImage")))  
-        time.sleep(2)  # chờ JS load xong thumbnail  
-    except:  
-        logger.warning(f"Timeout loading page for ASIN {asin}")  
-        return []  
-
-    img_urls = []  
-
-    # Lấy ảnh chính  
-    try:  
-        main_img = driver.find_element(By.ID, "landingImage")  
-        src = main_img.get_attribute('src')  
-        if src:  
-            main_full = convert_to_fullsize(src)  
-            img_urls.append(main_full)  
-    except:  
-        logger.warning(f"Không tìm thấy ảnh chính của ASIN {asin}")  
-
-    # Lấy các thumbnail (chỉ lấy src, convert sang fullsize, và loại trùng với ảnh chính)  
-    thumb_set = set(img_urls)  
-    try:  
-        thumbnails = driver.find_elements(By.CSS_SELECTOR, '#altImages img')  
-        for thumb in thumbnails:  
-            thumb_src = thumb.get_attribute('src')  
-            if thumb_src:  
-                full_img = convert_to_fullsize(thumb_src)  
-                if full_img not in thumb_set:  
-                    img_urls.append(full_img)  
-                    thumb_set.add(full_img)  
-    except Exception as e:  
-        logger.warning(f"Không tìm thấy ảnh phụ của ASIN {asin}: {e}")  
-
-    logger.info(f"Tìm thấy tối đa {len(img_urls)} ảnh chính và thumbnail cho ASIN {asin}")  
-    return img_urls
-
-def get_amazon_info(asin, driver, logger):  
-    url = f'https://www.amazon.com/dp/{asin}'  
-    driver.get(url)  
-
-    try:  
-        wait = WebDriverWait(driver, 15)  
-        wait.until(EC.presence_of_element_located((By.ID, "landingImage")))  
-        wait.until(EC.presence_of_element_located((By.ID, "productTitle")))  
-    except Exception as e:  
-        logger.warning(f"Timeout loading main page or title for ASIN {asin}: {e}")  
-        return {}  
-
-    # Thêm thời gian chờ tĩnh để toàn bộ phần tử JS tải xong  
-    time.sleep(4)  
-
-    title = ''  
-    desc = ''  
-    detailed_desc = ''  
-    price = ''  
-
-    try:  
-        title = driver.find_element(By.ID, "productTitle").text.strip()  
-    except Exception as e:  
-        logger.warning(f"Không lấy được title ASIN {asin}: {e}")  
-
-    try:  
-        desc = driver.find_element(By.ID, "feature-bullets").text.strip().replace('\n', '<br>')  
-    except:  
-        desc = ''  
-
-    try:  
-        detailed_desc = driver.find_element(By.ID, "productDescription").text.strip().replace('\n', '<br>')  
-    except:  
-        detailed_desc = ''  
-
-    # Lấy giá với nhiều cách thử khác nhau do Amazon thay đổi nhiều mẫu hiển thị giá  
-    price_selectors = [  
-        'span.a-price > span.a-offscreen',  
-        '#priceblock_ourprice',  
-        '#priceblock_dealprice',  
-        '.apexPriceToPay > span[aria-hidden="true"]'  
-    ]  
-    for sel in price_selectors:  
-        try:  
-            price_raw = driver.find_element(By.CSS_SELECTOR, sel).text  
-            if price_raw:  
-                price = price_raw.replace("$", "").replace(",", "").strip()  
-                if price:  
-                    break  
-        except:  
-            continue  
-
-    body_html = desc  
-    if detailed_desc:  
-        body_html += '<br><br>' + detailed_desc  
-
-    # Lấy hình ảnh sản phẩm  
-    images = get_amazon_images(asin, driver, logger)  
-
-    info = {  
-        "Handle": (slugify(title) + "-" + asin[-4:]) if title else asin,  
-        "Title": title,  
-        "Body (HTML)": body_html,  
-        "Vendor": "Amazon",  
-        "Tags": f"Amazon Import,{asin}",  
-        "Variant Grams": "",  
-        "Variant Price": price,  
-        "Variant Barcode": asin,  
-        "Image Src": ','.join(images) if images else "",  
-        "Image Position": 1,  
-    }  
-    return info  
-
-def create_driver():  
-    chrome_options = Options()  
-    chrome_options.add_argument("--headless")  
-    chrome_options.add_argument('--disable-blink-features=AutomationControlled')  
-    chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])  
-    chrome_options.add_experimental_option('useAutomationExtension', False)  
-    driver = webdriver.Chrome(options=chrome_options)  
-    return driver  
-
-def process_file(input_csv_path, sample_template_path, logger=None):  
-    if logger is None:  
-        logger = setup_logger(os.path.basename(input_csv_path))  
-        
-    logger.info(f"Bắt đầu xử lý {input_csv_path}")  
-    
-    sample_df = pd.read_csv(sample_template_path)  
-    template_row = sample_df.iloc[0].copy()  
-
-    asin_df = pd.read_csv(input_csv_path)  
-    if 'Variant SKU' not in asin_df.columns:  
-        logger.error("File input phải có cột 'Variant SKU' (ASIN)")  
-        return  
-
-    asin_df = asin_df.dropna(subset=['Variant SKU'])  
-    asin_df = asin_df[asin_df['Variant SKU'].astype(str).str.strip() != '']  
-
-    fields_from_amz = [  
-        "Handle", "Title", "Body (HTML)", "Tags",  
-        "Variant Grams", "Variant Price",  
-        "Variant Barcode"  
-    ]  
-    all_columns = list(sample_df.columns)  
-
-    driver = create_driver()  
-    rows_full = []  
-
-    # Trước tiên, nhóm các biến thể theo sản phẩm  
-    products = defaultdict(list)  
-    
-    for i, row in asin_df.iterrows():  
-        asin_raw = row['Variant SKU']  
-        asin = str(asin_raw).strip()  
-        logger.info(f"Đang xử lý ASIN dòng {i+2}: {asin}")  
-
-        amz_info = get_amazon_info(asin, driver, logger)  
-        if not amz_info or not amz_info.get("Title"):  
-            logger.warning(f"Không lấy được thông tin cho ASIN {asin}")  
-            continue  
-
-        new_row = template_row.copy()  
-
-        # Giữ nguyên Variant SKU gốc  
-        new_row["Variant SKU"] = row["Variant SKU"]  
-
-        # Giữ Vendor gốc nếu có, hoặc mặc định "Amazon"  
-        new_row["Vendor"] = row.get("Vendor", "Amazon")  
-
-        # Lấy thông tin từ Amazon  
-        for field in fields_from_amz:  
-            new_row[field] = amz_info.get(field, new_row.get(field, ""))  
-            
-        # Xử lý hình ảnh riêng  
-        handle = new_row["Handle"]  
-        products[handle].append({"row": new_row, "asin": asin})  
-        
-        logger.info(f"✓ Imported ASIN {asin}: {amz_info['Title'][:40]}")  
-        time.sleep(random.uniform(2.5, 4))  
-
-    # Xử lý ảnh cho từng sản phẩm  
-    for handle, product_info in products.items():  
-        all_images = []  
-        logger.info(f"Lấy ảnh cho sản phẩm Handle={handle}")  
-        
-        # Lấy tất cả ảnh cho các biến thể của sản phẩm  
-        for item in product_info:  
-            asin = item["asin"]  
-            time.sleep(random.uniform(1, 2))  
-            images = get_amazon_images(asin, driver, logger)  
-            if images:  
-                # Thêm vào danh sách ảnh chung của sản phẩm  
-                for img in images:  
-                    if img not in all_images:  
-                        all_images.append(img)  
-        
-        # Gán ảnh cho các biến thể  
-        for i, item in enumerate(product_info):  
-            row = item["row"]  
-            # Thêm biến thể với thông tin đã có và ảnh đầu tiên  
-            if i == 0 and all_images:  # Biến thể đầu tiên nhận tất cả ảnh  
-                for img_index, img_url in enumerate(all_images):  
-                    image_row = row.copy()  
-                    image_row["Image Src"] = img_url  
-                    image_row["Image Position"] = img_index + 1  
-                    rows_full.append(image_row)  
-            else:  # Các biến thể còn lại không cần ảnh (Shopify sẽ dùng chung ảnh)  
-                row["Image Src"] = ""  
-                row["Image Position"] = ""  
-                rows_full.append(row)  
-
-    driver.quit()  
-
-    if not rows_full:  
-        logger.error("Không có dòng nào được import.")  
-        return  
-
-    out_df = pd.DataFrame(rows_full, columns=all_columns)  
-
-    base, ext = os.path.splitext(input_csv_path)  
-    output_csv_path = f"{base}_update{ext}"  
-
-    out_df.to_csv(output_csv_path, index=False, encoding='utf-8-sig')  
-    logger.info(f"Đã xuất ra file đúng format: {output_csv_path}")  
-    return output_csv_path  
-
-def process_multiple_files(file_pairs):  
-    with ThreadPoolExecutor(max_workers=3) as executor:  
-        futures = []  
-        for input_csv, template_csv in file_pairs:  
-            logger = setup_logger(os.path.basename(input_csv))  
-            futures.append(executor.submit(process_file, input_csv, template_csv, logger))  
-
-        for future in futures:  
-            future.result()  # chờ hoàn tất  
-
-    print("Tất cả các file đã xử lý xong.")  
-
-if __name__ == "__main__":  
-    # Có thể xử lý một file đơn:  
-    asin_input = r"C:\Users\Dellpro\Documents\Shopify products\demo.csv"  
-    template_file = r"C:\Users\Dellpro\Documents\Shopify products\products_export\Decor\caytrangtri_export\caytrangtri_export_update.csv"  
-    process_file(asin_input, template_file)  
-    
-    # # Hoặc xử lý nhiều file cùng lúc:  
-    # """  
-    # file_pairs = [  
-    #     (r"C:\Users\Dellpro\Documents\Shopify products\products_export\Pet\quanaochomeo_export\quanaochomeo_export.csv",   
-    #      r"C:\Users\Dellpro\Documents\Shopify products\template.csv"),  
-    #     (r"C:\Users\Dellpro\Documents\Shopify products\products_export\Pet\dochamsocthu_export\dochamsocthu_export.csv",   
-    #      r"C:\Users\Dellpro\Documents\Shopify products\template.csv"),  
-    # ]  
-    # process_multiple_files(file_pairs)  
+import pandas as pd  
+import re  
+import os  
+import unidecode  
+import logging  
+import sys  
+
+from selenium import webdriver  
+from selenium.webdriver.chrome.options import Options  
+
+from page_session import PageSession
+from worker_pool import iter_file_results
+from process_pool import iter_sharded_results, process_count
+from job_queue import open_queue, iter_queue_results, run_queue_worker
+from http_fetcher import prefetch_infos
+from browser_profile import apply_resource_policy, block_resources
+from driver_lifecycle import DriverWatchdog
+from page_cache import get_page_cache
+from rate_limiter import get_rate_limiter
+from metrics import get_metrics, MetricsExporter
+from selector_stats import get_selector_stats
+from product_store import get_product_store
+from checkpoint import get_checkpoint
+from records import TemplateSchema
+from input_reader import InputReader
+from csv_writer import StreamingCsvWriter, FailureReport, ProductGroupWriter, output_path_for
+from cli import parse_args
+
+def setup_logger(name):  
+    logger = logging.getLogger(name)  
+    logger.setLevel(logging.INFO)  
+
+    if logger.hasHandlers():  
+        logger.handlers.clear()  
+
+    formatter = logging.Formatter(f'%(asctime)s - {name} - %(levelname)s - %(message)s')  
+
+    ch = logging.StreamHandler(sys.stdout)  
+    ch.setFormatter(formatter)  
+    logger.addHandler(ch)  
+
+    return logger  
+
+def slugify(text):  
+    text = unidecode.unidecode(text)  
+    text = re.sub(r"[^\w\s-]", '', text).strip().lower()  
+    return re.sub(r"[-\s]+", '-', text)  
+
+# Các điều kiện cần đạt trước khi trích xuất (xem readiness.PageReadiness), chờ tới khi đạt chứ không sleep cố định  
+PAGE_READY = ("title", "price", "images")  
+
+def get_amazon_info(asin, driver, logger, session=None):  
+    # Page cache đã được xem ở bước prefetch (prefetch_infos), ASIN tới đây luôn cần mở trang  
+    # Trang chỉ được tải một lần cho mỗi ASIN, ảnh và thông tin dùng chung kết quả trích xuất  
+    if session is None:  
+        session = PageSession(driver, logger)  
+    fields = session.get_fields(asin, ready=PAGE_READY)  
+    if fields is None:  
+        return {}  
+
+    if fields["title"]:  
+        get_page_cache().put(asin, fields)  
+    return build_amazon_info(asin, fields)  
+
+def build_amazon_info(asin, fields):  
+    """Tạo thông tin sản phẩm từ kết quả trích xuất (dùng chung cho Selenium và HTTP)"""  
+    title = fields["title"]  
+    desc = fields["feature_text"]  
+    detailed_desc = fields["detailed_description"]  
+    price = fields["price"]  
+
+    body_html = desc  
+    if detailed_desc:  
+        body_html += '<br><br>' + detailed_desc  
+
+    # Lấy hình ảnh sản phẩm  
+    images = fields["images"]  
+
+    info = {  
+        "Handle": (slugify(title) + "-" + asin[-4:]) if title else asin,  
+        "Title": title,  
+        "Body (HTML)": body_html,  
+        "Vendor": "Amazon",  
+        "Tags": f"Amazon Import,{asin}",  
+        "Variant Grams": "",  
+        "Variant Price": price,  
+        "Variant Barcode": asin,  
+        "Image Src": ','.join(images) if images else "",  
+        "Image Position": 1,  
+    }  
+    return info  
+
+def create_driver():  
+    chrome_options = Options()  
+    chrome_options.add_argument("--headless")  
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')  
+    chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])  
+    chrome_options.add_experimental_option('useAutomationExtension', False)  
+    # Không tải ảnh/CSS/font/quảng cáo, driver.get trả về khi DOM sẵn sàng (CONFIG.BLOCK_RESOURCES)  
+    apply_resource_policy(chrome_options)  
+    driver = webdriver.Chrome(options=chrome_options)  
+    block_resources(driver)  
+    return driver  
+
+class ScrapeWorker:  
+    """Một driver sống lâu cùng PageSession riêng, dùng trong WorkerPool"""  
+
+    def __init__(self, logger):  
+        self.logger = logger  
+        self.driver = create_driver()  
+        self.session = PageSession(self.driver, logger)  
+        self.watchdog = DriverWatchdog(self.driver, logger=logger)  
+
+    def scrape(self, asin):  
+        self.logger.info(f"Đang xử lý ASIN: {asin}")  
+        self.watchdog.record_page()  
+        amz_info = get_amazon_info(asin, self.driver, self.logger, self.session)  
+        return amz_info  
+
+    def restart_reason(self, failed=False):  
+        return self.watchdog.restart_reason(failed)  
+
+    def close(self):  
+        self.watchdog.quit()  
+        self.logger.info(self.session.summary())  
+
+    def __enter__(self):  
+        return self  
+
+    def __exit__(self, exc_type, exc, tb):  
+        self.close()  
+
+# Fields sẽ lấy từ Amazon  
+FIELDS_FROM_AMZ = [  
+    "Handle", "Title", "Body (HTML)", "Tags",  
+    "Variant Grams", "Variant Price",  
+    "Variant Barcode"  
+]  
+
+def load_input(input_csv_path, sample_template_path, logger):  
+    """Đọc template và danh sách ASIN của một file input"""  
+    logger.info(f"Bắt đầu xử lý {input_csv_path}")  
+    
+    sample_df = pd.read_csv(sample_template_path)  
+
+    # Đọc dần danh sách ASIN (theo từng khối), chỉ kiểm tra header trước  
+    reader = InputReader(input_csv_path, logger=logger)  
+    header = reader.read_header()  
+    if header is not None and 'Variant SKU' not in header:  
+        logger.error("File input phải có cột 'Variant SKU' (ASIN)")  
+        return None  
+
+    return {  
+        "input_csv_path": input_csv_path,  
+        "logger": logger,  
+        "all_columns": list(sample_df.columns),  
+        "schema": TemplateSchema(sample_df.columns, sample_df.iloc[0], FIELDS_FROM_AMZ),  
+        "rows": reader,  
+    }  
+
+def open_output(job):  
+    """Mở file output (ghi dần theo thứ tự cột template) cho một job"""  
+    job["writer"] = StreamingCsvWriter(output_path_for(job["input_csv_path"]), job["all_columns"], logger=job["logger"])  
+    job["failures"] = FailureReport(job["writer"].output_csv_path, logger=job["logger"])  
+    job["products"] = ProductGroupWriter(job["writer"], job["logger"])  
+
+def add_result(job, item, amz_info):  
+    """Ghép kết quả scrape của một dòng input vào file output (gọi theo đúng thứ tự dòng)"""  
+    logger = job["logger"]  
+    line, row, asin = item  
+
+    if not amz_info or not amz_info.get("Title"):  
+        logger.warning(f"Không lấy được thông tin cho ASIN dòng {line}: {asin}")  
+        job["failures"].add(line, asin, get_metrics().failed_asins.get(asin))  
+        return  
+
+    schema = job["schema"]  
+    new_row = schema.new_variant()  
+
+    # Giữ nguyên Variant SKU gốc; ASIN đã chuẩn hóa chỉ dùng để scrape và gộp dòng trùng  
+    new_row["Variant SKU"] = row["Variant SKU"]  
+
+    # Giữ Vendor gốc nếu có, hoặc mặc định "Amazon"  
+    new_row["Vendor"] = row.get("Vendor", "Amazon")  
+
+    # Lấy thông tin từ Amazon  
+    schema.apply_amazon(new_row, amz_info)  
+        
+    # Nhóm các biến thể theo sản phẩm, ảnh đã lấy cùng lần tải trang  
+    images = amz_info["Image Src"].split(',') if amz_info.get("Image Src") else []  
+    job["products"].add(new_row["Handle"], new_row, images)  
+    
+    logger.info(f"✓ Imported ASIN {asin}: {amz_info['Title'][:40]}")  
+
+def close_output(job):  
+    """Ghi nhóm sản phẩm cuối và hoàn tất file output"""  
+    logger = job["logger"]  
+    job["products"].close()  
+    output_csv_path = job["writer"].close()  
+    job["failures"].close()  
+    if output_csv_path is None:  
+        logger.error("Không có dòng nào được import.")  
+        return  
+    logger.info(f"Đã xuất ra file đúng format: {output_csv_path}")  
+    return output_csv_path  
+
+def iter_results(jobs, workers, logger, processes=None, queue=None):  
+    """Kết quả (file_index, dòng, thông tin) theo thứ tự input: trong một tiến trình, chia cho nhiều tiến trình,  
+    hoặc qua hàng đợi chung do các worker trên nhiều máy xử lý"""  
+    if queue is not None:  
+        return iter_queue_results([job["rows"] for job in jobs], queue, logger, get_asin=lambda item: item[2],  
+            resume=get_checkpoint().resume)  
+    processes = process_count(processes, [job["input_csv_path"] for job in jobs], logger)  
+    if processes > 1:  
+        return iter_sharded_results(  
+            [job["rows"] for job in jobs],  
+            [job["input_csv_path"] for job in jobs],  
+            ScrapeWorker,  
+            processes,  
+            workers,  
+            logger,  
+            build_info=build_amazon_info,  
+            resume=get_checkpoint().resume,  
+            get_asin=lambda item: item[2],  
+            setup_logger=setup_logger  
+        )  
+    return iter_file_results(  
+        [job["rows"] for job in jobs],  
+        lambda: ScrapeWorker(logger),  
+        workers,  
+        logger,  
+        get_asin=lambda item: item[2],  
+        checkpoint=get_checkpoint(),  
+        prefetch=lambda asins: prefetch_infos(asins, build_amazon_info, logger)  
+    )  
+
+def work_queue(queue, workers=None, logger=None):  
+    """Chế độ worker (--role worker): nhận ASIN từ hàng đợi chung và ghi kết quả lại, không cần file input"""  
+    logger = logger or setup_logger("queue_worker")  
+    return run_queue_worker(queue, lambda: ScrapeWorker(logger), workers, logger,  
+                            prefetch=lambda asins: prefetch_infos(asins, build_amazon_info, logger))  
+
+def process_jobs(jobs, workers=None, logger=None, processes=None, queue=None):  
+    """Scrape ASIN của mọi file bằng chung một WorkerPool, ghi từng dòng ra file ngay khi xong"""  
+    logger = logger or setup_logger("worker_pool")  
+    jobs = [job for job in jobs if job is not None]  
+    for job in jobs:  
+        open_output(job)  
+
+    try:  
+        # Metrics ghi định kỳ trong lúc chạy và một lần cuối (CONFIG.METRICS_FILE, CONFIG.METRICS_TEXTFILE)  
+        with MetricsExporter(logger=logger):  
+            for file_index, item, amz_info in iter_results(jobs, workers, logger, processes, queue):  
+                with get_metrics().phase("csv"):  
+                    add_result(jobs[file_index], item, amz_info)  
+    except BaseException:  
+        for job in jobs:  
+            job["writer"].abort()  
+        raise  
+
+    logger.info(get_page_cache().summary())  
+    logger.info(get_rate_limiter().summary())  
+    logger.info(get_selector_stats().summary())  
+    logger.info(get_product_store().summary())  
+    return [close_output(job) for job in jobs]  
+
+def process_file(input_csv_path, sample_template_path, logger=None, workers=None, processes=None, queue=None):  
+    if logger is None:  
+        logger = setup_logger(os.path.basename(input_csv_path))  
+    job = load_input(input_csv_path, sample_template_path, logger)  
+    if job is None:  
+        return  
+    return process_jobs([job], workers, logger, processes, queue)[0]  
+
+def process_multiple_files(file_pairs, workers=None, processes=None, queue=None):  
+    # Một hàng đợi ASIN chung cho mọi file, N driver cùng xử lý (mỗi tiến trình N driver khi processes > 1)  
+    jobs = [load_input(input_csv, template_csv, setup_logger(os.path.basename(input_csv)))  
+            for input_csv, template_csv in file_pairs]  
+    process_jobs(jobs, workers, processes=processes, queue=queue)  
+
+    print("Tất cả các file đã xử lý xong.")  
+
+if __name__ == "__main__":  
+    # Có thể xử lý một file đơn:  
+    args = parse_args('Amazon to Shopify CSV Processor')  
+    queue = open_queue(args.queue) if args.queue else None  
+    if queue is not None and args.role == "worker":  
+        work_queue(queue, workers=args.browsers)  
+    else:  
+        process_file(args.input, args.template, workers=args.browsers, processes=args.processes, queue=queue)  
+    
+    # # Hoặc xử lý nhiều file cùng lúc:  
+    # """  
+    # file_pairs = [  
+    #     (r"C:\Users\Dellpro\Documents\Shopify products\products_export\Pet\quanaochomeo_export\quanaochomeo_export.csv",   
+    #      r"C:\Users\Dellpro\Documents\Shopify products\template.csv"),  
+    #     (r"C:\Users\Dellpro\Documents\Shopify products\products_export\Pet\dochamsocthu_export\dochamsocthu_export.csv",   
+    #      r"C:\Users\Dellpro\Documents\Shopify products\template.csv"),  
+    # ]  
+    # process_multiple_files(file_pairs)  
     # """
\ No newline at end of file
@@ -1,159 +1,272 @@
-import pandas as pd  
-import time  
-import random  
-import re  
-import os  
-import sys  
-import json  
-import unidecode  
-import numpy as np  
-import logging  
-from logging.handlers import RotatingFileHandler  
-from collections import defaultdict  
-from concurrent.futures import ThreadPoolExecutor, as_completed  
-from selenium import webdriver  
-from selenium.webdriver.chrome.options import Options  
-from selenium.webdriver.chrome.service import Service  
-from selenium.webdriver.common.by import By  
-from selenium.webdriver.support.ui import WebDriverWait  
-from selenium.webdriver.support import expected_conditions as EC  
-
-def setup_logger(name, level=logging.INFO, log_dir="logs"):  
-    """Thiết lập logger"""  
-    if not os.path.exists(log_dir):  
-        os.makedirs(log_dir)  
-    
-    logger = logging.getLogger(name)  
-    logger.setLevel(level)  
-    
-    # Thiết lập file log với RotatingFileHandler  
-    handler = RotatingFileHandler(os.path.join(log_dir, f"{name}.log"), maxBytes=5*1024*1024, backupCount=3)  
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')  
-    handler.setFormatter(formatter)  
-    
-    logger.addHandler(handler)  
-    return logger  
-
-def parse_proxy(proxy_string):  
-    """Phân tích chuỗi proxy có định dạng 'ip:port:username:password'"""  
-    parts = proxy_string.strip().split(':')  
-    if len(parts) == 4:  
-        ip, port, username, password = parts  
-        return {  
-            'http': f'http://{username}:{password}@{ip}:{port}',  
-            'https': f'http://{username}:{password}@{ip}:{port}'  
-        }  
-    elif len(parts) == 2:  
-        ip, port = parts  
-        return {  
-            'http': f'http://{ip}:{port}',  
-            'https': f'http://{ip}:{port}'  
-        }  
-    return None  
-
-class AmazonScraper:  
-    """Lớp chịu trách nhiệm scrape thông tin sản phẩm từ Amazon"""  
-    
-    def __init__(self, logger=None, proxies=None):  
-        self.logger = logger or logging.getLogger(__name__)  
-        self.driver = self._create_driver()  
-        self.proxies = proxies or []  
-        self.current_proxy_index = 0  
-        
-    def _create_driver(self):  
-        """Tạo và trả về WebDriver Selenium với các tùy chọn để tránh phát hiện"""  
-        chrome_options = Options()  
-        chrome_options.add_argument("--headless")  
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')  
-        user_agent = random.choice(['Mozilla/5.0 (Windows NT 10.0; Win64; x64)', 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)'])  
-        chrome_options.add_argument(f'user-agent={user_agent}')  
-        
-        # Thêm proxy nếu có  
-        if self.proxies:  
-            proxy = self.proxies[self.current_proxy_index]  
-            chrome_options.add_argument(f'--proxy-server={proxy}')  
-        
-        driver = webdriver.Chrome(options=chrome_options)  
-        self.logger.info("WebDriver đã khởi tạo thành công")  
-        return driver  
-    
-    def get_product_info(self, asin):  
-        """Lấy tất cả thông tin sản phẩm"""  
-        url = f'https://www.amazon.com/dp/{asin}'  
-        self.driver.get(url)  
-        time.sleep(random.uniform(2, 4))  
-        
-        title = self.driver.find_element(By.CSS_SELECTOR, "span#productTitle").text.strip()  
-        price = self.driver.find_element(By.CSS_SELECTOR, "span#priceblock_ourprice").text.strip()  
-        # Lấy mô tả ngắn  
-        description = self.driver.find_element(By.CSS_SELECTOR, "#feature-bullets").text.strip()  
-
-        return {  
-            "Title": title,  
-            "Price": price,  
-            "Description": description  
-        }  
-
-    def __del__(self):  
-        """Hủy scraper, đóng driver nếu do scraper tạo"""  
-        self.driver.quit()  
-
-class ShopifyCSVProcessor:  
-    """Lớp chịu trách nhiệm xử lý tệp CSV cho Shopify"""  
-
-    def __init__(self, logger=None, proxies=None):  
-        self.logger = logger or logging.getLogger(__name__)  
-        self.amazon_scraper = AmazonScraper(logger=self.logger, proxies=proxies)  
-    
-    def process_file(self, input_csv_path, output_csv_path):  
-        """Xử lý tệp CSV input và xuất ra tệp CSV theo mẫu template"""  
-        self.logger.info(f"Bắt đầu xử lý {input_csv_path}")  
-
-        try:  
-            asin_df = pd.read_csv(input_csv_path)  
-            results = []  
-
-            for _, row in asin_df.iterrows():  
-                asin = row['Variant SKU']  
-                self.logger.info(f"Xử lý ASIN: {asin}")  
-
-                product_info = self.amazon_scraper.get_product_info(asin)  
-                results.append(product_info)  
-
-            output_df = pd.DataFrame(results)  
-            output_df.to_csv(output_csv_path, index=False)  
-
-            self.logger.info(f"Đã xuất ra file: {output_csv_path}")  
-            return output_csv_path  
-        
-        except Exception as e:  
-            self.logger.error(f"Lỗi khi xử lý file {input_csv_path}: {e}", exc_info=True)  
-            return None  
-
-if __name__ == "__main__":  
-    import argparse  
-
-    # Thiết lập command line arguments  
-    parser = argparse.ArgumentParser(description='Amazon to Shopify CSV Processor')  
-    parser.add_argument('--input', help='Đường dẫn tới file CSV chứa ASINs')  
-    parser.add_argument('--output', help='Đường dẫn tới file CSV xuất')  
-    parser.add_argument('--log-dir', default='logs', help='Thư mục chứa file log')  
-
-    args = parser.parse_args()  
-
-    # Thiết lập logging cơ bản  
-    logging.basicConfig(  
-        level=logging.INFO,  
-        format='%(asctime)s - %(levelname)s - %(message)s'  
-    )  
-
-    # Tạo thư mục log nếu chưa tồn tại  
-    if not os.path.exists(args.log_dir):  
-        os.makedirs(args.log_dir)  
-    
-    # Tạo logger cho chính  
-    logger = setup_logger("MainProcessor", log_dir=args.log_dir)  
-
-    # Tạo processor và xử lý file  
-    processor = ShopifyCSVProcessor(logger=logger)  
-    output_file = processor.process_file(args.input, args.output)
\ No newline at end of file
+import random  
+import re  
+import os  
+import sys  
+import json  
+import unidecode  
+import numpy as np  
+import logging  
+from logging.handlers import RotatingFileHandler  
+from collections import defaultdict  
+from concurrent.futures import ThreadPoolExecutor, as_completed  
+from selenium import webdriver  
+from selenium.webdriver.chrome.options import Options  
+from selenium.webdriver.chrome.service import Service  
+from selenium.webdriver.support.ui import WebDriverWait  
+from selenium.webdriver.support import expected_conditions as EC  
+
+from html_extractor import extract_product
+from browser_profile import apply_resource_policy, block_resources
+from driver_lifecycle import DriverWatchdog, install_signal_handlers
+from page_cache import get_page_cache
+from rate_limiter import get_rate_limiter
+from input_reader import InputReader
+from readiness import PageReadiness, FAILED_PAGE_STATES
+from metrics import get_metrics, MetricsExporter
+from selector_stats import get_selector_stats
+from cli import add_cache_arguments, apply_cache_arguments
+from retry_queue import iter_with_retries
+from csv_writer import StreamingCsvWriter, FailureReport
+
+def setup_logger(name, level=logging.INFO, log_dir="logs"):  
+    """Thiết lập logger"""  
+    if not os.path.exists(log_dir):  
+        os.makedirs(log_dir)  
+    
+    logger = logging.getLogger(name)  
+    logger.setLevel(level)  
+    
+    # Thiết lập file log với RotatingFileHandler  
+    handler = RotatingFileHandler(os.path.join(log_dir, f"{name}.log"), maxBytes=5*1024*1024, backupCount=3)  
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')  
+    handler.setFormatter(formatter)  
+    
+    logger.addHandler(handler)  
+    return logger  
+
+def parse_proxy(proxy_string):  
+    """Phân tích chuỗi proxy có định dạng 'ip:port:username:password'"""  
+    parts = proxy_string.strip().split(':')  
+    if len(parts) == 4:  
+        ip, port, username, password = parts  
+        return {  
+            'http': f'http://{username}:{password}@{ip}:{port}',  
+            'https': f'http://{username}:{password}@{ip}:{port}'  
+        }  
+    elif len(parts) == 2:  
+        ip, port = parts  
+        return {  
+            'http': f'http://{ip}:{port}',  
+            'https': f'http://{ip}:{port}'  
+        }  
+    return None  
+
+class AmazonScraper:  
+    """Lớp chịu trách nhiệm scrape thông tin sản phẩm từ Amazon"""  
+    
+    def __init__(self, logger=None, proxies=None):  
+        self.logger = logger or logging.getLogger(__name__)  
+        self.proxies = proxies or []  
+        self.current_proxy_index = 0  
+        self.driver = self._create_driver()  
+        self.watchdog = DriverWatchdog(self.driver, logger=self.logger)  
+        
+    def _create_driver(self):  
+        """Tạo và trả về WebDriver Selenium với các tùy chọn để tránh phát hiện"""  
+        chrome_options = Options()  
+        chrome_options.add_argument("--headless")  
+        chrome_options.add_argument('--disable-blink-features=AutomationControlled')  
+        user_agent = random.choice(['Mozilla/5.0 (Windows NT 10.0; Win64; x64)', 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)'])  
+        chrome_options.add_argument(f'user-agent={user_agent}')  
+        
+        # Thêm proxy nếu có  
+        if self.proxies:  
+            proxy = self.proxies[self.current_proxy_index]  
+            chrome_options.add_argument(f'--proxy-server={proxy}')  
+        
+        # Không tải ảnh/CSS/font/quảng cáo, driver.get trả về khi DOM sẵn sàng (CONFIG.BLOCK_RESOURCES)  
+        apply_resource_policy(chrome_options)  
+        driver = webdriver.Chrome(options=chrome_options)  
+        block_resources(driver)  
+        self.logger.info("WebDriver đã khởi tạo thành công")  
+        return driver  
+    
+    def get_product_info(self, asin):  
+        """Lấy tất cả thông tin sản phẩm"""  
+        # Kiểm tra page cache trước khi mở trang  
+        cache = get_page_cache()  
+        fields = cache.get(asin)  
+        if not fields:  
+            metrics = get_metrics()  
+            url = f'https://www.amazon.com/dp/{asin}'  
+            with metrics.phase("rate_limit"):  
+                get_rate_limiter().acquire(url)  
+            self.watchdog.record_page()  
+            with metrics.phase("navigate"):  
+                self.driver.get(url)  
+            readiness = PageReadiness(self.driver, logger=self.logger)  
+            # Trang không tìm thấy / bị chặn: trả về dòng trống ngay  
+            with metrics.phase("classify"):  
+                state = readiness.classify()  
+            if state in FAILED_PAGE_STATES:  
+                metrics.note_failure(state)  
+                return {"Title": "", "Price": "", "Description": ""}  
+            # Chờ tiêu đề và giá có dữ liệu thay vì sleep cố định  
+            with metrics.phase("wait"):  
+                waited = readiness.wait(("title", "price"))  
+            if waited["title"] is None:  
+                metrics.note_failure("title_timeout")  
+            
+            # Lấy page_source một lần, parse title/giá/mô tả ngắn trong tiến trình  
+            with metrics.phase("extract"):  
+                fields = extract_product(self.driver.page_source, asin, logger=self.logger)  
+            if fields["title"]:  
+                cache.put(asin, fields)  
+
+        return {  
+            "Title": fields["title"],  
+            "Price": fields["price"],  
+            "Description": fields["feature_text"].replace('<br>', '\n')  
+        }  
+
+    def recycle_if_needed(self, failed=False):  
+        """Thay driver mới khi driver chết, đã tải quá nhiều trang hoặc Chrome quá RSS, trả về lý do"""  
+        reason = self.watchdog.restart_reason(failed)  
+        if reason:  
+            self.logger.info(f"Khởi động lại driver ({reason})")  
+            self.watchdog.quit()  
+            self.driver = self._create_driver()  
+            self.watchdog = DriverWatchdog(self.driver, logger=self.logger)  
+        return reason  
+
+    def close(self):  
+        """Đóng driver (gọi được nhiều lần)"""  
+        if getattr(self, 'driver', None) is not None:  
+            self.watchdog.quit()  
+            self.driver = None  
+
+    def __enter__(self):  
+        return self  
+
+    def __exit__(self, exc_type, exc, tb):  
+        self.close()  
+
+    def __del__(self):  
+        """Hủy scraper, đóng driver nếu do scraper tạo"""  
+        self.close()  
+
+class ShopifyCSVProcessor:  
+    """Lớp chịu trách nhiệm xử lý tệp CSV cho Shopify"""  
+
+    # Cột của file output, theo thứ tự các trường get_product_info trả về  
+    OUTPUT_COLUMNS = ["Title", "Price", "Description"]  
+
+    def __init__(self, logger=None, proxies=None):  
+        self.logger = logger or logging.getLogger(__name__)  
+        self.amazon_scraper = AmazonScraper(logger=self.logger, proxies=proxies)  
+
+    def close(self):  
+        self.amazon_scraper.close()  
+
+    def __enter__(self):  
+        return self  
+
+    def __exit__(self, exc_type, exc, tb):  
+        self.close()  
+    
+    def process_file(self, input_csv_path, output_csv_path):  
+        """Xử lý tệp CSV input và xuất ra tệp CSV theo mẫu template"""  
+        self.logger.info(f"Bắt đầu xử lý {input_csv_path}")  
+
+        def fetch(asin):  
+            # Chromedriver chết thì urllib3 báo lỗi kết nối chứ không phải WebDriverException: ghi lý do lỗi,  
+            # trả về None để driver được thay và ASIN vào hàng đợi chạy lại, các dòng đã xong vẫn giữ nguyên  
+            try:  
+                return self.amazon_scraper.get_product_info(asin)  
+            except Exception as e:  
+                self.logger.warning(f"Lỗi driver khi xử lý ASIN {asin}: {e}")  
+                get_metrics().note_failure(type(e).__name__)  
+                return None  
+
+        def scrape(item):  
+            _, row, asin = item  
+            self.logger.info(f"Xử lý ASIN: {asin}")  
+            product_info = fetch(asin)  
+
+            # Driver được thay mới giữa chừng thì chạy lại ASIN chưa lấy được một lần  
+            failed = not (product_info and product_info["Title"])  
+            if self.amazon_scraper.recycle_if_needed(failed) and failed:  
+                get_metrics().take_failure()  
+                product_info = fetch(asin)  
+            return product_info, get_metrics().record_page(product_info, asin=asin)  
+
+        # Ghi dần từng dòng theo thứ tự input, lỗi giữa chừng vẫn giữ các dòng đã xong trong file .partial  
+        writer = StreamingCsvWriter(output_csv_path, self.OUTPUT_COLUMNS, encoding='utf-8', logger=self.logger)  
+        try:  
+            failures = FailureReport(output_csv_path, logger=self.logger)  
+
+            # ASIN lỗi được hẹn chạy lại (backoff lũy thừa) xen giữa các ASIN mới, kết quả vẫn theo thứ tự input  
+            items = InputReader(input_csv_path, logger=self.logger)  
+            for (line, row, asin), product_info in iter_with_retries(items, scrape, get_asin=lambda item: item[2],  
+                                                                     logger=self.logger):  
+                failure = get_metrics().failed_asins.get(asin)  
+                if failure:  
+                    failures.add(line, asin, failure)  
+                with get_metrics().phase("csv"):  
+                    writer.write_row(product_info or {})  
+
+            if writer.close() is None:  
+                self.logger.error("Không có dòng nào được xuất.")  
+            else:  
+                self.logger.info(f"Đã xuất ra file: {output_csv_path}")  
+            failures.close()  
+            self.logger.info(get_page_cache().summary())  
+            self.logger.info(get_selector_stats().summary())  
+            return output_csv_path  
+        
+        except Exception as e:  
+            writer.abort()  
+            self.logger.error(f"Lỗi khi xử lý file {input_csv_path}: {e}", exc_info=True)  
+            return None  
+        except BaseException:  
+            writer.abort()  
+            raise  
+
+if __name__ == "__main__":  
+    import argparse  
+
+    # Thiết lập command line arguments  
+    parser = argparse.ArgumentParser(description='Amazon to Shopify CSV Processor')  
+    parser.add_argument('--input', help='Đường dẫn tới file CSV chứa ASINs')  
+    parser.add_argument('--output', help='Đường dẫn tới file CSV xuất')  
+    parser.add_argument('--log-dir', default='logs', help='Thư mục chứa file log')  
+    add_cache_arguments(parser)  
+
+    args = parser.parse_args()  
+    # Kiểm tra tham số trước khi mở trình duyệt (ShopifyCSVProcessor tạo driver ngay khi khởi tạo)  
+    if not args.input or not os.path.exists(args.input):  
+        parser.error(f"Không tìm thấy file input: {args.input}")  
+    if not args.output:  
+        parser.error("Cần --output")  
+    apply_cache_arguments(args)  
+
+    # Thiết lập logging cơ bản  
+    logging.basicConfig(  
+        level=logging.INFO,  
+        format='%(asctime)s - %(levelname)s - %(message)s'  
+    )  
+
+    # Tạo thư mục log nếu chưa tồn tại  
+    if not os.path.exists(args.log_dir):  
+        os.makedirs(args.log_dir)  
+    
+    # Tạo logger cho chính  
+    logger = setup_logger("MainProcessor", log_dir=args.log_dir)  
+
+    # SIGTERM/SIGHUP cũng đi qua khối with để đóng driver  
+    install_signal_handlers()  
+
+    # Tạo processor và xử lý file  
+    # Metrics ghi định kỳ trong lúc chạy và một lần cuối (CONFIG.METRICS_FILE, CONFIG.METRICS_TEXTFILE)  
+    with ShopifyCSVProcessor(logger=logger) as processor, MetricsExporter(logger=logger):  
+        output_file = processor.process_file(args.input, args.output)
\ No newline at end of file
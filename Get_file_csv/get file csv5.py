@@ -1,210 +1,347 @@
-import pandas as pd  
-import time  
-import random  
-import re  
-import os  
-import unidecode  
-import logging  
-
-from selenium import webdriver  
-from selenium.webdriver.chrome.options import Options  
-from selenium.webdriver.common.by import By  
-from selenium.webdriver.support.ui import WebDriverWait  
-from selenium.webdriver.support import expected_conditions as EC  
-
-from config import CONFIG
-
-def slugify(text):  
-    text = unidecode.unidecode(text)  
-    text = re.sub(r"[^\w\s-]", '', text).strip().lower()  
-    return re.sub(r"[-\s]+", '-', text)  
-
-def convert_to_fullsize(img_url):  
-    if not img_url:  
-        return img_url  
-    return img_url.replace('_SS40_', '') \
-                  .replace('_SX40_', '') \
-                  .replace('_SY40_', '') \
-                  .replace('_AC_US40_', '') \
-                  .replace('_AC_US100_', '') \
-                  .replace('_AC_SY400_', '') \
-                  .replace('_AC_SY879_', '') \
-                  .replace('_AC_SR38,50_', '') \
-                  .replace('_CR40,40,400,400_', '')  
-
-def create_driver():  
-    chrome_options = Options()  
-    chrome_options.add_argument("--headless")  
-    chrome_options.add_argument('--disable-blink-features=AutomationControlled')  
-    chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])  
-    chrome_options.add_experimental_option('useAutomationExtension', False)  
-    driver = webdriver.Chrome(options=chrome_options)  
-    return driver  
-
-def get_amazon_images(asin, driver, logger):
-    selectors = [
-        {'main': "#landingImage", 'thumbs': "#altImages img"},
-        {'main': "#imgBlkFront", 'thumbs': "#imageBlockThumbs img"},
-        {'main': ".a-dynamic-image", 'thumbs': ".a-spacing-small.item img"}
-    ]
-    
-    img_urls = []
-    
-    for selector_set in selectors:
-        try:
-            # Thử lấy ảnh chính
-            main_elements = driver.find_elements(By.CSS_SELECTOR, selector_set['main'])
-            for el in main_elements:
-                src = el.get_attribute('src')
-                if src:
-                    img_urls.append(convert_to_fullsize(src))
-            
-            # Thử lấy ảnh nhỏ
-            thumb_elements = driver.find_elements(By.CSS_SELECTOR, selector_set['thumbs'])
-            for el in thumb_elements:
-                src = el.get_attribute('src')
-                if src and not re.search(r'_CB\d+.*_FMpng_RI_', src):
-                    img_urls.append(convert_to_fullsize(src))
-                    
-            # Nếu tìm thấy ít nhất một ảnh, thoát vòng lặp
-            if img_urls:
-                break
-        except Exception as e:
-            logger.debug(f"Selector không phù hợp {selector_set}: {e}")
-            continue
-    
-    # Loại bỏ trùng lặp
-    return list(dict.fromkeys(img_urls))
-
-def get_amazon_info(asin, driver, logger):  
-    url = f"{CONFIG['base_url']}{asin}"  
-    driver.get(url)  
-    try:  
-        wait = WebDriverWait(driver, CONFIG['timeout'])  
-        wait.until(EC.presence_of_element_located((By.ID, "productTitle")))  
-        wait.until(EC.presence_of_element_located((By.ID, "tp-tool-tip-subtotal-price-value")))  
-        wait.until(EC.presence_of_element_located((By.ID, "feature-bullets")))  
-        wait.until(EC.presence_of_element_located((By.ID, "landingImage")))  
-        wait.until(EC.presence_of_element_located((By.ID, "altImages")))  
-    except Exception as e:  
-        logger.warning(f"Timeout load trang chính cho ASIN {asin}: {e}")  
-        return {}  
-
-    time.sleep(random.uniform(CONFIG['min_delay'], CONFIG['max_delay']))  # đợi trang tải hết nội dung  
-
-    # Lấy title  
-    try:  
-        title = driver.find_element(By.ID, "productTitle").text.strip()  
-    except Exception as e:  
-        logger.warning(f"Không lấy được title ASIN {asin}: {e}")  
-        title = ''  
-
-    # Lấy giá  
-    try:  
-        price_raw = driver.find_element(By.ID, "tp-tool-tip-subtotal-price-value").text.strip()  
-        price = price_raw.replace("$", "").replace(",", "").strip()  
-    except Exception as e:  
-        logger.warning(f"Không lấy được giá ASIN {asin}: {e}")  
-        price = ''  
-
-    # Lấy mô tả chi tiết  
-    try:  
-        detailed_desc = driver.find_element(By.ID, "feature-bullets").text.strip().replace('\n', '<br>')  
-    except Exception as e:  
-        logger.warning(f"Không lấy được mô tả chi tiết ASIN {asin}: {e}")  
-        detailed_desc = ''  
-
-    body_html = detailed_desc  
-
-    # Lấy toàn bộ ảnh (ảnh chính + thumbnails)  
-    images = get_amazon_images(asin, driver, logger)  
-
-    info = {  
-        "Handle": (slugify(title) + "-" + asin[-4:]) if title else asin,  
-        "Title": title,  
-        "Body (HTML)": body_html,  
-        "Vendor": "Amazon",  
-        "Tags": f"Amazon Import,{asin}",  
-        "Variant Grams": "",  
-        "Variant Price": price,  
-        "Variant Barcode": asin,  
-        "Image Src": ','.join(images) if images else "",  
-        "Image Position": 1,  
-    }  
-
-    return info
-
-def process_file(input_csv_path, sample_template_path, logger):  
-    sample_df = pd.read_csv(sample_template_path)  
-    template_row = sample_df.iloc[0].copy()  
-
-    asin_df = pd.read_csv(input_csv_path)  
-    if 'Variant SKU' not in asin_df.columns:  
-        logger.error("File input phải có cột 'Variant SKU' (ASIN)")  
-        return  
-
-    asin_df = asin_df.dropna(subset=['Variant SKU'])  
-    asin_df = asin_df[asin_df['Variant SKU'].astype(str).str.strip() != '']  
-
-    fields_from_amz = [  
-        "Handle", "Title", "Body (HTML)", "Tags",  
-        "Variant Grams", "Variant Price",  
-        "Image Src", "Image Position"  
-    ]  
-    all_columns = list(sample_df.columns)  
-
-    driver = create_driver()  
-    rows_full = []  
-
-    for i, row in asin_df.iterrows():  
-        asin_raw = row['Variant SKU']  
-        asin = str(asin_raw).strip()  
-        logger.info(f"Đang xử lý ASIN dòng {i+2}: {asin}")  
-
-        amz_info = get_amazon_info(asin, driver, logger)  
-        if not amz_info or not amz_info.get("Title"):  
-            logger.warning(f"Không lấy được thông tin cho ASIN {asin}")  
-            continue  
-
-        new_row = template_row.copy()  
-
-        # Giữ nguyên Variant SKU gốc  
-        new_row["Variant SKU"] = row["Variant SKU"]  
-
-        # Giữ Vendor gốc nếu có, hoặc mặc định "Amazon"  
-        new_row["Vendor"] = row.get("Vendor", "Amazon")  
-
-        # Giữ Variant Barcode gốc hoặc lấy từ amz_info  
-        new_row["Variant Barcode"] = row.get("Variant Barcode", amz_info.get("Variant Barcode", ""))  
-
-        for field in fields_from_amz:  
-            new_row[field] = amz_info.get(field, new_row.get(field, ""))  
-
-        rows_full.append(new_row)  
-        logger.info(f"✓ Imported ASIN {asin}: {amz_info['Title'][:40]}")  
-        time.sleep(random.uniform(CONFIG['min_delay'], CONFIG['max_delay']))  
-
-    driver.quit()  
-
-    if not rows_full:  
-        logger.error("Không có dòng nào được import.")  
-        return  
-
-    out_df = pd.DataFrame(rows_full, columns=all_columns)  
-
-    base, ext = os.path.splitext(input_csv_path)  
-    output_csv_path = f"{base}_update{ext}"  
-
-    out_df.to_csv(output_csv_path, index=False, encoding='utf-8-sig')  
-    logger.info(f"Đã xuất ra file đúng format: {output_csv_path}")  
-
-if __name__ == "__main__":  
-    logging.basicConfig(  
-        level=logging.INFO,  
-        format='%(asctime)s - %(levelname)s - %(message)s'  
-    )  
-    logger = logging.getLogger()  
-
-    asin_input = r"C:\Users\Dellpro\Documents\Shopify products\demo.csv"  
-    template_file = r"C:\Users\Dellpro\Documents\Shopify products\products_export\Decor\caytrangtri_export\caytrangtri_export_update.csv"  
-    process_file(asin_input, template_file, logger)
\ No newline at end of file
+import pandas as pd  
+import re  
+import unidecode  
+import logging  
+import functools  
+
+from selenium import webdriver  
+from selenium.webdriver.chrome.options import Options  
+from selenium.webdriver.common.by import By  
+
+from config import CONFIG
+from js_extractor import extract_from_driver
+from worker_pool import iter_file_results
+from process_pool import iter_sharded_results, process_count
+from job_queue import open_queue, iter_queue_results, run_queue_worker
+from http_fetcher import prefetch_infos
+from browser_profile import apply_resource_policy, block_resources
+from driver_lifecycle import DriverWatchdog
+from page_cache import get_page_cache
+from rate_limiter import get_rate_limiter
+from checkpoint import get_checkpoint
+from readiness import PageReadiness, FAILED_PAGE_STATES
+from timing import PhaseTimer
+from metrics import get_metrics, MetricsExporter
+from selector_stats import get_selector_stats
+from product_store import get_product_store
+from records import TemplateSchema
+from input_reader import InputReader
+from csv_writer import StreamingCsvWriter, FailureReport, output_path_for
+from cli import parse_args
+
+def slugify(text):  
+    text = unidecode.unidecode(text)  
+    text = re.sub(r"[^\w\s-]", '', text).strip().lower()  
+    return re.sub(r"[-\s]+", '-', text)  
+
+def convert_to_fullsize(img_url):  
+    if not img_url:  
+        return img_url  
+    return img_url.replace('_SS40_', '') \
+                  .replace('_SX40_', '') \
+                  .replace('_SY40_', '') \
+                  .replace('_AC_US40_', '') \
+                  .replace('_AC_US100_', '') \
+                  .replace('_AC_SY400_', '') \
+                  .replace('_AC_SY879_', '') \
+                  .replace('_AC_SR38,50_', '') \
+                  .replace('_CR40,40,400,400_', '')  
+
+def create_driver():  
+    chrome_options = Options()  
+    chrome_options.add_argument("--headless")  
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')  
+    chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])  
+    chrome_options.add_experimental_option('useAutomationExtension', False)  
+    # Không tải ảnh/CSS/font/quảng cáo, driver.get trả về khi DOM sẵn sàng (CONFIG.BLOCK_RESOURCES)  
+    apply_resource_policy(chrome_options)  
+    driver = webdriver.Chrome(options=chrome_options)  
+    block_resources(driver)  
+    return driver  
+
+def get_amazon_images(asin, driver, logger, fields=None):
+    # Ưu tiên kết quả trích xuất một lần (HTML hoặc JS), chỉ quay lại find_elements khi không có ảnh
+    if fields is None:
+        fields = extract_from_driver(driver, asin, logger=logger)
+    img_urls = list(fields["images"])
+    if img_urls:
+        return img_urls
+    
+    for selector_set in CONFIG.SELECTORS['image_selectors']:
+        try:
+            # Thử lấy ảnh chính
+            main_elements = driver.find_elements(By.CSS_SELECTOR, selector_set['main'])
+            for el in main_elements:
+                src = el.get_attribute('src')
+                if src:
+                    img_urls.append(convert_to_fullsize(src))
+            
+            # Thử lấy ảnh nhỏ
+            thumb_elements = driver.find_elements(By.CSS_SELECTOR, selector_set['thumbs'])
+            for el in thumb_elements:
+                src = el.get_attribute('src')
+                if src and not re.search(r'_CB\d+.*_FMpng_RI_', src):
+                    img_urls.append(convert_to_fullsize(src))
+                    
+            # Nếu tìm thấy ít nhất một ảnh, thoát vòng lặp
+            if img_urls:
+                break
+        except Exception as e:
+            logger.debug(f"Selector không phù hợp {selector_set}: {e}")
+            continue
+    
+    # Loại bỏ trùng lặp
+    return list(dict.fromkeys(img_urls))
+
+def get_amazon_info(asin, driver, logger, timer=None):  
+    # Page cache đã được xem ở bước prefetch (prefetch_infos), ASIN tới đây luôn cần mở trang  
+    timer = timer or PhaseTimer()  
+    url = f"{CONFIG.BASE_URL}{asin}"  
+    with timer.phase("rate_limit"):  
+        get_rate_limiter().acquire(url)  
+    with timer.phase("navigate"):  
+        driver.get(url)  
+
+    # Trang không tìm thấy / bị chặn: bỏ qua ngay, không chờ tiêu đề tới hết hạn  
+    readiness = PageReadiness(driver, logger=logger)  
+    with timer.phase("classify"):  
+        state = readiness.classify()  
+    if state in FAILED_PAGE_STATES:  
+        get_metrics().note_failure(state)  
+        return {}  
+
+    # Chờ tới khi tiêu đề, giá, gallery ảnh có dữ liệu và DOM ngừng thay đổi (mỗi điều kiện có hạn riêng)  
+    with timer.phase("wait"):  
+        waited = readiness.wait(("title", "price", "images", "dom"))  
+    if waited["title"] is None:  
+        logger.warning(f"Timeout load trang chính cho ASIN {asin}: không thấy tiêu đề")  
+        get_metrics().note_failure("title_timeout")  
+        return {}  
+
+    # Trích xuất mọi trường theo CONFIG.SELECTORS trong một round trip (page_source hoặc execute_script)  
+    with timer.phase("extract"):  
+        fields = extract_from_driver(driver, asin, logger=logger)  
+    logger.info(f"Selector đã khớp cho ASIN {asin}: {fields['selectors']}")  
+
+    # Ảnh: ưu tiên kết quả trích xuất, thiếu thì thử lại bằng find_elements  
+    with timer.phase("images"):  
+        fields["images"] = get_amazon_images(asin, driver, logger, fields)  
+
+    if fields["title"]:  
+        get_page_cache().put(asin, fields)  
+
+    return build_amazon_info(asin, fields, logger)  
+
+def build_amazon_info(asin, fields, logger):  
+    """Tạo thông tin sản phẩm từ kết quả trích xuất (dùng chung cho Selenium và HTTP)"""  
+    title = fields["title"]  
+    if not title:  
+        logger.warning(f"Không lấy được title ASIN {asin}")  
+
+    price = fields["price"]  
+    if not price:  
+        logger.warning(f"Không lấy được giá ASIN {asin}")  
+
+    # Lấy mô tả chi tiết  
+    detailed_desc = fields["feature_text"]  
+    if not detailed_desc:  
+        logger.warning(f"Không lấy được mô tả chi tiết ASIN {asin}")  
+
+    body_html = detailed_desc  
+
+    # Lấy toàn bộ ảnh (ảnh chính + thumbnails)  
+    images = fields["images"]  
+
+    info = {  
+        "Handle": (slugify(title) + "-" + asin[-4:]) if title else asin,  
+        "Title": title,  
+        "Body (HTML)": body_html,  
+        "Vendor": "Amazon",  
+        "Tags": f"Amazon Import,{asin}",  
+        "Variant Grams": "",  
+        "Variant Price": price,  
+        "Variant Barcode": asin,  
+        "Image Src": ','.join(images) if images else "",  
+        "Image Position": 1,  
+    }  
+
+    return info
+
+class ScrapeWorker:  
+    """Một driver sống lâu dùng trong WorkerPool"""  
+
+    def __init__(self, logger):  
+        self.logger = logger  
+        self.driver = create_driver()  
+        self.timer = PhaseTimer()  
+        self.watchdog = DriverWatchdog(self.driver, logger=logger)  
+
+    def scrape(self, asin):  
+        self.logger.info(f"Đang xử lý ASIN: {asin}")  
+        self.watchdog.record_page()  
+        amz_info = get_amazon_info(asin, self.driver, self.logger, self.timer)  
+        return amz_info  
+
+    def restart_reason(self, failed=False):  
+        return self.watchdog.restart_reason(failed)  
+
+    def close(self):  
+        self.watchdog.quit()  
+        self.logger.info(self.timer.summary())  
+
+    def __enter__(self):  
+        return self  
+
+    def __exit__(self, exc_type, exc, tb):  
+        self.close()  
+
+# Fields sẽ lấy từ Amazon  
+FIELDS_FROM_AMZ = [  
+    "Handle", "Title", "Body (HTML)", "Tags",  
+    "Variant Grams", "Variant Price",  
+    "Image Src", "Image Position"  
+]  
+
+def load_input(input_csv_path, sample_template_path, logger):  
+    """Đọc template và danh sách ASIN của một file input"""  
+    sample_df = pd.read_csv(sample_template_path)  
+
+    # Đọc dần danh sách ASIN (theo từng khối), chỉ kiểm tra header trước  
+    reader = InputReader(input_csv_path, logger=logger)  
+    header = reader.read_header()  
+    if header is not None and 'Variant SKU' not in header:  
+        logger.error("File input phải có cột 'Variant SKU' (ASIN)")  
+        return None  
+
+    return {  
+        "input_csv_path": input_csv_path,  
+        "logger": logger,  
+        "all_columns": list(sample_df.columns),  
+        "schema": TemplateSchema(sample_df.columns, sample_df.iloc[0], FIELDS_FROM_AMZ),  
+        "rows": reader,  
+    }  
+
+def open_output(job):  
+    """Mở file output (ghi dần theo thứ tự cột template) cho một job"""  
+    job["writer"] = StreamingCsvWriter(output_path_for(job["input_csv_path"]), job["all_columns"], logger=job["logger"])  
+    job["failures"] = FailureReport(job["writer"].output_csv_path, logger=job["logger"])  
+
+def add_result(job, item, amz_info):  
+    """Ghép kết quả scrape của một dòng input và ghi ngay ra file output"""  
+    logger = job["logger"]  
+    line, row, asin = item  
+
+    if not amz_info or not amz_info.get("Title"):  
+        logger.warning(f"Không lấy được thông tin cho ASIN dòng {line}: {asin}")  
+        job["failures"].add(line, asin, get_metrics().failed_asins.get(asin))  
+        return  
+
+    schema = job["schema"]  
+    new_row = schema.new_variant()  
+
+    # Giữ nguyên Variant SKU gốc; ASIN đã chuẩn hóa chỉ dùng để scrape và gộp dòng trùng  
+    new_row["Variant SKU"] = row["Variant SKU"]  
+
+    # Giữ Vendor gốc nếu có, hoặc mặc định "Amazon"  
+    new_row["Vendor"] = row.get("Vendor", "Amazon")  
+
+    # Giữ Variant Barcode gốc hoặc lấy từ amz_info  
+    new_row["Variant Barcode"] = row.get("Variant Barcode", amz_info.get("Variant Barcode", ""))  
+
+    schema.apply_amazon(new_row, amz_info)  
+
+    job["writer"].write_row(new_row)  
+    logger.info(f"✓ Imported ASIN {asin}: {amz_info['Title'][:40]}")  
+
+def close_output(job):  
+    """Hoàn tất file output"""  
+    logger = job["logger"]  
+    output_csv_path = job["writer"].close()  
+    job["failures"].close()  
+    if output_csv_path is None:  
+        logger.error("Không có dòng nào được import.")  
+        return  
+    logger.info(f"Đã xuất ra file đúng format: {output_csv_path}")  
+    return output_csv_path  
+
+def iter_results(jobs, logger, workers=None, processes=None, queue=None):  
+    """Kết quả (file_index, dòng, thông tin) theo thứ tự input: trong một tiến trình, chia cho nhiều tiến trình,  
+    hoặc qua hàng đợi chung do các worker trên nhiều máy xử lý"""  
+    if queue is not None:  
+        return iter_queue_results([job["rows"] for job in jobs], queue, logger, get_asin=lambda item: item[2],  
+            resume=get_checkpoint().resume)  
+    processes = process_count(processes, [job["input_csv_path"] for job in jobs], logger)  
+    if processes > 1:  
+        return iter_sharded_results(  
+            [job["rows"] for job in jobs],  
+            [job["input_csv_path"] for job in jobs],  
+            ScrapeWorker,  
+            processes,  
+            workers,  
+            logger,  
+            build_info=functools.partial(build_amazon_info, logger=logger),  
+            resume=get_checkpoint().resume,  
+            get_asin=lambda item: item[2]  
+        )  
+    return iter_file_results(  
+        [job["rows"] for job in jobs],  
+        lambda: ScrapeWorker(logger),  
+        workers,  
+        logger,  
+        get_asin=lambda item: item[2],  
+        checkpoint=get_checkpoint(),  
+        prefetch=lambda asins: prefetch_infos(asins, lambda asin, fields: build_amazon_info(asin, fields, logger), logger)  
+    )  
+
+def work_queue(queue, logger, workers=None):  
+    """Chế độ worker (--role worker): nhận ASIN từ hàng đợi chung và ghi kết quả lại, không cần file input"""  
+    return run_queue_worker(queue, lambda: ScrapeWorker(logger), workers, logger,  
+                            prefetch=lambda asins: prefetch_infos(asins, lambda asin, fields: build_amazon_info(asin, fields, logger), logger))  
+
+def process_jobs(jobs, logger, workers=None, processes=None, queue=None):  
+    """Scrape ASIN của mọi file bằng chung một WorkerPool, ghi từng dòng ra file ngay khi xong"""  
+    jobs = [job for job in jobs if job is not None]  
+    for job in jobs:  
+        open_output(job)  
+
+    try:  
+        # Metrics ghi định kỳ trong lúc chạy và một lần cuối (CONFIG.METRICS_FILE, CONFIG.METRICS_TEXTFILE)  
+        with MetricsExporter(logger=logger):  
+            for file_index, item, amz_info in iter_results(jobs, logger, workers, processes, queue):  
+                with get_metrics().phase("csv"):  
+                    add_result(jobs[file_index], item, amz_info)  
+    except BaseException:  
+        for job in jobs:  
+            job["writer"].abort()  
+        raise  
+
+    logger.info(get_page_cache().summary())  
+    logger.info(get_rate_limiter().summary())  
+    logger.info(get_selector_stats().summary())  
+    logger.info(get_product_store().summary())  
+    return [close_output(job) for job in jobs]  
+
+def process_file(input_csv_path, sample_template_path, logger, workers=None, processes=None, queue=None):  
+    job = load_input(input_csv_path, sample_template_path, logger)  
+    if job is None:  
+        return  
+    return process_jobs([job], logger, workers, processes, queue)[0]  
+
+def process_multiple_files(file_pairs, logger, workers=None, processes=None, queue=None):  
+    # Một hàng đợi ASIN chung cho mọi file, N driver cùng xử lý (mỗi tiến trình N driver khi processes > 1)  
+    jobs = [load_input(input_csv, template_csv, logger) for input_csv, template_csv in file_pairs]  
+    return process_jobs(jobs, logger, workers, processes, queue)  
+
+if __name__ == "__main__":  
+    logging.basicConfig(  
+        level=logging.INFO,  
+        format='%(asctime)s - %(levelname)s - %(message)s'  
+    )  
+    logger = logging.getLogger()  
+
+    args = parse_args('Amazon to Shopify CSV Processor')  
+    queue = open_queue(args.queue) if args.queue else None  
+    if queue is not None and args.role == "worker":  
+        work_queue(queue, logger, workers=args.browsers)  
+    else:  
+        process_file(args.input, args.template, logger, workers=args.browsers, processes=args.processes, queue=queue)
\ No newline at end of file
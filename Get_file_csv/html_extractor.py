@@ -0,0 +1,294 @@
+import re
+import json
+import logging
+
+from lxml import etree, html as lxml_html
+from lxml.cssselect import CSSSelector
+from cssselect import SelectorError
+
+from config import CONFIG
+from metrics import get_metrics
+from selector_stats import get_selector_stats
+
+# Selector bắt đầu bằng "xpath:" là biểu thức XPath, dùng cho điều kiện cssselect không hỗ trợ (:has, :contains)
+XPATH_PREFIX = "xpath:"
+
+def convert_to_fullsize(img_url):
+    if not img_url:
+        return img_url
+    return img_url.replace('_SS40_', '') \
+                  .replace('_SX40_', '') \
+                  .replace('_SY40_', '') \
+                  .replace('_AC_US40_', '') \
+                  .replace('_AC_US100_', '') \
+                  .replace('_AC_SY400_', '') \
+                  .replace('_AC_SY879_', '') \
+                  .replace('_AC_SR38,50_', '') \
+                  .replace('_CR40,40,400,400_', '')
+
+
+def clean_price(price_raw):
+    """Loại bỏ ký tự $ và dấu phẩy, chỉ giữ lại số"""
+    if not price_raw:
+        return ""
+    return re.sub(r'[^\d.]', '', price_raw)
+
+
+def clean_brand(brand_raw):
+    """Làm sạch text, chỉ lấy tên thương hiệu"""
+    if not brand_raw:
+        return ""
+    brand = re.sub(r'^(Brand:|Visit the|Visit) ', '', brand_raw, flags=re.IGNORECASE)
+    brand = re.sub(r' (Store|Brand|Page)$', '', brand, flags=re.IGNORECASE)
+    return brand.strip()
+
+
+def is_junk_image(img_url):
+    """Lọc các ảnh không phải sản phẩm (sprite, icon)"""
+    return bool(re.search(r'_CB\d+.*_FMpng_RI_', img_url)) or "sprite" in img_url
+
+
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt',
+    'figcaption', 'figure', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'header', 'hr', 'li', 'ol', 'p', 'pre', 'section', 'table', 'tr', 'ul'
+}
+
+
+def _collect_text(element, parts):
+    # Bỏ qua comment/processing instruction, phần tail do phần tử cha xử lý
+    if not isinstance(element.tag, str):
+        return
+    block = element.tag.lower() in BLOCK_TAGS
+    if block:
+        parts.append('\n')
+    if element.text:
+        parts.append(element.text)
+    for child in element:
+        _collect_text(child, parts)
+        if child.tail:
+            parts.append(child.tail)
+    if block:
+        parts.append('\n')
+
+
+def element_text(element):
+    """Lấy text của phần tử, gần giống WebElement.text (phần tử khối xuống dòng, khoảng trắng đã gộp)"""
+    parts = []
+    _collect_text(element, parts)
+    lines = (' '.join(line.split()) for line in ''.join(parts).splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def assemble_images(main, thumbnail_groups, dynamic, max_images):
+    """Ghép danh sách ảnh theo đúng thứ tự ưu tiên của AmazonScraper.get_images
+
+    main: (selector, src) của ảnh chính hoặc None
+    thumbnail_groups: [(selector, [[giá trị từng thuộc tính] cho mỗi thumbnail])]
+    dynamic: (selector, [chuỗi JSON data-a-dynamic-image])
+    Trả về (danh sách URL, selector đã khớp)
+    """
+    img_urls = []
+    seen = set()
+    winner = None
+
+    def add(url):
+        full_img = convert_to_fullsize(url)
+        if full_img and full_img not in seen:
+            img_urls.append(full_img)
+            seen.add(full_img)
+            return True
+        return False
+
+    # Ảnh chính
+    if main:
+        winner = main[0]
+        add(main[1])
+
+    # Thumbnail, dừng ở selector đầu tiên cho ra ít nhất một ảnh phụ
+    for sel, thumbs in thumbnail_groups:
+        if len(img_urls) >= max_images:
+            break
+        for candidates in thumbs:
+            if len(img_urls) >= max_images:
+                break
+            for thumb_src in candidates:
+                if not thumb_src or is_junk_image(thumb_src):
+                    continue
+                if add(thumb_src):
+                    break
+        if len(img_urls) > 1:
+            winner = winner or sel
+            break
+
+    # Dự phòng: JSON trong data-a-dynamic-image
+    dynamic_sel, dynamic_json = dynamic
+    if len(img_urls) < max_images:
+        for json_data in dynamic_json:
+            try:
+                image_dict = json.loads(json_data or '{}')
+            except json.JSONDecodeError:
+                continue
+            for img_url in list(image_dict.keys())[:max_images]:
+                add(img_url)
+                winner = winner or dynamic_sel
+                if len(img_urls) >= max_images:
+                    break
+
+    return img_urls[:max_images], winner
+
+
+class HtmlExtractor:
+    """Trích xuất mọi trường sản phẩm từ page_source trong một lần parse, không gọi WebDriver"""
+
+    def __init__(self, selectors=None, max_images=None, logger=None):
+        self.selectors = selectors or CONFIG.SELECTORS
+        self.max_images = max_images if max_images is not None else CONFIG.MAX_IMAGES
+        self.logger = logger or logging.getLogger(__name__)
+        self._compiled = {}
+
+    def _select(self, root, selector):
+        """Chạy selector (CSS hoặc "xpath:...") đã biên dịch sẵn, trả về [] nếu selector không hợp lệ với lxml"""
+        if selector not in self._compiled:
+            try:
+                if selector.startswith(XPATH_PREFIX):
+                    self._compiled[selector] = etree.XPath(selector[len(XPATH_PREFIX):])
+                else:
+                    self._compiled[selector] = CSSSelector(selector)
+            except (SelectorError, etree.XPathSyntaxError) as e:
+                # Chỉ cảnh báo một lần cho mỗi selector (kết quả biên dịch được cache)
+                self.logger.warning(f"Bỏ qua selector không biên dịch được {selector}: {e}")
+                self._compiled[selector] = None
+        compiled = self._compiled[selector]
+        return compiled(root) if compiled is not None else []
+
+    def _first_text(self, root, selectors):
+        """Trả về (text, selector) của selector đầu tiên có nội dung"""
+        for sel in selectors:
+            for element in self._select(root, sel):
+                text = element_text(element)
+                if text:
+                    return text, sel
+        return "", None
+
+    @staticmethod
+    def parse(page_source):
+        """Parse HTML và bỏ script/style để text giống nội dung hiển thị"""
+        root = lxml_html.fromstring(page_source)
+        for junk in root.xpath('//script|//style|//noscript'):
+            junk.drop_tree()
+        return root
+
+    def get_title(self, root, selectors=None):
+        return self._first_text(root, (selectors or self.selectors)['title_selectors'])
+
+    def get_bullets(self, root):
+        for sel in self.selectors['bullet_selectors']:
+            bullets = [element_text(el) for el in self._select(root, sel)]
+            bullets = [b for b in bullets if b]
+            if bullets:
+                return bullets, sel
+        return [], None
+
+    def get_feature_text(self, root):
+        """Toàn bộ text của khối mô tả ngắn, xuống dòng thay bằng <br>"""
+        text, sel = self._first_text(root, [self.selectors['product_description']])
+        return text.replace('\n', '<br>'), sel
+
+    def get_detailed_description(self, root, selectors=None):
+        text, sel = self._first_text(root, (selectors or self.selectors)['detailed_description_selectors'])
+        return text.replace('\n', '<br>'), sel
+
+    def get_price(self, root, selectors=None):
+        for sel in (selectors or self.selectors)['price_selectors']:
+            for element in self._select(root, sel):
+                price = clean_price(element_text(element))
+                if price:
+                    return price, sel
+        return "", None
+
+    def get_brand(self, root, selectors=None):
+        brand, sel = self._first_text(root, (selectors or self.selectors)['brand_selectors'])
+        return clean_brand(brand), sel
+
+    def get_images(self, root, max_images=None):
+        """Lấy ảnh chính, thumbnail và ảnh trong data-a-dynamic-image (giống AmazonScraper.get_images)"""
+        main = None
+        for sel in self.selectors['main_image_selectors']:
+            elements = self._select(root, sel)
+            if not elements:
+                continue
+            for attr in self.selectors['main_image_attributes']:
+                src = elements[0].get(attr)
+                if src:
+                    main = (sel, src)
+                    break
+            break
+
+        thumbnail_groups = [
+            (sel, [[thumb.get(attr) for attr in self.selectors['thumbnail_attributes']]
+                   for thumb in self._select(root, sel)])
+            for sel in self.selectors['thumbnail_selectors']
+        ]
+
+        dynamic_sel = self.selectors['dynamic_image_selector']
+        dynamic_json = [element.get('data-a-dynamic-image')
+                        for element in self._select(root, dynamic_sel)[:2]]
+
+        return assemble_images(main, thumbnail_groups, (dynamic_sel, dynamic_json),
+                               max_images or self.max_images)
+
+    def extract(self, page_source, asin=None, max_images=None):
+        """Trích xuất tất cả các trường từ HTML, kèm selector đã khớp cho từng trường
+
+        Selector dự phòng của tiêu đề, mô tả, giá, thương hiệu được thử theo tỉ lệ khớp đã lưu
+        (SelectorStats.ordered), selector đã chết bị bỏ.
+        """
+        root = self.parse(page_source)
+        ordered = get_selector_stats().ordered_selectors(self.selectors)
+
+        title, title_sel = self.get_title(root, ordered)
+        bullets, bullets_sel = self.get_bullets(root)
+        feature_text, feature_sel = self.get_feature_text(root)
+        detailed_desc, detailed_sel = self.get_detailed_description(root, ordered)
+        price, price_sel = self.get_price(root, ordered)
+        brand, brand_sel = self.get_brand(root, ordered)
+        images, images_sel = self.get_images(root, max_images)
+
+        if asin and not title:
+            self.logger.warning(f"Không tìm thấy tiêu đề trong HTML của ASIN {asin}")
+
+        selectors = {
+            "title": title_sel,
+            "bullets": bullets_sel or feature_sel,
+            "detailed_description": detailed_sel,
+            "price": price_sel,
+            "brand": brand_sel,
+            "images": images_sel,
+        }
+        get_metrics().record_selectors(selectors)
+        get_selector_stats().record_extraction(selectors, ordered)
+
+        return {
+            "title": title,
+            "bullets": bullets,
+            "feature_text": feature_text,
+            "detailed_description": detailed_desc,
+            "price": price,
+            "brand": brand,
+            "images": images,
+            "selectors": selectors,
+        }
+
+
+_default_extractor = None
+
+
+def extract_product(page_source, asin=None, max_images=None, logger=None):
+    """Hàm tiện ích dùng một HtmlExtractor chung (selector chỉ biên dịch một lần)"""
+    global _default_extractor
+    if _default_extractor is None:
+        _default_extractor = HtmlExtractor()
+    if logger is not None:
+        _default_extractor.logger = logger
+    return _default_extractor.extract(page_source, asin, max_images)
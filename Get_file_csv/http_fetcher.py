@@ -0,0 +1,224 @@
+import atexit
+import asyncio
+import logging
+import threading
+
+from config import CONFIG
+from html_extractor import HtmlExtractor
+from metrics import get_metrics
+from page_cache import get_page_cache
+from rate_limiter import get_rate_limiter
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp là tùy chọn, thiếu thì mọi ASIN đi theo đường Selenium
+    aiohttp = None
+
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+
+class HttpFetcher:
+    """Tải HTML trang sản phẩm bằng asyncio + aiohttp, dùng chung kết nối keep-alive
+
+    Event loop và ClientSession sống suốt đời fetcher (luồng nền riêng), mọi lần fetch() gửi việc vào
+    cùng loop nên kết nối keep-alive được dùng lại giữa các khối ASIN; close() đóng session và loop.
+    Sau HTTP_BLOCKED_LIMIT lần liên tiếp bị chặn (CAPTCHA, 403/429/503) thì ngừng tải HTTP cho phần còn
+    lại của lần chạy: mỗi yêu cầu như vậy chỉ tốn ngân sách rate limit rồi ASIN vẫn phải mở trình duyệt.
+    """
+
+    BLOCKED_STATUSES = (403, 429, 503)
+
+    def __init__(self, base_url=None, concurrency=None, timeout=None, headers=None, logger=None, rate_limiter=None,
+                 blocked_limit=None):
+        self.base_url = base_url or CONFIG.BASE_URL
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.concurrency = concurrency or CONFIG.HTTP_CONCURRENCY
+        self.timeout = timeout or CONFIG.TIMEOUT
+        self.headers = headers or DEFAULT_HEADERS
+        self.logger = logger or logging.getLogger(__name__)
+        self.blocked_limit = blocked_limit if blocked_limit is not None else CONFIG.HTTP_BLOCKED_LIMIT
+        self.blocked_streak = 0
+        self.blocked = False
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._semaphore = None
+
+    def _note_blocked(self, was_blocked):
+        with self._lock:
+            self.blocked_streak = self.blocked_streak + 1 if was_blocked else 0
+            if was_blocked and self.blocked_limit and self.blocked_streak >= self.blocked_limit and not self.blocked:
+                self.blocked = True
+                self.logger.warning(f"HTTP bị chặn {self.blocked_streak} lần liên tiếp, "
+                                    f"các ASIN còn lại đi thẳng qua trình duyệt")
+
+    async def _fetch_one(self, session, semaphore, asin):
+        url = f"{self.base_url}{asin}"
+        async with semaphore:
+            if self.blocked:
+                return asin, None
+            # Chung ngân sách yêu cầu với các trình duyệt; lấy token trong semaphore để chỉ những yêu cầu
+            # sắp gửi mới giữ chỗ, không phải cả khối ASIN cùng xếp hàng trước các trình duyệt
+            await self.rate_limiter.acquire_async(url)
+            try:
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        self.logger.info(f"HTTP {response.status} cho ASIN {asin}, chuyển sang Selenium")
+                        self._note_blocked(response.status in self.BLOCKED_STATUSES)
+                        return asin, None
+                    page_source = await response.text()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.logger.info(f"Không tải được ASIN {asin} qua HTTP: {e}")
+                return asin, None
+        if "captcha" in page_source.lower():
+            self.logger.info(f"HTTP trả về CAPTCHA cho ASIN {asin}, chuyển sang Selenium")
+            self._note_blocked(True)
+            return asin, None
+        self._note_blocked(False)
+        return asin, page_source
+
+    def _start(self):
+        """Event loop ở luồng nền, tạo ở lần fetch đầu tiên"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="http-fetcher", daemon=True)
+                self._thread.start()
+                self._loop = loop
+                # Chưa close() khi thoát (vd. benchmark) thì vẫn đóng session gọn gàng
+                atexit.register(self.close)
+            return self._loop
+
+    async def _open_session(self):
+        """ClientSession (chạy trong loop của fetcher), tạo một lần và dùng lại cho mọi khối ASIN"""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30)
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def _close_session(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch_all(self, asins):
+        """Trả về dict asin -> HTML (None nếu lỗi)"""
+        session = await self._open_session()
+        pages = await asyncio.gather(*(self._fetch_one(session, self._semaphore, asin) for asin in asins))
+        return dict(pages)
+
+    def fetch(self, asins):
+        if self.blocked:
+            return {asin: None for asin in asins}
+        return asyncio.run_coroutine_threadsafe(self.fetch_all(asins), self._start()).result()
+
+    def close(self):
+        """Đóng session và dừng event loop (gọi được nhiều lần)"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        atexit.unregister(self.close)
+        asyncio.run_coroutine_threadsafe(self._close_session(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+_http_fetcher = None
+_http_fetcher_lock = threading.Lock()
+
+
+def get_http_fetcher():
+    """HttpFetcher dùng chung cho cả lần chạy (giữ trạng thái bị chặn giữa các khối ASIN)"""
+    global _http_fetcher
+    with _http_fetcher_lock:
+        if _http_fetcher is None:
+            _http_fetcher = HttpFetcher()
+        return _http_fetcher
+
+
+def close_http_fetcher():
+    """Đóng HttpFetcher dùng chung khi lần chạy xong (lần dùng sau tạo fetcher mới)"""
+    global _http_fetcher
+    with _http_fetcher_lock:
+        fetcher, _http_fetcher = _http_fetcher, None
+    if fetcher is not None:
+        fetcher.close()
+
+
+def missing_fields(fields, required=None):
+    """Các trường bắt buộc còn trống trong kết quả trích xuất"""
+    required = required or CONFIG.HTTP_REQUIRED_FIELDS
+    return [field for field in required if not fields.get(field)]
+
+
+def fetch_static_fields(asins, base_url=None, concurrency=None, logger=None):
+    """Tải HTML tĩnh và trích xuất trường, trả về (dict asin -> fields đầy đủ, danh sách ASIN cần Selenium)"""
+    logger = logger or logging.getLogger(__name__)
+    asins = list(dict.fromkeys(asins))
+    if aiohttp is None:
+        logger.warning("Chưa cài aiohttp, bỏ qua bước tải HTTP")
+        return {}, asins
+
+    if base_url or concurrency:
+        with HttpFetcher(base_url, concurrency, logger=logger) as fetcher:
+            pages = fetcher.fetch(asins)
+    else:
+        pages = get_http_fetcher().fetch(asins)
+    extractor = HtmlExtractor(logger=logger)
+
+    complete = {}
+    need_browser = []
+    for asin in asins:
+        page_source = pages.get(asin)
+        if not page_source:
+            need_browser.append(asin)
+            continue
+        fields = extractor.extract(page_source)
+        missing = missing_fields(fields)
+        if missing:
+            logger.info(f"HTML tĩnh của ASIN {asin} thiếu {missing}, chuyển sang Selenium")
+            need_browser.append(asin)
+        else:
+            complete[asin] = fields
+
+    logger.info(f"HTTP: {len(complete)}/{len(asins)} ASIN đủ trường, {len(need_browser)} ASIN cần Selenium")
+    return complete, need_browser
+
+
+def prefetch_infos(asins, build_info, logger=None):
+    """Dùng cho scrape_files(prefetch=...): trả về dict asin -> thông tin cho các ASIN có trong
+    page cache hoặc lấy được qua HTTP, các ASIN còn lại để WorkerPool mở trình duyệt"""
+    cache = get_page_cache()
+    metrics = get_metrics()
+    complete = {}
+    for asin in asins:
+        fields = cache.get(asin)
+        if fields:
+            complete[asin] = fields
+            metrics.inc("pages_total", source="cache", outcome="ok")
+
+    remaining = [asin for asin in asins if asin not in complete]
+    if CONFIG.HTTP_FETCH and remaining:
+        fetched, _ = fetch_static_fields(remaining, logger=logger)
+        for asin, fields in fetched.items():
+            cache.put(asin, fields)
+            metrics.inc("pages_total", source="http", outcome="ok")
+        complete.update(fetched)
+
+    return {asin: build_info(asin, fields) for asin, fields in complete.items()}
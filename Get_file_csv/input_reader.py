@@ -0,0 +1,97 @@
+import re
+import sys
+import json
+import logging
+
+import pandas as pd
+
+from config import CONFIG
+
+# Các cột input được dùng khi ghép kết quả, cột khác không được đọc
+INPUT_COLUMNS = ('Variant SKU', 'Vendor', 'Variant Barcode')
+
+ASIN_PATTERN = re.compile(r'^[A-Z0-9]{10}$')
+ASIN_IN_URL_PATTERN = re.compile(r'/(?:dp|gp/product|product)/([A-Z0-9]{10})(?:[/?#]|$)', re.IGNORECASE)
+
+
+def normalize_asin(value):
+    """Chuẩn hóa ASIN (bỏ khoảng trắng, viết hoa, lấy ASIN từ URL /dp/...), trả về None nếu không hợp lệ"""
+    if value is None:
+        return None
+    text = str(value).strip()
+    match = ASIN_IN_URL_PATTERN.search(text)
+    if match:
+        text = match.group(1)
+    asin = text.upper()
+    return asin if ASIN_PATTERN.match(asin) else None
+
+
+class InputReader:
+    """Đọc dần các dòng input (CSV, JSONL hoặc '-' cho CSV từ stdin) theo từng khối chunk_size dòng
+
+    Lặp qua reader trả về (số dòng trong file, dict các cột INPUT_COLUMNS, ASIN đã chuẩn hóa).
+    Dòng có Variant SKU trống bị bỏ qua, dòng có ASIN không hợp lệ được ghi log rồi bỏ qua.
+    """
+
+    def __init__(self, path, chunk_size=None, logger=None):
+        self.path = path
+        self.chunk_size = chunk_size or CONFIG.INPUT_CHUNK_SIZE
+        self.logger = logger or logging.getLogger(__name__)
+        self.is_jsonl = str(path).lower().endswith(('.jsonl', '.ndjson'))
+        self.rows_read = 0
+        self.invalid = 0
+
+    def read_header(self):
+        """Tên cột của file CSV, None nếu chưa biết trước (stdin hoặc JSONL)"""
+        if self.path == '-' or self.is_jsonl:
+            return None
+        return list(pd.read_csv(self.path, nrows=0).columns)
+
+    def _csv_chunks(self, source):
+        chunks = pd.read_csv(source, chunksize=self.chunk_size, dtype=str, keep_default_na=False,
+                             usecols=lambda column: column in INPUT_COLUMNS)
+        for chunk in chunks:
+            # Dòng 1 là header nên dòng dữ liệu thứ i nằm ở dòng i + 2
+            lines = chunk.index + 2
+            yield zip(lines, chunk.to_dict('records'))
+
+    def _jsonl_chunks(self, source):
+        chunk = []
+        for line_number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                self.logger.warning(f"Bỏ qua dòng {line_number} không phải JSON trong {self.path}")
+                continue
+            chunk.append((line_number, {column: record[column] for column in INPUT_COLUMNS if column in record}))
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def chunks(self):
+        """Các khối dòng thô (số dòng, dict), chỉ đọc tiếp khi khối trước đã được dùng hết"""
+        if self.path == '-':
+            yield from self._csv_chunks(sys.stdin)
+        elif self.is_jsonl:
+            with open(self.path, encoding='utf-8') as f:
+                yield from self._jsonl_chunks(f)
+        else:
+            yield from self._csv_chunks(self.path)
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            for line_number, row in chunk:
+                sku = row.get('Variant SKU')
+                if sku is None or not str(sku).strip():
+                    continue
+                asin = normalize_asin(sku)
+                if asin is None:
+                    self.invalid += 1
+                    self.logger.warning(f"Bỏ qua dòng {line_number}: '{sku}' không phải ASIN hợp lệ")
+                    continue
+                self.rows_read += 1
+                yield line_number, row, asin
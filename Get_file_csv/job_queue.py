@@ -0,0 +1,437 @@
+import os
+import time
+import json
+import socket
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from urllib.parse import urlparse
+
+from config import CONFIG
+from worker_pool import WorkerPool
+from metrics import MetricsExporter
+from rate_limiter import get_rate_limiter
+from selector_stats import get_selector_stats
+from product_store import get_product_store
+from http_fetcher import close_http_fetcher
+
+
+class QueueBackend(ABC):
+    """Hàng đợi ASIN dùng chung cho nhiều máy: coordinator đưa ASIN vào, worker thuê (lease) từng lô,
+    ghi kết quả lại; lease hết hạn (worker treo hoặc chết) thì ASIN được giao cho worker khác
+
+    Backend mới kế thừa lớp này, cài đặt mọi abstractmethod (thiếu thì lỗi ngay khi tạo backend) và
+    đăng ký vào BACKENDS theo scheme của URL.
+    """
+
+    @abstractmethod
+    def enqueue(self, asins, reset_before=None):
+        """Thêm ASIN (bỏ qua ASIN đã có), trả về số ASIN mới
+
+        reset_before: ASIN đã xong hoặc hỏng trước thời điểm này (Unix time, vd. lúc coordinator bắt đầu)
+        được đưa lại về pending để scrape lại; None thì giữ kết quả cũ (--resume)
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def lease(self, owner, limit, visibility=None):
+        """Thuê tối đa limit ASIN trong visibility giây, trả về danh sách ASIN"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete(self, asin, owner, result):
+        """Ghi kết quả; kết quả rỗng thì ASIN được trả lại hàng đợi (hoặc hỏng hẳn khi quá số lần thử)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def release(self, asins, owner):
+        """Trả lại hàng đợi các ASIN đã thuê nhưng chưa xử lý (worker dừng sớm), không tính lần thử"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def results(self, asins):
+        """dict asin -> kết quả cho các ASIN đã xong trong danh sách"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def counts(self):
+        """Số ASIN theo trạng thái: pending, leased, done, failed"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def heartbeat(self, owner, ttl):
+        """Đánh dấu worker owner còn sống, trả về số worker có heartbeat trong ttl giây gần nhất"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def unregister(self, owner):
+        """Xóa worker owner khỏi danh sách đang chạy"""
+        raise NotImplementedError
+
+    def unfinished(self):
+        counts = self.counts()
+        return counts.get("pending", 0) + counts.get("leased", 0)
+
+    def summary(self):
+        counts = self.counts()
+        return "Hàng đợi: " + ", ".join(f"{counts.get(status, 0)} {status}"
+                                       for status in ("pending", "leased", "done", "failed"))
+
+
+class SqliteQueue(QueueBackend):
+    """Hàng đợi trong một file SQLite (WAL), không cần dịch vụ ngoài
+
+    Nhiều tiến trình/máy dùng chung một file (ổ chia sẻ); việc thuê được thực hiện trong giao dịch
+    BEGIN IMMEDIATE nên hai worker không bao giờ nhận cùng một ASIN còn hạn. Thời hạn lease tính
+    theo đồng hồ hệ thống, các máy cần đồng bộ giờ.
+    """
+
+    def __init__(self, path=None, visibility=None, max_attempts=None, logger=None):
+        self.path = path or CONFIG.QUEUE_FILE
+        self.visibility = visibility or CONFIG.QUEUE_VISIBILITY_TIMEOUT
+        self.max_attempts = max_attempts or CONFIG.QUEUE_MAX_ATTEMPTS
+        self.logger = logger or logging.getLogger(__name__)
+        self._local = threading.local()
+
+    def _connect(self):
+        """Mỗi luồng một kết nối SQLite riêng"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    asin TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires)")
+            conn.execute("CREATE TABLE IF NOT EXISTS workers (owner TEXT PRIMARY KEY, last_seen REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    def enqueue(self, asins, reset_before=None):
+        asins = list(asins)
+        conn = self._transaction()
+        try:
+            now = time.time()
+            added = 0
+            if reset_before is not None:
+                # Kết quả của lần chạy trước không được dùng lại; ASIN đã xong trong lần chạy này (trùng giữa
+                # các khối input) thì giữ nguyên
+                added += conn.executemany(
+                    "UPDATE jobs SET status = 'pending', owner = NULL, lease_expires = NULL, attempts = 0, "
+                    "result = NULL, updated_at = ? WHERE asin = ? AND status IN ('done', 'failed') AND updated_at < ?",
+                    ((now, asin, reset_before) for asin in asins)
+                ).rowcount
+            added += conn.executemany(
+                "INSERT OR IGNORE INTO jobs (asin, status, updated_at) VALUES (?, 'pending', ?)",
+                ((asin, now) for asin in asins)
+            ).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def lease(self, owner, limit, visibility=None):
+        now = time.time()
+        conn = self._transaction()
+        try:
+            # Lease hết hạn mà đã thử đủ số lần thì coi như hỏng, không giao cho worker nào nữa
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', owner = NULL, updated_at = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+            asins = [row[0] for row in conn.execute(
+                "SELECT asin FROM jobs WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY rowid LIMIT ?",
+                (now, limit)
+            )]
+            conn.executemany(
+                "UPDATE jobs SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE asin = ?",
+                ((owner, now + (visibility or self.visibility), now, asin) for asin in asins)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return asins
+
+    def complete(self, asin, owner, result):
+        now = time.time()
+        conn = self._transaction()
+        try:
+            if result:
+                # Kết quả đến muộn từ worker đã mất lease vẫn được nhận nếu chưa ai xong
+                conn.execute(
+                    "UPDATE jobs SET status = 'done', owner = ?, result = ?, updated_at = ? "
+                    "WHERE asin = ? AND status != 'done'",
+                    (owner, json.dumps(result, ensure_ascii=False), now, asin)
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                    "owner = NULL, lease_expires = NULL, updated_at = ? "
+                    "WHERE asin = ? AND status = 'leased' AND owner = ?",
+                    (self.max_attempts, now, asin, owner)
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release(self, asins, owner):
+        conn = self._transaction()
+        try:
+            conn.executemany(
+                "UPDATE jobs SET status = 'pending', owner = NULL, lease_expires = NULL, "
+                "attempts = MAX(attempts - 1, 0), updated_at = ? WHERE asin = ? AND status = 'leased' AND owner = ?",
+                ((time.time(), asin, owner) for asin in asins)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def results(self, asins):
+        asins = list(asins)
+        conn = self._connect()
+        found = {}
+        # SQLite giới hạn số tham số trong một câu lệnh
+        for start in range(0, len(asins), 500):
+            batch = asins[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            for asin, result in conn.execute(
+                f"SELECT asin, result FROM jobs WHERE status = 'done' AND asin IN ({placeholders})", batch
+            ):
+                found[asin] = json.loads(result)
+        return found
+
+    def counts(self):
+        conn = self._connect()
+        return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def heartbeat(self, owner, ttl):
+        now = time.time()
+        conn = self._transaction()
+        try:
+            conn.execute("INSERT OR REPLACE INTO workers (owner, last_seen) VALUES (?, ?)", (owner, now))
+            conn.execute("DELETE FROM workers WHERE last_seen < ?", (now - ttl,))
+            active = conn.execute("SELECT COUNT(*) FROM workers").fetchone()[0]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return active
+
+    def unregister(self, owner):
+        self._connect().execute("DELETE FROM workers WHERE owner = ?", (owner,))
+
+
+# Backend theo scheme của URL hàng đợi ("sqlite:///jobs.sqlite"); đường dẫn không có scheme là SQLite
+BACKENDS = {"sqlite": SqliteQueue}
+
+
+def open_queue(url, logger=None):
+    parsed = urlparse(url)
+    if parsed.scheme in BACKENDS:
+        # sqlite:///jobs.sqlite là đường dẫn tương đối, sqlite:////data/jobs.sqlite là tuyệt đối
+        path = parsed.path[1:] if parsed.path.startswith('/') else parsed.path
+        return BACKENDS[parsed.scheme](path or None, logger=logger)
+    if len(parsed.scheme) > 1:
+        raise ValueError(f"Không hỗ trợ backend hàng đợi '{parsed.scheme}' (có: {', '.join(BACKENDS)})")
+    # Không có scheme (hoặc ổ đĩa Windows như C:\...) thì là đường dẫn file SQLite
+    return SqliteQueue(url, logger=logger)
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def iter_leased_jobs(queue, owner, lease_size, held, stop, prefetch=None, idle_exit=None, poll=None):
+    """Các job cho WorkerPool.imap: thuê từng lô ASIN cho tới khi hàng đợi xong hết
+
+    Dừng khi stop được đặt, hoặc khi không còn ASIN chờ hay đang được thuê trong idle_exit giây;
+    ASIN đang được worker khác giữ thì vẫn chờ, vì lease của worker đó có thể hết hạn và được giao lại.
+    held: set các ASIN đang thuê, được thêm vào khi thuê
+    """
+    idle_exit = CONFIG.QUEUE_IDLE_EXIT if idle_exit is None else idle_exit
+    poll = poll or CONFIG.QUEUE_POLL_INTERVAL
+    idle_since = None
+    while not stop.is_set():
+        asins = queue.lease(owner, lease_size)
+        held.update(asins)
+        if not asins:
+            if queue.unfinished():
+                idle_since = None
+            elif idle_since is None:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since >= idle_exit:
+                return
+            stop.wait(poll)
+            continue
+        idle_since = None
+        known = prefetch(asins) if prefetch is not None else {}
+        for asin in asins:
+            if asin in known:
+                yield asin, asin, known[asin]
+            else:
+                yield asin, asin
+
+
+class SharedBudget:
+    """Chia ngân sách yêu cầu (REQUESTS_PER_SECOND) đều cho các worker đang dùng chung hàng đợi
+
+    Mỗi worker gửi heartbeat vào hàng đợi mỗi QUEUE_HEARTBEAT_INTERVAL giây và đặt rate limiter của mình
+    bằng ngân sách chung chia cho số worker còn heartbeat, nên tổng các máy không vượt ngân sách (trừ
+    tối đa một chu kỳ heartbeat ngay khi có worker mới tham gia).
+    """
+
+    def __init__(self, queue, owner, interval=None, logger=None):
+        self.queue = queue
+        self.owner = owner
+        self.interval = interval or CONFIG.QUEUE_HEARTBEAT_INTERVAL
+        self.logger = logger or logging.getLogger(__name__)
+        self.limiter = get_rate_limiter()
+        self.total = self.limiter.rate
+        self.workers = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def update(self):
+        workers = max(1, self.queue.heartbeat(self.owner, self.interval * 3))
+        if workers != self.workers:
+            self.workers = workers
+            self.limiter.set_rate(self.total / workers)
+            self.logger.info(f"{workers} worker dùng chung hàng đợi, "
+                             f"rate limit {self.limiter.rate:.3f} yêu cầu/giây mỗi worker")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.update()
+            except sqlite3.Error as e:
+                self.logger.warning(f"Không gửi được heartbeat: {e}")
+
+    def __enter__(self):
+        self.update()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.queue.unregister(self.owner)
+        self.limiter.set_rate(self.total)
+        return False
+
+
+def run_queue_worker(queue, create_worker, size=None, logger=None, prefetch=None, lease_size=None, owner=None):
+    """Chế độ worker: thuê ASIN từ hàng đợi, scrape bằng WorkerPool và ghi kết quả lại hàng đợi"""
+    logger = logger or logging.getLogger(__name__)
+    size = size or CONFIG.WORKERS
+    owner = owner or worker_id()
+    lease_size = lease_size or CONFIG.QUEUE_LEASE_SIZE or size
+    logger.info(f"Worker {owner}: nhận ASIN từ hàng đợi, {size} trình duyệt, lô {lease_size} ASIN")
+
+    processed = 0
+    succeeded = 0
+    held = set()
+    stop = threading.Event()
+    jobs = iter_leased_jobs(queue, owner, lease_size, held, stop, prefetch)
+    try:
+        # Mỗi máy worker ghi metrics của riêng mình; ngân sách yêu cầu chia cho mọi worker của hàng đợi
+        with MetricsExporter(logger=logger), SharedBudget(queue, owner, logger=logger):
+            for asin, result in WorkerPool(create_worker, size, logger).imap(jobs, stop):
+                queue.complete(asin, owner, result)
+                held.discard(asin)
+                processed += 1
+                succeeded += bool(result)
+    finally:
+        # ASIN đã thuê nhưng chưa xử lý (không còn trình duyệt, Ctrl+C) được trả lại cho worker khác ngay
+        if held:
+            logger.warning(f"Worker {owner}: trả lại {len(held)} ASIN chưa xử lý")
+            queue.release(held, owner)
+        close_http_fetcher()
+        get_selector_stats().save()
+    logger.info(f"Worker {owner}: xong {processed} ASIN, {succeeded} thành công. {queue.summary()}")
+    return processed
+
+
+def iter_queue_results(file_jobs, queue, logger=None, get_asin=None, chunk_size=None, poll=None, resume=False):
+    """Chế độ coordinator: đưa ASIN của mọi file vào hàng đợi, chờ các worker xử lý xong rồi trả về
+    (file_index, dòng, kết quả) theo đúng thứ tự input; file_jobs được đọc hai lần (đưa vào, ghép kết quả)
+
+    ASIN đã xong hoặc hỏng trong hàng đợi từ lần chạy trước được scrape lại, trừ khi resume (--resume)
+    thì kết quả cũ được dùng luôn.
+
+    Với --incremental, ASIN còn mới trong get_product_store() không được đưa vào hàng đợi; kết quả từ
+    hàng đợi được lưu vào kho.
+    """
+    logger = logger or logging.getLogger(__name__)
+    get_asin = get_asin or (lambda row: row)
+    chunk_size = chunk_size or CONFIG.INPUT_CHUNK_SIZE
+    poll = poll or CONFIG.QUEUE_POLL_INTERVAL
+
+    store = get_product_store()
+    stored = {}
+    reset_before = None if resume else time.time()
+
+    def enqueue(asins):
+        stored.update(store.fresh([asin for asin in asins if asin not in stored]))
+        return queue.enqueue([asin for asin in asins if asin not in stored], reset_before)
+
+    added = 0
+    for rows in file_jobs:
+        chunk = []
+        for row in rows:
+            chunk.append(get_asin(row))
+            if len(chunk) >= chunk_size:
+                added += enqueue(chunk)
+                chunk = []
+        if chunk:
+            added += enqueue(chunk)
+    logger.info(f"Đã đưa {added} ASIN mới (hoặc cần scrape lại) vào hàng đợi. {queue.summary()}")
+
+    last_log = time.monotonic()
+    while queue.unfinished():
+        time.sleep(poll)
+        if time.monotonic() - last_log >= CONFIG.QUEUE_PROGRESS_EVERY:
+            logger.info(queue.summary())
+            last_log = time.monotonic()
+    logger.info(f"Hàng đợi đã xong, ghép kết quả theo thứ tự input. {queue.summary()}")
+
+    for file_index, rows in enumerate(file_jobs):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield from _attach_results(file_index, chunk, queue, get_asin, stored)
+                chunk = []
+        yield from _attach_results(file_index, chunk, queue, get_asin, stored)
+    logger.info(store.summary())
+
+
+def _attach_results(file_index, chunk, queue, get_asin, stored):
+    asins = dict.fromkeys(get_asin(row) for row in chunk)
+    results = queue.results([asin for asin in asins if asin not in stored])
+    get_product_store().put_many(results)
+    results.update((asin, stored[asin]) for asin in asins if asin in stored)
+    for row in chunk:
+        yield file_index, row, results.get(get_asin(row), {})
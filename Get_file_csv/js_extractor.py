@@ -0,0 +1,144 @@
+import logging
+
+from config import CONFIG
+from metrics import get_metrics
+from selector_stats import get_selector_stats
+from html_extractor import clean_price, clean_brand, assemble_images, extract_product
+
+
+# Script chạy trong trình duyệt: thử mọi selector dự phòng và trả về giá trị thô kèm selector đã khớp.
+# arguments[0] là CONFIG.SELECTORS với các danh sách dự phòng đã sắp theo tỉ lệ khớp (SelectorStats).
+# Selector "xpath:..." chạy bằng document.evaluate; selector không hợp lệ bị bỏ qua thay vì làm hỏng cả script.
+EXTRACTION_SCRIPT = """
+var S = arguments[0];
+function q(sel) {
+    try {
+        if (sel.indexOf('xpath:') === 0) {
+            var r = document.evaluate(sel.slice(6), document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            var nodes = [];
+            for (var k = 0; k < r.snapshotLength; k++) nodes.push(r.snapshotItem(k));
+            return nodes;
+        }
+        return Array.prototype.slice.call(document.querySelectorAll(sel));
+    }
+    catch (e) { return []; }
+}
+function txt(el) { return ((el.innerText || el.textContent || '') + '').trim(); }
+function firstText(list) {
+    for (var i = 0; i < list.length; i++) {
+        var els = q(list[i]);
+        for (var j = 0; j < els.length; j++) {
+            var t = txt(els[j]);
+            if (t) return {value: t, selector: list[i]};
+        }
+    }
+    return {value: '', selector: null};
+}
+var out = {};
+out.title = firstText(S.title_selectors);
+out.bullets = {value: [], selector: null};
+for (var i = 0; i < S.bullet_selectors.length; i++) {
+    var items = q(S.bullet_selectors[i]).map(txt).filter(function (t) { return t; });
+    if (items.length) { out.bullets = {value: items, selector: S.bullet_selectors[i]}; break; }
+}
+out.feature_text = firstText([S.product_description]);
+out.detailed_description = firstText(S.detailed_description_selectors);
+out.price = {value: '', selector: null};
+priceLoop:
+for (var i = 0; i < S.price_selectors.length; i++) {
+    var els = q(S.price_selectors[i]);
+    for (var j = 0; j < els.length; j++) {
+        var t = txt(els[j]);
+        if (t.replace(/[^\\d.]/g, '')) { out.price = {value: t, selector: S.price_selectors[i]}; break priceLoop; }
+    }
+}
+out.brand = firstText(S.brand_selectors);
+out.main_image = null;
+for (var i = 0; i < S.main_image_selectors.length; i++) {
+    var els = q(S.main_image_selectors[i]);
+    if (!els.length) continue;
+    for (var k = 0; k < S.main_image_attributes.length; k++) {
+        var v = els[0].getAttribute(S.main_image_attributes[k]);
+        if (v) { out.main_image = [S.main_image_selectors[i], v]; break; }
+    }
+    break;
+}
+out.thumbnails = S.thumbnail_selectors.map(function (sel) {
+    return [sel, q(sel).map(function (el) {
+        return S.thumbnail_attributes.map(function (a) { return el.getAttribute(a); });
+    })];
+});
+out.dynamic_images = q(S.dynamic_image_selector).slice(0, 2).map(function (el) {
+    return el.getAttribute('data-a-dynamic-image');
+});
+return out;
+"""
+
+
+class JsExtractor:
+    """Trích xuất mọi trường trên DOM đang mở bằng đúng một lần execute_script"""
+
+    def __init__(self, selectors=None, max_images=None, logger=None):
+        self.selectors = selectors or CONFIG.SELECTORS
+        self.max_images = max_images if max_images is not None else CONFIG.MAX_IMAGES
+        self.logger = logger or logging.getLogger(__name__)
+
+    def extract(self, driver, asin=None, max_images=None):
+        """Trả về cùng cấu trúc với HtmlExtractor.extract"""
+        ordered = get_selector_stats().ordered_selectors(self.selectors)
+        raw = driver.execute_script(EXTRACTION_SCRIPT, ordered) or {}
+
+        def value(field, default=""):
+            return (raw.get(field) or {}).get("value") or default
+
+        def selector(field):
+            return (raw.get(field) or {}).get("selector")
+
+        images, images_sel = assemble_images(
+            tuple(raw["main_image"]) if raw.get("main_image") else None,
+            raw.get("thumbnails") or [],
+            (self.selectors['dynamic_image_selector'], raw.get("dynamic_images") or []),
+            max_images or self.max_images
+        )
+
+        title = value("title")
+        if asin and not title:
+            self.logger.warning(f"Không tìm thấy tiêu đề trên DOM của ASIN {asin}")
+
+        selectors = {
+            "title": selector("title"),
+            "bullets": selector("bullets") or selector("feature_text"),
+            "detailed_description": selector("detailed_description"),
+            "price": selector("price"),
+            "brand": selector("brand"),
+            "images": images_sel,
+        }
+        get_metrics().record_selectors(selectors)
+        get_selector_stats().record_extraction(selectors, ordered)
+
+        return {
+            "title": title,
+            "bullets": value("bullets", []),
+            "feature_text": value("feature_text").replace('\n', '<br>'),
+            "detailed_description": value("detailed_description").replace('\n', '<br>'),
+            "price": clean_price(value("price")),
+            "brand": clean_brand(value("brand")),
+            "images": images,
+            "selectors": selectors,
+        }
+
+
+_default_extractor = None
+
+
+def extract_from_driver(driver, asin=None, mode=None, logger=None):
+    """Trích xuất các trường từ driver theo CONFIG.EXTRACTION_MODE ("html" hoặc "js")"""
+    global _default_extractor
+    mode = mode or CONFIG.EXTRACTION_MODE
+    if mode == "js":
+        if _default_extractor is None:
+            _default_extractor = JsExtractor()
+        if logger is not None:
+            _default_extractor.logger = logger
+        return _default_extractor.extract(driver, asin)
+    return extract_product(driver.page_source, asin, logger=logger)
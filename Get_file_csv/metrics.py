@@ -0,0 +1,346 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from config import CONFIG
+
+
+# Cận trên (giây) của các bucket histogram thời gian theo giai đoạn, cộng thêm +Inf như Prometheus
+PHASE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PREFIX = "amazon_scraper"
+
+
+class Histogram:
+    """Đếm số lần quan sát theo bucket, kèm tổng và giá trị lớn nhất"""
+
+    def __init__(self, buckets=PHASE_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Ước lượng phân vị q (0..1): cận trên của bucket chứa phân vị đó"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative(self):
+        """[(cận trên, số quan sát <= cận trên)], phần tử cuối là +Inf"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": {_format_bound(bound): count for bound, count in self.cumulative()},
+        }
+
+    def merge(self, data):
+        """Cộng dồn một histogram đã xuất bằng to_dict (vd. từ tiến trình con)"""
+        previous = 0
+        for index, bound in enumerate(self.buckets + (float('inf'),)):
+            cumulative = data["buckets"].get(_format_bound(bound), previous)
+            self.counts[index] += cumulative - previous
+            previous = cumulative
+        self.sum += data["sum"]
+        self.count += data["count"]
+        self.max = max(self.max, data["max"])
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float('inf') else repr(float(bound))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Metrics:
+    """Số liệu của cả lần chạy: histogram thời gian theo giai đoạn, bộ đếm có nhãn (trang theo kết quả,
+    lỗi theo lý do) và số lần khớp của từng selector
+
+    Mọi luồng ghi chung một đối tượng (get_metrics()). Lý do lỗi của ASIN đang xử lý được ghi theo
+    luồng bằng note_failure() ở nơi phát hiện lỗi, record_page() lấy ra khi ASIN đó kết thúc và
+    giữ lý do của từng ASIN lỗi trong failed_asins.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.phases = {}
+        self.counters = {}
+        self.selectors = {}
+        self.failed_asins = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            if phase not in self.phases:
+                self.phases[phase] = Histogram()
+            self.phases[phase].observe(seconds)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def counter(self, name, **labels):
+        """Tổng bộ đếm name trên mọi nhãn khớp với labels"""
+        wanted = set(labels.items())
+        with self._lock:
+            return sum(value for (counter, key), value in self.counters.items()
+                       if counter == name and wanted <= set(key))
+
+    def note_failure(self, reason):
+        """Ghi lý do lỗi của ASIN đang xử lý trong luồng hiện tại (lý do đầu tiên được giữ)"""
+        if getattr(self._local, "reason", None) is None:
+            self._local.reason = reason
+
+    def take_failure(self):
+        """Lấy và xóa lý do lỗi đã ghi trong luồng hiện tại (vd. trước khi chạy lại ASIN)"""
+        reason = getattr(self._local, "reason", None)
+        self._local.reason = None
+        return reason
+
+    def record_page(self, result, source="browser", asin=None):
+        """Kết thúc một ASIN: đếm trang theo nguồn và kết quả, lỗi theo lý do đã ghi
+        (không có lý do thì kết quả rỗng là "empty_result", thiếu tiêu đề là "no_title")"""
+        reason = self.take_failure()
+        if reason is None and not result:
+            reason = "empty_result"
+        elif reason is None and not result.get("Title", True):
+            reason = "no_title"
+        self.inc("pages_total", source=source, outcome="failed" if reason else "ok")
+        if reason:
+            self.inc("failures_total", reason=reason)
+        if asin is not None:
+            with self._lock:
+                if reason:
+                    self.failed_asins[asin] = reason
+                else:
+                    self.failed_asins.pop(asin, None)
+        return reason
+
+    def record_selectors(self, selectors):
+        """Đếm selector đã khớp cho từng trường (None là không selector nào khớp)"""
+        with self._lock:
+            for field, selector in selectors.items():
+                counts = self.selectors.setdefault(field, {})
+                counts[selector] = counts.get(selector, 0) + 1
+
+    def pages_per_minute(self):
+        elapsed = time.time() - self.started
+        return self.counter("pages_total") / elapsed * 60 if elapsed > 0 else 0.0
+
+    def snapshot(self):
+        """Toàn bộ số liệu dạng dict (ghi ra JSON, gửi từ tiến trình con về tiến trình chính)"""
+        with self._lock:
+            phases = {name: histogram.to_dict() for name, histogram in self.phases.items()}
+            counters = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+            selectors = {}
+            for field, counts in self.selectors.items():
+                hits = {selector: count for selector, count in counts.items() if selector is not None}
+                total = sum(counts.values())
+                selectors[field] = {
+                    "hits": dict(sorted(hits.items(), key=lambda item: -item[1])),
+                    "misses": counts.get(None, 0),
+                    "hit_rate": round(sum(hits.values()) / total, 4) if total else 0.0,
+                }
+            failed_asins = dict(self.failed_asins)
+        now = time.time()
+        return {
+            "started_at": datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec='seconds'),
+            "updated_at": datetime.fromtimestamp(now, timezone.utc).isoformat(timespec='seconds'),
+            "elapsed_seconds": round(now - self.started, 3),
+            "pages_per_minute": round(self.pages_per_minute(), 3),
+            "phases": phases,
+            "counters": counters,
+            "selectors": selectors,
+            "failed_asins": failed_asins,
+        }
+
+    def merge(self, snapshot):
+        """Cộng số liệu của tiến trình khác (kết quả snapshot()) vào đây"""
+        with self._lock:
+            for name, data in snapshot.get("phases", {}).items():
+                self.phases.setdefault(name, Histogram()).merge(data)
+            for name, series in snapshot.get("counters", {}).items():
+                for item in series:
+                    key = (name, tuple(sorted(item["labels"].items())))
+                    self.counters[key] = self.counters.get(key, 0) + item["value"]
+            for field, data in snapshot.get("selectors", {}).items():
+                counts = self.selectors.setdefault(field, {})
+                for selector, count in data["hits"].items():
+                    counts[selector] = counts.get(selector, 0) + count
+                if data["misses"]:
+                    counts[None] = counts.get(None, 0) + data["misses"]
+            self.failed_asins.update(snapshot.get("failed_asins", {}))
+
+    def to_prometheus(self):
+        """Số liệu theo định dạng text của Prometheus (dùng với textfile collector của node_exporter)"""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {PREFIX}_phase_seconds Thời gian mỗi giai đoạn xử lý một ASIN",
+            f"# TYPE {PREFIX}_phase_seconds histogram",
+        ]
+        for phase, data in sorted(snapshot["phases"].items()):
+            for bound, count in data["buckets"].items():
+                lines.append(f"{PREFIX}_phase_seconds_bucket{_labels([('phase', phase), ('le', bound)])} {count}")
+            lines.append(f"{PREFIX}_phase_seconds_sum{_labels([('phase', phase)])} {data['sum']}")
+            lines.append(f"{PREFIX}_phase_seconds_count{_labels([('phase', phase)])} {data['count']}")
+
+        for name, series in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE {PREFIX}_{name} counter")
+            for item in series:
+                lines.append(f"{PREFIX}_{name}{_labels(sorted(item['labels'].items()))} {item['value']}")
+
+        lines.append(f"# TYPE {PREFIX}_selector_hits_total counter")
+        for field, data in sorted(snapshot["selectors"].items()):
+            for selector, count in data["hits"].items():
+                lines.append(f"{PREFIX}_selector_hits_total{_labels([('field', field), ('selector', selector)])} {count}")
+        lines.append(f"# TYPE {PREFIX}_selector_misses_total counter")
+        for field, data in sorted(snapshot["selectors"].items()):
+            lines.append(f"{PREFIX}_selector_misses_total{_labels([('field', field)])} {data['misses']}")
+
+        lines.append(f"# TYPE {PREFIX}_pages_per_minute gauge")
+        lines.append(f"{PREFIX}_pages_per_minute {snapshot['pages_per_minute']}")
+        lines.append(f"# TYPE {PREFIX}_start_time_seconds gauge")
+        lines.append(f"{PREFIX}_start_time_seconds {self.started:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path=None, prom_path=None):
+        """Ghi JSON và textfile Prometheus (ghi file tạm rồi đổi tên để không ai đọc phải file dở)"""
+        outputs = []
+        if json_path:
+            outputs.append((json_path, json.dumps(self.snapshot(), ensure_ascii=False, indent=2) + "\n"))
+        if prom_path:
+            outputs.append((prom_path, self.to_prometheus()))
+        for path, content in outputs:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+
+    def summary(self):
+        pages = self.counter("pages_total")
+        failed = self.counter("pages_total", outcome="failed")
+        with self._lock:
+            phases = ", ".join(f"{name} tb {histogram.sum / histogram.count:.2f}s p90 ≤{histogram.quantile(0.9):g}s"
+                               for name, histogram in self.phases.items() if histogram.count)
+            failures = {dict(labels)["reason"]: value for (name, labels), value in self.counters.items()
+                        if name == "failures_total"}
+        text = f"Metrics: {pages} trang ({failed} lỗi), {self.pages_per_minute():.1f} trang/phút"
+        if failures:
+            text += ". Lỗi theo lý do: " + ", ".join(f"{reason} {count}" for reason, count in failures.items())
+        if phases:
+            text += ". Giai đoạn: " + phases
+        return text
+
+
+class MetricsExporter:
+    """Ghi get_metrics() ra CONFIG.METRICS_FILE (JSON) và CONFIG.METRICS_TEXTFILE (Prometheus)
+    mỗi CONFIG.METRICS_INTERVAL giây ở luồng nền và một lần cuối khi kết thúc
+
+        with MetricsExporter(logger=logger):
+            ...
+    """
+
+    def __init__(self, metrics=None, json_path=None, prom_path=None, interval=None, logger=None):
+        self.metrics = metrics or get_metrics()
+        self.json_path = json_path if json_path is not None else CONFIG.METRICS_FILE
+        self.prom_path = prom_path if prom_path is not None else CONFIG.METRICS_TEXTFILE
+        self.interval = interval if interval is not None else CONFIG.METRICS_INTERVAL
+        self.logger = logger or logging.getLogger(__name__)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def write(self):
+        try:
+            self.metrics.write(self.json_path, self.prom_path)
+        except OSError as e:
+            self.logger.warning(f"Không ghi được metrics: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def start(self):
+        if self.interval and (self.json_path or self.prom_path):
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write()
+        self.logger.info(self.metrics.summary())
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Metrics dùng chung cho cả lần chạy"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+        return _metrics
@@ -0,0 +1,150 @@
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from urllib.parse import urlparse
+
+from config import CONFIG
+
+
+class PageCache:
+    """Kho lưu trang sản phẩm theo ASIN + marketplace trên đĩa (SQLite WAL, nén zlib)
+
+    mode: "use"     - đọc và ghi cache (mặc định)
+          "refresh" - bỏ qua dữ liệu cũ nhưng vẫn ghi kết quả mới
+          "bypass"  - không đọc, không ghi
+    Mỗi mục có TTL riêng; khi tổng dung lượng vượt max_bytes thì xóa mục ít dùng nhất (LRU). Việc dọn
+    (quét tổng dung lượng) chạy mỗi evict_every lần ghi, không phải mỗi lần.
+    """
+
+    def __init__(self, path=None, ttl=None, max_bytes=None, mode="use", marketplace=None, logger=None,
+                 evict_every=None):
+        self.path = path or CONFIG.CACHE_FILE
+        self.ttl = ttl if ttl is not None else CONFIG.CACHE_TTL
+        self.max_bytes = max_bytes if max_bytes is not None else CONFIG.CACHE_MAX_BYTES
+        self.evict_every = evict_every or CONFIG.CACHE_EVICT_EVERY
+        self.mode = mode
+        self.marketplace = marketplace or urlparse(CONFIG.BASE_URL).netloc
+        self.logger = logger or logging.getLogger(__name__)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connect(self):
+        """Mỗi luồng một kết nối SQLite riêng"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    key TEXT PRIMARY KEY,
+                    asin TEXT NOT NULL,
+                    marketplace TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _key(self, asin, kind):
+        return f"{self.marketplace}:{asin}:{kind}"
+
+    def get(self, asin, kind="fields"):
+        """Trả về dữ liệu đã lưu (dict cho "fields", str cho "html") hoặc None"""
+        if self.mode != "use":
+            return None
+
+        conn = self._connect()
+        key = self._key(asin, kind)
+        row = conn.execute("SELECT data, expires_at FROM pages WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or row[1] < now:
+            if row is not None:
+                with conn:
+                    conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+            self._count('misses')
+            return None
+
+        with conn:
+            conn.execute("UPDATE pages SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count('hits')
+        data = zlib.decompress(row[0]).decode('utf-8')
+        return json.loads(data) if kind == "fields" else data
+
+    def put(self, asin, value, kind="fields", ttl=None):
+        if self.mode == "bypass" or not value:
+            return
+
+        data = json.dumps(value, ensure_ascii=False) if kind == "fields" else value
+        blob = zlib.compress(data.encode('utf-8'))
+        now = time.time()
+        ttl = ttl if ttl is not None else self.ttl
+
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key(asin, kind), asin, self.marketplace, kind, blob, len(blob), now, now + ttl, now)
+            )
+        with self._stats_lock:
+            self.writes += 1
+            evict = self.writes % self.evict_every == 0
+        if evict:
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """Xóa mục hết hạn, sau đó xóa mục ít dùng nhất cho tới khi dưới max_bytes"""
+        with conn:
+            expired = conn.execute("DELETE FROM pages WHERE expires_at < ?", (time.time(),)).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+            excess = total - self.max_bytes
+            victims = []
+            if excess > 0:
+                for key, size in conn.execute("SELECT key, size FROM pages ORDER BY accessed_at"):
+                    victims.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                conn.executemany("DELETE FROM pages WHERE key = ?", victims)
+        if expired or victims:
+            self._count('evictions', expired + len(victims))
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        hit_rate = (self.hits / lookups * 100) if lookups else 0
+        return (f"Page cache ({self.mode}): {self.hits} hit, {self.misses} miss ({hit_rate:.0f}%), "
+                f"{self.writes} lần ghi, {self.evictions} mục bị xóa")
+
+
+_page_cache = None
+
+
+def get_page_cache():
+    """PageCache dùng chung cho cả lần chạy"""
+    global _page_cache
+    if _page_cache is None:
+        _page_cache = PageCache()
+    return _page_cache
+
+
+def set_cache_mode(mode):
+    """Đặt chế độ cache từ cờ dòng lệnh (--no-cache / --refresh-cache)"""
+    get_page_cache().mode = mode
@@ -0,0 +1,89 @@
+import time
+import logging
+from collections import OrderedDict
+
+from config import CONFIG
+from js_extractor import extract_from_driver
+from metrics import get_metrics
+from rate_limiter import get_rate_limiter
+from readiness import PageReadiness, FAILED_PAGE_STATES
+from timing import PhaseTimer
+
+
+class PageSession:
+    """Giữ trang đã tải và kết quả trích xuất của các ASIN gần nhất
+
+    Mỗi ASIN chỉ driver.get một lần; các lần hỏi lại (thông tin, ảnh) được trả từ bộ nhớ. Chỉ giữ
+    max_pages trang dùng gần nhất (LRU) để bộ nhớ không tăng theo số ASIN của lần chạy.
+    """
+
+    def __init__(self, driver, logger=None, deadlines=None, max_pages=None):
+        self.driver = driver
+        self.logger = logger or logging.getLogger(__name__)
+        self.readiness = PageReadiness(driver, deadlines=deadlines, logger=self.logger)
+        self.timer = PhaseTimer()
+        self.max_pages = max_pages or CONFIG.PAGE_SESSION_MAX_PAGES
+        self.pages = OrderedDict()
+        self.current_asin = None
+        self.loads = 0
+        self.hits = 0
+
+    def is_loaded(self, asin):
+        return asin in self.pages
+
+    def load(self, asin, ready=("title", "price", "images")):
+        """Tải trang của ASIN (nếu chưa có), chờ các điều kiện ready rồi trích xuất mọi trường,
+        trả về None nếu trang không phải trang sản phẩm hoặc tiêu đề không xuất hiện trước hạn"""
+        if asin in self.pages:
+            self.hits += 1
+            self.logger.debug(f"Dùng lại trang đã tải của ASIN {asin}")
+            self.pages.move_to_end(asin)
+            return self.pages[asin]
+
+        url = f"{CONFIG.BASE_URL}{asin}"
+        with self.timer.phase("rate_limit"):
+            get_rate_limiter().acquire(url)
+        with self.timer.phase("navigate"):
+            self.driver.get(url)
+        self.loads += 1
+        self.current_asin = asin
+
+        with self.timer.phase("classify"):
+            state = self.readiness.classify()
+        if state in FAILED_PAGE_STATES:
+            get_metrics().note_failure(state)
+            return None
+
+        # Trả về ngay khi trường cần thiết đã có, không chờ cố định
+        with self.timer.phase("wait"):
+            waited = self.readiness.wait(ready)
+        if "title" in waited and waited["title"] is None:
+            self.logger.warning(f"Timeout loading page for ASIN {asin}: không thấy tiêu đề sau "
+                                f"{self.readiness.deadlines['title']}s")
+            get_metrics().note_failure("title_timeout")
+            return None
+
+        with self.timer.phase("extract"):
+            fields = extract_from_driver(self.driver, asin, logger=self.logger)
+        entry = {
+            "asin": asin,
+            "url": url,
+            "fields": fields,
+            "loaded_at": time.time(),
+        }
+        self.pages[asin] = entry
+        while len(self.pages) > self.max_pages:
+            self.pages.popitem(last=False)
+        return entry
+
+    def get_fields(self, asin, **load_kwargs):
+        entry = self.load(asin, **load_kwargs)
+        return entry["fields"] if entry else None
+
+    def forget(self, asin):
+        """Bỏ kết quả đã lưu để lần sau tải lại trang"""
+        self.pages.pop(asin, None)
+
+    def summary(self):
+        return (f"PageSession: {self.loads} lần tải trang, {self.hits} lần dùng lại từ bộ nhớ. "
+                f"{self.timer.summary()}")
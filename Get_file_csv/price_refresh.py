@@ -0,0 +1,318 @@
+"""Cập nhật nhanh cột Variant Price của một file export Shopify, mọi byte khác giữ nguyên
+
+Chỉ lấy giá và tình trạng hàng (price_selectors, #availability): thử HTML tĩnh qua HTTP trước, ASIN còn
+thiếu mới mở trình duyệt (chặn tài nguyên như thường, chỉ chờ giá, không cuộn trang, không lấy mô tả /
+thương hiệu / ảnh). Ô Variant Price được thay tại chỗ trong nội dung file, các cột và dòng khác (kể cả
+dòng ảnh, kiểu xuống dòng, BOM, cách đặt dấu ngoặc kép) được chép nguyên.
+
+Ví dụ:
+    python price_refresh.py export.csv                       # ghi export_prices.csv
+    python price_refresh.py export.csv --output out.csv --browsers 2
+"""
+import os
+import re
+import time
+import logging
+import argparse
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from config import CONFIG
+from browser_profile import apply_resource_policy, block_resources
+from driver_lifecycle import DriverWatchdog, install_signal_handlers
+from html_extractor import HtmlExtractor, clean_price
+from http_fetcher import get_http_fetcher, aiohttp
+from input_reader import normalize_asin
+from metrics import get_metrics, MetricsExporter
+from product_store import set_incremental
+from rate_limiter import get_rate_limiter
+from readiness import PageReadiness, FAILED_PAGE_STATES
+from selector_stats import get_selector_stats
+from worker_pool import iter_file_results
+from csv_writer import FailureReport
+
+# Một ô CSV: có ngoặc kép ("" là dấu " bên trong) hoặc không
+FIELD_PATTERN = re.compile(r'"(?:[^"]|"")*"|[^,\r\n]*')
+
+# Giá và tình trạng hàng trong một lần execute_script; arguments[0] là price_selectors theo tỉ lệ khớp
+PRICE_SCRIPT = """
+var selectors = arguments[0], M = arguments[1];
+function q(sel) {
+    try { return Array.prototype.slice.call(document.querySelectorAll(sel)); }
+    catch (e) { return []; }
+}
+function txt(el) { return ((el.innerText || el.textContent || '') + '').trim(); }
+var out = {price: '', selector: null, availability: '', unavailable: false};
+priceLoop:
+for (var i = 0; i < selectors.length; i++) {
+    var els = q(selectors[i]);
+    for (var j = 0; j < els.length; j++) {
+        var t = txt(els[j]);
+        if (t.replace(/[^\\d.]/g, '')) { out.price = t; out.selector = selectors[i]; break priceLoop; }
+    }
+}
+var availability = q(M.availability_selector)[0];
+out.availability = availability ? txt(availability) : '';
+out.unavailable = M.unavailable_selectors.some(function (sel) { return q(sel).length > 0; })
+    || M.unavailable_texts.some(function (t) { return out.availability.toLowerCase().indexOf(t.toLowerCase()) >= 0; });
+return out;
+"""
+
+
+def iter_records(text):
+    """(bắt đầu, kết thúc, [(bắt đầu, kết thúc) của từng ô]) cho mỗi bản ghi CSV trong text
+
+    Vị trí tính trên chính text nên có thể thay một ô mà không động tới phần còn lại; bản ghi có ô
+    nhiều dòng (trong ngoặc kép) vẫn là một bản ghi, kết thúc sau ký tự xuống dòng của nó.
+    """
+    pos = 0
+    end = len(text)
+    while pos < end:
+        start = pos
+        fields = []
+        while True:
+            match = FIELD_PATTERN.match(text, pos)
+            fields.append(match.span())
+            pos = match.end()
+            if pos < end and text[pos] == ',':
+                pos += 1
+                continue
+            break
+        if text.startswith('\r\n', pos):
+            pos += 2
+        elif pos < end and text[pos] in '\r\n':
+            pos += 1
+        elif pos < end:
+            # Ký tự lạ sau ô có ngoặc kép (CSV hỏng): bỏ qua tới hết dòng, giữ nguyên nội dung
+            newline = re.compile(r'\r\n|\r|\n').search(text, pos)
+            pos = newline.end() if newline else end
+        yield start, pos, fields
+
+
+def field_value(raw):
+    if raw.startswith('"') and raw.endswith('"') and len(raw) >= 2:
+        return raw[1:-1].replace('""', '"')
+    return raw
+
+
+def encode_field(value, quoted=False):
+    """Giá trị ô theo cú pháp CSV; giữ ngoặc kép nếu ô gốc có"""
+    if quoted or any(char in value for char in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def price_from_html(page_source, extractor=None):
+    """{"price", "selector", "availability", "unavailable"} từ HTML tĩnh, chỉ chạy selector giá và tình trạng hàng"""
+    extractor = extractor or HtmlExtractor()
+    markers = CONFIG.PAGE_STATE_MARKERS
+    root = HtmlExtractor.parse(page_source)
+    price, selector = extractor.get_price(root)
+    availability, _ = extractor._first_text(root, [markers['availability_selector']])
+    unavailable = any(extractor._select(root, sel) for sel in markers['unavailable_selectors']) \
+        or any(text.lower() in availability.lower() for text in markers['unavailable_texts'])
+    return {"price": price, "selector": selector, "availability": availability, "unavailable": unavailable}
+
+
+def price_extractor():
+    """HtmlExtractor thử price_selectors theo tỉ lệ khớp đã lưu (selector đã chết bị bỏ)"""
+    selectors = dict(CONFIG.SELECTORS)
+    selectors['price_selectors'] = get_selector_stats().ordered('price_selectors')
+    return HtmlExtractor(selectors=selectors)
+
+
+def is_complete(result):
+    return bool(result.get("price") or result.get("unavailable"))
+
+
+def prefetch_prices(asins, logger=None):
+    """Giá lấy được từ HTML tĩnh (HTTP); ASIN thiếu giá hoặc bị chặn để trình duyệt xử lý"""
+    logger = logger or logging.getLogger(__name__)
+    if not CONFIG.HTTP_FETCH or not asins:
+        return {}
+    if aiohttp is None:
+        logger.warning("Chưa cài aiohttp, mọi ASIN đi qua trình duyệt")
+        return {}
+    pages = get_http_fetcher().fetch(asins)
+    extractor = price_extractor()
+    stats = get_selector_stats()
+    prices = {}
+    for asin in asins:
+        page_source = pages.get(asin)
+        if not page_source:
+            continue
+        result = price_from_html(page_source, extractor)
+        if not is_complete(result):
+            continue
+        stats.record_winner('price_selectors', extractor.selectors['price_selectors'], result["selector"])
+        get_metrics().inc("pages_total", source="http", outcome="ok")
+        prices[asin] = result
+    logger.info(f"HTTP: {len(prices)}/{len(asins)} ASIN có giá, {len(asins) - len(prices)} ASIN cần trình duyệt")
+    return prices
+
+
+def create_driver():
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    # Không tải ảnh/CSS/font/quảng cáo, driver.get trả về khi DOM sẵn sàng (CONFIG.BLOCK_RESOURCES)
+    apply_resource_policy(chrome_options)
+    driver = webdriver.Chrome(options=chrome_options)
+    block_resources(driver)
+    return driver
+
+
+class PriceWorker:
+    """Một driver chỉ lấy giá và tình trạng hàng, dùng trong WorkerPool"""
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger(__name__)
+        self.driver = create_driver()
+        self.watchdog = DriverWatchdog(self.driver, logger=self.logger)
+        self.readiness = PageReadiness(self.driver, logger=self.logger)
+
+    def scrape(self, asin):
+        metrics = get_metrics()
+        url = f"{CONFIG.BASE_URL}{asin}"
+        self.watchdog.record_page()
+        with metrics.phase("rate_limit"):
+            get_rate_limiter().acquire(url)
+        with metrics.phase("navigate"):
+            self.driver.get(url)
+        with metrics.phase("classify"):
+            state = self.readiness.classify()
+        if state == "variant_unavailable":
+            return {"price": "", "selector": None, "availability": "variant_unavailable", "unavailable": True}
+        if state in FAILED_PAGE_STATES:
+            metrics.note_failure(state)
+            return {}
+
+        # Chỉ chờ giá, không chờ ảnh / DOM ổn định và không cuộn trang
+        with metrics.phase("wait"):
+            self.readiness.wait(("price",))
+        stats = get_selector_stats()
+        selectors = stats.ordered('price_selectors')
+        with metrics.phase("extract"):
+            result = self.driver.execute_script(PRICE_SCRIPT, selectors, CONFIG.PAGE_STATE_MARKERS) or {}
+        stats.record_winner('price_selectors', selectors, result.get("selector"))
+        result["price"] = clean_price(result.get("price"))
+        if not is_complete(result):
+            metrics.note_failure("no_price")
+            return {}
+        return result
+
+    def restart_reason(self, failed=False):
+        return self.watchdog.restart_reason(failed)
+
+    def close(self):
+        self.watchdog.quit()
+
+
+def refresh_prices(export_csv_path, output_csv_path=None, browsers=None, logger=None):
+    """Ghi bản sao của export_csv_path với Variant Price mới, trả về (đường dẫn output, thống kê)"""
+    logger = logger or logging.getLogger(__name__)
+    output_csv_path = output_csv_path or f"{os.path.splitext(export_csv_path)[0]}_prices.csv"
+    start = time.perf_counter()
+
+    # surrogateescape: byte không phải UTF-8 hợp lệ cũng được ghi lại y nguyên
+    with open(export_csv_path, 'rb') as f:
+        text = f.read().decode('utf-8', errors='surrogateescape')
+    records = list(iter_records(text))
+    if not records:
+        logger.error(f"File {export_csv_path} trống")
+        return None, {}
+
+    header = [field_value(text[a:b]).lstrip('\ufeff').strip() for a, b in records[0][2]]
+    if 'Variant SKU' not in header or 'Variant Price' not in header:
+        logger.error("File export phải có cột 'Variant SKU' và 'Variant Price'")
+        return None, {}
+    sku_index = header.index('Variant SKU')
+    price_index = header.index('Variant Price')
+
+    # Các dòng biến thể có ASIN (dòng ảnh không có Variant SKU thì chép nguyên)
+    variants = []
+    for index, (_, _, fields) in enumerate(records[1:], start=1):
+        if len(fields) <= max(sku_index, price_index):
+            continue
+        asin = normalize_asin(field_value(text[slice(*fields[sku_index])]))
+        if asin:
+            variants.append((index, asin))
+    logger.info(f"{len(variants)} biến thể có ASIN trong {len(records) - 1} dòng")
+
+    stats = {"updated": 0, "unchanged": 0, "unavailable": 0, "failed": 0}
+    failures = FailureReport(output_csv_path, logger=logger)
+    partial_path = f"{output_csv_path}.partial"
+    copied = 0
+    with open(partial_path, 'wb') as out:
+        def copy_until(index):
+            nonlocal copied
+            if index > copied:
+                out.write(text[records[copied][0]:records[index - 1][1]].encode('utf-8', errors='surrogateescape'))
+                copied = index
+
+        for _, (index, asin), result in iter_file_results(
+            [variants],
+            lambda: PriceWorker(logger),
+            browsers,
+            logger,
+            prefetch=lambda asins: prefetch_prices(asins, logger),
+            get_asin=lambda item: item[1]
+        ):
+            copy_until(index)
+            record_start, record_end, fields = records[index]
+            price_start, price_end = fields[price_index]
+            old_raw = text[price_start:price_end]
+            new_price = result.get("price", "")
+            if not result:
+                stats["failed"] += 1
+                failures.add(index + 1, asin, get_metrics().failed_asins.get(asin))
+            elif not new_price:
+                stats["unavailable"] += 1
+                logger.info(f"ASIN {asin} không bán ({result.get('availability')}), giữ giá cũ")
+            elif new_price == field_value(old_raw):
+                stats["unchanged"] += 1
+            else:
+                stats["updated"] += 1
+                logger.info(f"ASIN {asin}: {field_value(old_raw) or '-'} -> {new_price}")
+                record = (text[record_start:price_start] + encode_field(new_price, old_raw.startswith('"'))
+                          + text[price_end:record_end])
+                out.write(record.encode('utf-8', errors='surrogateescape'))
+                copied = index + 1
+                continue
+            copy_until(index + 1)
+        copy_until(len(records))
+    os.replace(partial_path, output_csv_path)
+    failures.close()
+
+    seconds = time.perf_counter() - start
+    stats["seconds"] = round(seconds, 1)
+    logger.info(f"Giá: {stats['updated']} thay đổi, {stats['unchanged']} giữ nguyên, {stats['unavailable']} không bán, "
+                f"{stats['failed']} lỗi trong {seconds:.1f}s ({len(variants) / seconds * 60 if seconds else 0:.0f} ASIN/phút). "
+                f"Đã ghi {output_csv_path}")
+    return output_csv_path, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Cập nhật Variant Price của file export Shopify')
+    parser.add_argument('export', help='File CSV export Shopify (có cột Variant SKU, Variant Price)')
+    parser.add_argument('--output', help='File output (mặc định <export>_prices.csv)')
+    parser.add_argument('--browsers', type=int, default=CONFIG.WORKERS, help='Số trình duyệt cho ASIN không lấy được qua HTTP')
+    parser.add_argument('--no-http', action='store_true', help='Không thử HTML tĩnh, mọi ASIN qua trình duyệt')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if not os.path.exists(args.export):
+        parser.error(f"Không tìm thấy file export: {args.export}")
+    if args.no_http:
+        CONFIG.HTTP_FETCH = False
+    install_signal_handlers()
+    # Giá luôn lấy mới, không dùng thông tin đã lưu trong kho (--incremental của các script scrape)
+    set_incremental(False)
+
+    # Metrics ghi định kỳ trong lúc chạy và một lần cuối (CONFIG.METRICS_FILE, CONFIG.METRICS_TEXTFILE)
+    with MetricsExporter():
+        refresh_prices(args.export, args.output, args.browsers)
+    get_selector_stats().save()
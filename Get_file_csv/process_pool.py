@@ -0,0 +1,226 @@
+import os
+import glob
+import json
+import time
+import zlib
+import queue
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from config import CONFIG
+from checkpoint import CheckpointJournal
+from input_reader import InputReader
+from page_cache import get_page_cache, set_cache_mode
+from rate_limiter import get_rate_limiter
+from http_fetcher import prefetch_infos
+from driver_lifecycle import install_signal_handlers
+from worker_pool import iter_file_results
+from metrics import get_metrics
+from product_store import get_product_store
+
+
+def shard_of(asin, shards):
+    """Shard cố định của một ASIN: cùng ASIN luôn về cùng tiến trình nên vẫn chỉ scrape một lần"""
+    return zlib.crc32(asin.encode('utf-8')) % shards
+
+
+def run_key(input_paths):
+    """Tên nhật ký theo các file input (không theo số tiến trình) để --resume dùng lại được với --processes khác"""
+    paths = [os.path.abspath(path) for path in input_paths]
+    stem = os.path.splitext(os.path.basename(paths[0]))[0] if paths else "input"
+    return f"{stem}_{zlib.crc32(chr(0).join(paths).encode('utf-8')):08x}"
+
+
+def shard_path(directory, key, index):
+    return os.path.join(directory, f"{key}_shard_{index + 1:03d}.jsonl")
+
+
+def prepare_shards(directory, key, shards, resume=False, logger=None):
+    """Chuẩn bị nhật ký cho shards tiến trình, trả về danh sách đường dẫn theo shard
+
+    Khi --resume, kết quả trong mọi nhật ký cũ của cùng input (có thể từ lần chạy với số tiến trình khác)
+    được chia lại theo shard_of(asin, shards). Không resume thì các nhật ký cũ bị xóa.
+    """
+    paths = [shard_path(directory, key, index) for index in range(shards)]
+    previous = sorted(glob.glob(os.path.join(glob.escape(directory), f"{glob.escape(key)}_shard_*.jsonl")))
+    if not resume:
+        for path in previous:
+            os.remove(path)
+        return paths
+
+    completed = load_shards(previous, logger)
+    temporary = [path + ".tmp" for path in paths]
+    files = [open(path, 'w', encoding='utf-8') for path in temporary]
+    try:
+        for asin, info in completed.items():
+            files[shard_of(asin, shards)].write(json.dumps({"asin": asin, "info": info}, ensure_ascii=False) + "\n")
+    finally:
+        for f in files:
+            f.close()
+    for path in previous:
+        os.remove(path)
+    for source, path in zip(temporary, paths):
+        os.replace(source, path)
+    return paths
+
+
+def _config_snapshot():
+    """Các giá trị CONFIG hiện tại (kể cả thay đổi lúc chạy) để tiến trình con dùng giống hệt"""
+    return {name: value for name, value in vars(CONFIG).items() if not name.startswith('_')}
+
+
+def scrape_shard(index, shards, input_paths, create_worker, build_info, browsers, path, results,
+                 config=None, rate=None, cache_mode=None, resume=False, setup_logger=None):
+    """Chạy trong tiến trình con: scrape các ASIN thuộc shard index, ghi kết quả vào nhật ký path
+    và gửi từng (asin, kết quả) về tiến trình chính qua hàng đợi results ngay khi xong
+
+    Mỗi tiến trình đọc lại các file input và chỉ giữ ASIN của mình, nên không phải gửi danh sách
+    ASIN qua các tiến trình. Nhật ký có cùng định dạng CheckpointJournal nên --resume dùng được.
+    """
+    for name, value in (config or {}).items():
+        setattr(CONFIG, name, value)
+    # Ngân sách yêu cầu chung được chia đều cho các tiến trình
+    if rate is not None:
+        CONFIG.REQUESTS_PER_SECOND = rate
+    if cache_mode is not None:
+        set_cache_mode(cache_mode)
+    install_signal_handlers()
+
+    name = f"shard_{index + 1}"
+    if setup_logger is not None:
+        logger = setup_logger(name)
+    else:
+        logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - {name} - %(levelname)s - %(message)s')
+        logger = logging.getLogger(name)
+
+    # Dòng lỗi trong input đã được tiến trình chính báo, không lặp lại ở từng shard
+    reader_logger = logging.getLogger(f"{name}.input")
+    reader_logger.setLevel(logging.ERROR)
+
+    def rows(input_path):
+        for item in InputReader(input_path, logger=reader_logger):
+            if shard_of(item[2], shards) == index:
+                yield item
+
+    prefetch = None
+    if build_info is not None:
+        prefetch = lambda asins: prefetch_infos(asins, build_info, logger)
+
+    start = time.perf_counter()
+    stats = {"shard": index, "rows": 0, "succeeded": 0}
+    sent = set()
+    for _, item, result in iter_file_results(
+        [rows(input_path) for input_path in input_paths],
+        lambda: create_worker(logger=logger),
+        browsers,
+        logger,
+        prefetch=prefetch,
+        checkpoint=CheckpointJournal(path, resume=resume, logger=logger),
+        get_asin=lambda item: item[2]
+    ):
+        stats["rows"] += 1
+        stats["succeeded"] += bool(result)
+        # ASIN trùng giữa các dòng chỉ gửi một lần, tiến trình chính dùng lại cho mọi dòng
+        if item[2] not in sent:
+            sent.add(item[2])
+            results.put((item[2], result))
+    stats["seconds"] = time.perf_counter() - start
+    # Metrics của tiến trình con được gửi về để tiến trình chính gộp và xuất chung
+    stats["metrics"] = get_metrics().snapshot()
+
+    logger.info(get_page_cache().summary())
+    logger.info(get_rate_limiter().summary())
+    logger.info(get_product_store().summary())
+    return stats
+
+
+def process_count(processes=None, input_paths=(), logger=None):
+    """Số tiến trình sẽ dùng: processes hoặc CONFIG.PROCESSES, 0 là theo số lõi CPU
+
+    Đọc input từ stdin thì không chia được cho các tiến trình con, luôn trả về 1.
+    """
+    processes = CONFIG.PROCESSES if processes is None else processes
+    processes = processes or os.cpu_count() or 1
+    if processes > 1 and '-' in input_paths:
+        (logger or logging.getLogger(__name__)).warning("Input từ stdin, chạy trong một tiến trình")
+        return 1
+    return processes
+
+
+def load_shards(paths, logger=None):
+    """Gộp nhật ký của các shard thành dict asin -> kết quả"""
+    results = {}
+    for path in paths:
+        results.update(CheckpointJournal(path, resume=True, logger=logger).load())
+    return results
+
+
+def iter_sharded_results(file_jobs, input_paths, create_worker, processes=None, browsers=None, logger=None,
+                         build_info=None, directory=None, resume=False, get_asin=None, setup_logger=None):
+    """Như iter_file_results nhưng chia ASIN cho nhiều tiến trình, mỗi tiến trình có browsers
+    trình duyệt riêng; trả về (file_index, dòng, kết quả) theo đúng thứ tự dòng của từng file
+
+    Các shard gửi kết quả về qua một hàng đợi ngay khi từng ASIN xong; mỗi dòng của file_jobs được trả
+    về khi kết quả của nó tới, nên output bắt đầu được ghi trong lúc các shard còn chạy và vẫn giống
+    hệt nhau với mọi số tiến trình. Mỗi shard cũng ghi kết quả vào nhật ký riêng trong directory (đặt tên
+    theo các file input) cho --resume. Metrics của từng shard được cộng vào get_metrics() khi shard đó xong.
+
+    create_worker: hàm/lớp ở cấp module (pickle được), gọi create_worker(logger=...) trong tiến trình con
+    build_info: hàm ở cấp module dùng cho prefetch_infos, None thì không prefetch
+    """
+    processes = process_count(processes)
+    browsers = browsers or CONFIG.BROWSERS_PER_PROCESS
+    directory = directory or CONFIG.SHARD_DIR
+    get_asin = get_asin or (lambda row: row)
+    logger = logger or logging.getLogger(__name__)
+    os.makedirs(directory, exist_ok=True)
+
+    paths = prepare_shards(directory, run_key(input_paths), processes, resume, logger)
+    rate = get_rate_limiter().rate / processes
+    logger.info(f"Chia ASIN cho {processes} tiến trình, {browsers or CONFIG.WORKERS} trình duyệt mỗi tiến trình, "
+                f"kết quả tạm trong {directory}")
+
+    # spawn trên mọi hệ điều hành: không kế thừa luồng, driver hay kết nối SQLite của tiến trình chính
+    start = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager, ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+        channel = manager.Queue()
+        futures = [
+            executor.submit(scrape_shard, index, processes, list(input_paths), create_worker, build_info,
+                            browsers, paths[index], channel, _config_snapshot(), rate, get_page_cache().mode,
+                            resume, setup_logger)
+            for index in range(processes)
+        ]
+        pending = set(futures)
+        results = {}
+
+        def collect_finished():
+            """Gộp metrics của các shard vừa xong (lỗi trong shard được ném lại ở đây)"""
+            for future in [future for future in pending if future.done()]:
+                pending.discard(future)
+                stats = future.result()
+                get_metrics().merge(stats["metrics"])
+                logger.info(f"Shard {stats['shard'] + 1}/{processes}: {stats['rows']} ASIN, "
+                            f"{stats['succeeded']} thành công trong {stats['seconds']:.1f}s")
+                if not pending:
+                    logger.info(f"Các shard xong sau {time.perf_counter() - start:.1f}s")
+
+        def wait_for(asin):
+            """Nhận kết quả từ hàng đợi cho tới khi có asin, hoặc mọi shard đã xong mà không có"""
+            while asin not in results:
+                try:
+                    received, result = channel.get(timeout=0.5)
+                    results[received] = result
+                except queue.Empty:
+                    collect_finished()
+                    # Shard gửi kết quả trước khi kết thúc nên hàng đợi rỗng sau khi mọi shard xong là hết
+                    if not pending and channel.empty():
+                        return {}
+            return results[asin]
+
+        for file_index, rows in enumerate(file_jobs):
+            for row in rows:
+                yield file_index, row, wait_for(get_asin(row))
+        wait(pending)
+        collect_finished()
@@ -0,0 +1,195 @@
+"""Kho thông tin sản phẩm lần scrape gần nhất của từng ASIN, dùng cho refresh tăng dần (--incremental)
+
+Ví dụ:
+    python product_store.py seed old_export.csv          # nạp một file export cũ vào kho
+    python product_store.py stats
+    python "get file csv5.py" --incremental --max-age 7   # chỉ scrape ASIN mới hoặc cũ hơn 7 ngày
+"""
+import os
+import csv
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from urllib.parse import urlparse
+
+from config import CONFIG
+from input_reader import normalize_asin
+
+# Các cột của một file export Shopify được nạp vào kho (seed), đúng tên khóa của thông tin sản phẩm
+SEED_COLUMNS = (
+    "Handle", "Title", "Body (HTML)", "Vendor", "Tags", "Brand",
+    "Variant Grams", "Variant Price", "Variant Barcode", "Image Src", "Image Position",
+)
+
+
+class ProductStore:
+    """Thông tin sản phẩm (dict như kết quả scrape) và thời điểm lấy của từng ASIN + marketplace (SQLite WAL)
+
+    Khác PageCache: mục không hết hạn hay bị xóa theo dung lượng, chỉ bị ghi đè khi ASIN được scrape lại;
+    độ cũ được xét lúc đọc theo max_age nên cùng một kho dùng được cho nhiều nhịp refresh khác nhau.
+    Mọi kết quả scrape thành công đều được ghi; chỉ khi incremental thì fresh() mới trả dữ liệu từ kho.
+    """
+
+    def __init__(self, path=None, max_age=None, incremental=None, marketplace=None, logger=None):
+        self.path = path if path is not None else CONFIG.STORE_FILE
+        self.max_age = max_age if max_age is not None else CONFIG.STORE_MAX_AGE
+        self.incremental = incremental if incremental is not None else CONFIG.INCREMENTAL
+        self.marketplace = marketplace or urlparse(CONFIG.BASE_URL).netloc
+        self.logger = logger or logging.getLogger(__name__)
+        self.reused = 0
+        self.stale = 0
+        self.new = 0
+        self.writes = 0
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connect(self):
+        """Mỗi luồng một kết nối SQLite riêng"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS products (
+                    marketplace TEXT NOT NULL,
+                    asin TEXT NOT NULL,
+                    info TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (marketplace, asin)
+                )
+            """)
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def _count(self, **amounts):
+        with self._stats_lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def fresh(self, asins):
+        """dict asin -> thông tin đã lưu cho các ASIN chưa quá max_age giây (rỗng nếu không incremental)"""
+        if not self.incremental or not self.path:
+            return {}
+        asins = list(dict.fromkeys(asins))
+        conn = self._connect()
+        found = {}
+        # SQLite giới hạn số tham số trong một câu lệnh
+        for start in range(0, len(asins), 500):
+            batch = asins[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update((asin, (info, fetched_at)) for asin, info, fetched_at in conn.execute(
+                f"SELECT asin, info, fetched_at FROM products WHERE marketplace = ? AND asin IN ({placeholders})",
+                [self.marketplace] + batch))
+        cutoff = time.time() - self.max_age
+        result = {asin: json.loads(info) for asin, (info, fetched_at) in found.items() if fetched_at >= cutoff}
+        self._count(reused=len(result), stale=len(found) - len(result), new=len(asins) - len(found))
+        return result
+
+    def put(self, asin, info, fetched_at=None):
+        """Lưu kết quả scrape thành công (có Title); kết quả lỗi không ghi đè dữ liệu cũ"""
+        self.put_many({asin: info}, fetched_at)
+
+    def put_many(self, infos, fetched_at=None):
+        if not self.path:
+            return
+        now = fetched_at if fetched_at is not None else time.time()
+        rows = [(self.marketplace, asin, json.dumps(info, ensure_ascii=False), now)
+                for asin, info in infos.items() if info and info.get("Title")]
+        if not rows:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?)", rows)
+        self._count(writes=len(rows))
+
+    def seed_from_export(self, export_csv_path, fetched_at=None):
+        """Nạp một file export Shopify cũ vào kho: mỗi dòng biến thể có Variant SKU là ASIN thành một mục,
+        ảnh của mọi dòng cùng Handle được gộp lại; thời điểm lấy mặc định là thời gian sửa file.
+        Không ghi đè mục mới hơn. Trả về số ASIN đã nạp."""
+        fetched_at = fetched_at if fetched_at is not None else os.path.getmtime(export_csv_path)
+        images = {}
+        infos = {}
+        with open(export_csv_path, encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                handle = row.get("Handle", "")
+                if row.get("Image Src"):
+                    images.setdefault(handle, []).append(row["Image Src"])
+                asin = normalize_asin(row.get("Variant SKU"))
+                if asin and asin not in infos:
+                    infos[asin] = {column: row[column] for column in SEED_COLUMNS
+                                   if column in row and column != "Image Src"}
+        for info in infos.values():
+            info["Image Src"] = ",".join(dict.fromkeys(images.get(info.get("Handle", ""), [])))
+
+        conn = self._connect()
+        newer = set()
+        for start in range(0, len(infos), 500):
+            batch = list(infos)[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            newer.update(asin for (asin,) in conn.execute(
+                f"SELECT asin FROM products WHERE marketplace = ? AND fetched_at > ? AND asin IN ({placeholders})",
+                [self.marketplace, fetched_at] + batch))
+        seeded = {asin: info for asin, info in infos.items() if asin not in newer}
+        self.put_many(seeded, fetched_at)
+        return len([info for info in seeded.values() if info.get("Title")])
+
+    def stats(self):
+        """Số ASIN trong kho theo độ tuổi so với max_age"""
+        conn = self._connect()
+        cutoff = time.time() - self.max_age
+        total, fresh = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(fetched_at >= ?), 0) FROM products WHERE marketplace = ?",
+            (cutoff, self.marketplace)).fetchone()
+        return {"total": total, "fresh": fresh, "stale": total - fresh}
+
+    def summary(self):
+        if not self.incremental:
+            return f"Product store: {self.writes} ASIN được lưu"
+        return (f"Product store (max_age {self.max_age / 86400:g} ngày): {self.reused} ASIN lấy từ kho, "
+                f"{self.stale} đã cũ, {self.new} mới, {self.writes} ASIN được lưu")
+
+
+_product_store = None
+_product_store_lock = threading.Lock()
+
+
+def get_product_store():
+    """ProductStore dùng chung cho cả lần chạy"""
+    global _product_store
+    with _product_store_lock:
+        if _product_store is None:
+            _product_store = ProductStore()
+        return _product_store
+
+
+def set_incremental(incremental, max_age_days=None):
+    """Bật refresh tăng dần từ cờ dòng lệnh (--incremental, --max-age); ghi vào CONFIG để tiến trình con
+    (--processes) cũng dùng"""
+    CONFIG.INCREMENTAL = incremental
+    if max_age_days is not None:
+        CONFIG.STORE_MAX_AGE = max_age_days * 86400
+    store = get_product_store()
+    store.incremental = CONFIG.INCREMENTAL
+    store.max_age = CONFIG.STORE_MAX_AGE
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Quản lý kho thông tin sản phẩm (CONFIG.STORE_FILE)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    seed = subparsers.add_parser('seed', help='Nạp các file export Shopify cũ vào kho')
+    seed.add_argument('exports', nargs='+', help='File CSV export')
+    seed.add_argument('--fetched-at', type=float, help='Thời điểm lấy (Unix time), mặc định là thời gian sửa file')
+    subparsers.add_parser('stats', help='Số ASIN trong kho, còn mới / đã cũ theo CONFIG.STORE_MAX_AGE')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    store = ProductStore()
+    if args.command == 'seed':
+        for export in args.exports:
+            print(f"{export}: nạp {store.seed_from_export(export, args.fetched_at)} ASIN")
+    print(json.dumps(store.stats(), ensure_ascii=False))
@@ -0,0 +1,103 @@
+import time
+import asyncio
+import logging
+import threading
+from urllib.parse import urlparse
+
+from config import CONFIG
+
+
+class TokenBucket:
+    """Token bucket: tối đa rate yêu cầu mỗi giây, cho phép dồn tối đa burst yêu cầu
+
+    Mỗi lần acquire giữ chỗ một token ngay (token có thể âm), nên các luồng chờ theo đúng thứ tự
+    gọi và không ai phải ngủ khi bucket còn token.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.acquired = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Lấy một token, trả về số giây phải chờ trước khi được gửi yêu cầu"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.acquired += 1
+            self.waited += delay
+            return delay
+
+    def acquire(self):
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self):
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+
+class RateLimiter:
+    """Một TokenBucket cho mỗi host, dùng chung cho mọi worker và mọi đường tải (Selenium, HTTP)
+
+    Mặc định ngân sách lấy từ CONFIG.MIN_DELAY/MAX_DELAY: trung bình một yêu cầu mỗi
+    (MIN_DELAY + MAX_DELAY) / 2 giây cho cả lần chạy, không phải cho từng worker.
+    """
+
+    def __init__(self, rate=None, burst=None, logger=None):
+        self.rate = rate or CONFIG.REQUESTS_PER_SECOND or 2 / (CONFIG.MIN_DELAY + CONFIG.MAX_DELAY)
+        self.burst = burst or CONFIG.RATE_LIMIT_BURST
+        self.logger = logger or logging.getLogger(__name__)
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url):
+        host = urlparse(url).netloc or url
+        with self._lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+
+    def set_rate(self, rate):
+        """Đổi ngân sách (vd. khi số worker dùng chung hàng đợi thay đổi), áp dụng cả cho các host đã có"""
+        with self._lock:
+            self.rate = rate
+            for bucket in self.buckets.values():
+                with bucket._lock:
+                    bucket.rate = rate
+
+    def acquire(self, url):
+        """Chờ tới lượt gửi yêu cầu tới host của url, trả về số giây đã chờ"""
+        return self.bucket(url).acquire()
+
+    async def acquire_async(self, url):
+        return await self.bucket(url).acquire_async()
+
+    def summary(self):
+        parts = [f"{host}: {bucket.acquired} yêu cầu, chờ {bucket.waited:.1f}s"
+                 for host, bucket in self.buckets.items()]
+        return f"Rate limit {self.rate:.2f} yêu cầu/giây mỗi host. " + ("; ".join(parts) or "chưa có yêu cầu")
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """RateLimiter dùng chung cho cả lần chạy"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
@@ -0,0 +1,193 @@
+import time
+import logging
+
+from selenium.common.exceptions import WebDriverException
+
+from config import CONFIG
+
+# Thuộc tính chỉ có khi gallery ảnh đã được JS khởi tạo xong
+GALLERY_ATTRIBUTES = ['data-a-dynamic-image', 'data-old-hires']
+
+# Kiểm tra mọi điều kiện trong một lần execute_script. Lần gọi đầu cài MutationObserver để biết
+# thời điểm DOM thay đổi lần cuối (điều kiện "dom").
+READINESS_SCRIPT = """
+var S = arguments[0], quietMs = arguments[1];
+if (!window.__readiness) {
+    window.__readiness = {lastMutation: performance.now()};
+    new MutationObserver(function () { window.__readiness.lastMutation = performance.now(); })
+        .observe(document.documentElement, {childList: true, subtree: true, attributes: true, characterData: true});
+}
+function q(sel) {
+    try { return Array.prototype.slice.call(document.querySelectorAll(sel)); }
+    catch (e) { return []; }
+}
+function hasText(list) {
+    return list.some(function (sel) {
+        return q(sel).some(function (el) { return (el.textContent || '').trim().length > 0; });
+    });
+}
+function hasAttribute(list, attrs) {
+    return list.some(function (sel) {
+        return q(sel).some(function (el) {
+            return attrs.some(function (a) { return (el.getAttribute(a) || '').length > 0; });
+        });
+    });
+}
+return {
+    title: hasText(S.title),
+    price: hasText(S.price),
+    images: hasAttribute(S.images, S.image_attributes) || q(S.dynamic_image).length > 0,
+    dom: document.readyState !== 'loading' && performance.now() - window.__readiness.lastMutation >= quietMs
+};
+"""
+
+# Trang không phải sản phẩm: dừng ngay với lý do này thay vì chờ tiêu đề tới hết hạn.
+# "variant_unavailable" vẫn là trang sản phẩm (chỉ không có giá) nên vẫn được trích xuất như bình thường.
+FAILED_PAGE_STATES = ("not_found", "interstitial")
+
+# Phân loại trang ngay sau khi điều hướng theo URL, mã HTTP (Navigation Timing) và vài dấu hiệu DOM.
+# "loading" là chưa đủ dấu hiệu để kết luận, classify() hỏi lại tới khi hết hạn.
+PAGE_STATE_SCRIPT = """
+var M = arguments[0];
+function q(sel) {
+    try { return document.querySelector(sel); }
+    catch (e) { return null; }
+}
+function firstSelector(list) {
+    for (var i = 0; i < list.length; i++) { if (q(list[i])) return list[i]; }
+    return null;
+}
+function firstText(text, list) {
+    text = (text || '').toLowerCase();
+    for (var i = 0; i < list.length; i++) { if (text.indexOf(list[i].toLowerCase()) >= 0) return list[i]; }
+    return null;
+}
+var status = 0;
+try {
+    var nav = performance.getEntriesByType('navigation')[0];
+    status = (nav && nav.responseStatus) || 0;
+} catch (e) {}
+var url = location.href, title = document.title || '';
+var out = {url: url, status: status, state: 'loading', marker: null};
+var marker;
+
+if ((marker = firstText(url, M.interstitial_urls)) || (marker = firstSelector(M.interstitial_selectors))
+        || (marker = firstText(title, M.interstitial_titles)) || (status === 503 && (marker = 'HTTP 503'))) {
+    out.state = 'interstitial';
+} else if (((status === 404 || status === 410) && (marker = 'HTTP ' + status))
+        || (marker = firstSelector(M.not_found_selectors)) || (marker = firstText(title, M.not_found_titles))) {
+    out.state = 'not_found';
+} else if ((marker = firstSelector(M.product_selectors))) {
+    var availability = q(M.availability_selector);
+    var unavailable = firstSelector(M.unavailable_selectors)
+        || firstText(availability ? availability.textContent : '', M.unavailable_texts);
+    var priced = M.price_selectors.some(function (sel) {
+        var el = q(sel);
+        return el && /\d/.test(el.textContent || '');
+    });
+    if (unavailable && !priced) {
+        out.state = 'variant_unavailable';
+        marker = unavailable;
+    } else {
+        out.state = 'product';
+    }
+} else if (document.readyState !== 'loading' && !firstText(url, M.product_urls)) {
+    // Bị chuyển hướng khỏi trang sản phẩm (ASIN không còn, về trang chủ / trang tìm kiếm)
+    out.state = 'not_found';
+    marker = 'redirect';
+}
+out.marker = marker;
+return out;
+"""
+
+
+class PageReadiness:
+    """Chờ trang sẵn sàng theo điều kiện cụ thể thay vì sleep cố định
+
+    Các điều kiện: "title" (tiêu đề có chữ), "price" (ô giá có giá trị), "images" (gallery đã có
+    thuộc tính data ảnh), "dom" (DOM ngừng thay đổi). Mỗi điều kiện có hạn chờ riêng tính từ lúc
+    bắt đầu chờ; wait() trả về ngay khi mọi điều kiện đã đạt hoặc hết hạn.
+    """
+
+    def __init__(self, driver, selectors=None, deadlines=None, quiet_ms=None, poll_interval=None, logger=None):
+        self.driver = driver
+        selectors = selectors or CONFIG.SELECTORS
+        self.script_selectors = {
+            "title": selectors['title_selectors'],
+            "price": selectors['price_selectors'],
+            "images": selectors['main_image_selectors'],
+            "image_attributes": GALLERY_ATTRIBUTES,
+            "dynamic_image": selectors['dynamic_image_selector'],
+        }
+        self.deadlines = dict(CONFIG.READY_DEADLINES, **(deadlines or {}))
+        self.quiet_ms = quiet_ms if quiet_ms is not None else CONFIG.READY_QUIET_MS
+        self.poll_interval = poll_interval or CONFIG.READY_POLL_INTERVAL
+        self.logger = logger or logging.getLogger(__name__)
+        self.page_state = None
+        self.page_info = {}
+
+    def check(self):
+        """Trạng thái hiện tại của mọi điều kiện (dict tên -> bool)"""
+        try:
+            return self.driver.execute_script(READINESS_SCRIPT, self.script_selectors, self.quiet_ms) or {}
+        except WebDriverException as e:
+            # Trang đang chuyển hướng / chưa có document: coi như chưa sẵn sàng
+            self.logger.debug(f"Chưa kiểm tra được trạng thái trang: {e}")
+            return {}
+
+    def wait(self, conditions=("title", "price", "images")):
+        """Chờ các điều kiện, trả về dict tên -> số giây đã chờ (None nếu hết hạn mà chưa đạt)
+
+        Trang đã được classify() là "variant_unavailable" thì không chờ giá (giá để trống)."""
+        start = time.monotonic()
+        pending = list(conditions)
+        if self.page_state == "variant_unavailable" and "price" in pending:
+            pending.remove("price")
+        waited = {}
+        while pending:
+            state = self.check()
+            elapsed = time.monotonic() - start
+            for name in list(pending):
+                if state.get(name):
+                    waited[name] = elapsed
+                    pending.remove(name)
+                elif elapsed >= self.deadlines.get(name, CONFIG.TIMEOUT):
+                    waited[name] = None
+                    pending.remove(name)
+            if pending:
+                time.sleep(self.poll_interval)
+
+        missed = [name for name, seconds in waited.items() if seconds is None]
+        if missed:
+            self.logger.info(f"Hết hạn chờ {missed} sau {time.monotonic() - start:.1f}s")
+        return waited
+
+    def classify(self, timeout=None):
+        """Loại trang vừa mở: "product", "not_found", "interstitial" (CAPTCHA, đăng nhập, lỗi),
+        "variant_unavailable" (biến thể không bán, không có giá) hoặc "unknown" nếu sau timeout giây
+        vẫn chưa đủ dấu hiệu; chi tiết (URL, mã HTTP, dấu hiệu đã khớp) nằm trong page_info"""
+        timeout = CONFIG.PAGE_STATE_TIMEOUT if timeout is None else timeout
+        start = time.monotonic()
+        while True:
+            try:
+                info = self.driver.execute_script(PAGE_STATE_SCRIPT, CONFIG.PAGE_STATE_MARKERS) or {}
+            except WebDriverException as e:
+                self.logger.debug(f"Chưa phân loại được trang: {e}")
+                info = {}
+            state = info.get("state")
+            if state and state != "loading":
+                break
+            if time.monotonic() - start >= timeout:
+                state = "unknown"
+                break
+            time.sleep(self.poll_interval)
+
+        self.page_state = state
+        self.page_info = info
+        if state in FAILED_PAGE_STATES:
+            self.logger.info(f"Trang {info.get('url')} là {state} (dấu hiệu: {info.get('marker')}, "
+                             f"HTTP {info.get('status') or '?'}) sau {time.monotonic() - start:.2f}s")
+        elif state == "variant_unavailable":
+            self.logger.info(f"Trang {info.get('url')} là biến thể không bán (dấu hiệu: {info.get('marker')}), "
+                             f"vẫn lấy thông tin, giá để trống")
+        return state
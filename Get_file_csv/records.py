@@ -0,0 +1,57 @@
+from csv_writer import format_value
+
+
+class TemplateSchema:
+    """Template Shopify đã biên dịch sẵn: thứ tự cột, giá trị mặc định (đã định dạng) và vị trí
+    cột của các trường lấy từ Amazon, để mỗi dòng mới chỉ là một lần copy list"""
+
+    __slots__ = ('columns', 'defaults', 'index', 'amazon_fields')
+
+    def __init__(self, columns, template_row, fields_from_amz):
+        self.columns = tuple(columns)
+        self.defaults = tuple(format_value(template_row.get(column)) for column in self.columns)
+        self.index = {column: i for i, column in enumerate(self.columns)}
+        # Trường không có trong template bị bỏ qua (giống DataFrame(columns=all_columns) trước đây)
+        self.amazon_fields = tuple((field, self.index[field]) for field in fields_from_amz if field in self.index)
+
+    def new_variant(self):
+        return VariantRecord(self, list(self.defaults))
+
+    def apply_amazon(self, record, amz_info):
+        """Chép các trường lấy từ Amazon vào record, trường không có trong amz_info giữ mặc định"""
+        values = record.values
+        for field, i in self.amazon_fields:
+            if field in amz_info:
+                values[i] = format_value(amz_info[field])
+
+
+class VariantRecord:
+    """Một dòng biến thể (hoặc dòng ảnh): list giá trị đã định dạng theo thứ tự cột của schema"""
+
+    __slots__ = ('schema', 'values')
+
+    def __init__(self, schema, values):
+        self.schema = schema
+        self.values = values
+
+    def __contains__(self, column):
+        return column in self.schema.index
+
+    def __getitem__(self, column):
+        return self.values[self.schema.index[column]]
+
+    def __setitem__(self, column, value):
+        i = self.schema.index.get(column)
+        if i is not None:
+            self.values[i] = format_value(value)
+
+    def get(self, column, default=None):
+        i = self.schema.index.get(column)
+        return self.values[i] if i is not None else default
+
+    def copy(self):
+        return VariantRecord(self.schema, list(self.values))
+
+    def as_row(self):
+        """Giá trị đã định dạng theo đúng thứ tự cột, dùng trực tiếp cho csv.writer"""
+        return self.values
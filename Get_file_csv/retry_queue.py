@@ -0,0 +1,117 @@
+import time
+import heapq
+import random
+import logging
+import threading
+
+from config import CONFIG
+from metrics import get_metrics
+
+
+class RetryQueue:
+    """ASIN lỗi chờ chạy lại sau một khoảng backoff lũy thừa, không chặn các ASIN mới
+
+    Lần thử thứ n lỗi thì được hẹn lại sau RETRY_BASE_DELAY * 2^(n-1) giây (tối đa RETRY_MAX_DELAY,
+    lệch ngẫu nhiên ±20% để các worker không cùng quay lại một lúc). Quá RETRY_MAX_ATTEMPTS lần thử
+    hoặc lỗi thuộc RETRY_PERMANENT_REASONS (trang không tồn tại, ...) thì ASIN lỗi vĩnh viễn.
+    """
+
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None, permanent_reasons=None, logger=None):
+        self.max_attempts = max_attempts if max_attempts is not None else CONFIG.RETRY_MAX_ATTEMPTS
+        self.base_delay = base_delay if base_delay is not None else CONFIG.RETRY_BASE_DELAY
+        self.max_delay = max_delay if max_delay is not None else CONFIG.RETRY_MAX_DELAY
+        self.permanent_reasons = set(permanent_reasons if permanent_reasons is not None
+                                     else CONFIG.RETRY_PERMANENT_REASONS)
+        self.logger = logger or logging.getLogger(__name__)
+        self._heap = []
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self.scheduled = 0
+        self.gave_up = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
+
+    def backoff(self, attempts):
+        delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+        return delay * random.uniform(0.8, 1.2)
+
+    def schedule(self, item, attempts, reason, asin=None):
+        """Hẹn chạy lại item sau attempts lần thử lỗi; trả về False nếu không thử lại nữa"""
+        if reason in self.permanent_reasons or attempts >= self.max_attempts:
+            with self._lock:
+                self.gave_up += 1
+            self.logger.warning(f"ASIN {asin} lỗi vĩnh viễn ({reason}) sau {attempts} lần thử")
+            return False
+        delay = self.backoff(attempts)
+        with self._lock:
+            heapq.heappush(self._heap, (time.monotonic() + delay, self._sequence, attempts, item))
+            self._sequence += 1
+            self.scheduled += 1
+        get_metrics().inc("retries_total", reason=reason)
+        self.logger.info(f"ASIN {asin} lỗi ({reason}), thử lại lần {attempts + 1} sau {delay:.1f}s")
+        return True
+
+    def pop_due(self):
+        """Các (item, số lần đã thử) đã tới hạn chạy lại"""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, attempts, item = heapq.heappop(self._heap)
+                due.append((item, attempts))
+        return due
+
+    def wait_time(self):
+        """Số giây tới lần chạy lại gần nhất, None nếu hàng đợi trống"""
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def summary(self):
+        return f"Retry: {self.scheduled} lần hẹn chạy lại, {self.gave_up} ASIN lỗi vĩnh viễn"
+
+
+def iter_with_retries(items, attempt, get_asin=None, retries=None, logger=None):
+    """Chạy attempt(item) lần lượt trên một trình duyệt, trả về (item, kết quả) theo đúng thứ tự items
+
+    attempt(item) -> (kết quả, lý do lỗi hoặc None). Item lỗi được hẹn chạy lại qua RetryQueue và
+    chạy xen giữa các item mới khi tới hạn; chỉ khi hết item mới mới phải chờ. Item lỗi vĩnh viễn
+    trả về kết quả của lần thử cuối.
+    """
+    get_asin = get_asin or (lambda item: item)
+    retries = retries if retries is not None else RetryQueue(logger=logger)
+    done = {}
+    pending = {}
+    next_index = 0
+
+    def run(index, item, attempts):
+        result, reason = attempt(item)
+        if reason and retries.schedule((index, item), attempts, reason, get_asin(item)):
+            return
+        done[index] = result
+
+    def run_due():
+        for (index, item), attempts in retries.pop_due():
+            run(index, item, attempts + 1)
+
+    def drain():
+        nonlocal next_index
+        while next_index in done:
+            yield pending.pop(next_index), done.pop(next_index)
+            next_index += 1
+
+    for index, item in enumerate(items):
+        pending[index] = item
+        run_due()
+        run(index, item, 1)
+        yield from drain()
+
+    while len(retries):
+        time.sleep(retries.wait_time() or 0)
+        run_due()
+        yield from drain()
+    if retries.scheduled:
+        retries.logger.info(retries.summary())
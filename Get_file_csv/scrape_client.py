@@ -0,0 +1,117 @@
+"""Client của scraper_daemon.py: gửi job (input, template) qua socket và in tiến độ
+
+Chỉ import thư viện chuẩn và config nên khởi động rất nhanh; mọi việc nặng (pandas, selenium,
+trình duyệt) nằm trong daemon.
+
+Ví dụ:
+    python scraper_daemon.py --browsers 3                  # chạy một lần, để nền
+    python scrape_client.py input.csv template.csv         # mỗi job chỉ mất thời gian scrape
+    python scrape_client.py --status
+    python scrape_client.py --shutdown
+"""
+import os
+import sys
+import json
+import socket
+import argparse
+
+from config import CONFIG
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def daemon_address():
+    """(họ socket, địa chỉ) của daemon: Unix socket CONFIG.DAEMON_SOCKET (tương đối thì nằm cạnh script),
+    hệ điều hành không có AF_UNIX thì 127.0.0.1:CONFIG.DAEMON_PORT"""
+    if hasattr(socket, "AF_UNIX"):
+        return socket.AF_UNIX, os.path.join(SCRIPT_DIR, CONFIG.DAEMON_SOCKET)
+    return socket.AF_INET, ("127.0.0.1", CONFIG.DAEMON_PORT)
+
+
+def connect():
+    family, address = daemon_address()
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def send_message(sock, message):
+    """Mỗi thông điệp là một dòng JSON"""
+    sock.sendall((json.dumps(message, ensure_ascii=False) + "\n").encode('utf-8'))
+
+
+def iter_messages(sock):
+    with sock.makefile('r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def request(message, quiet=False):
+    """Gửi một yêu cầu và in các thông điệp trả về, trả về mã thoát (0 là thành công)"""
+    try:
+        sock = connect()
+    except OSError as e:
+        print(f"Không kết nối được daemon ({e}). Chạy: python scraper_daemon.py", file=sys.stderr)
+        return 2
+
+    code = 1
+    with sock:
+        send_message(sock, message)
+        for event in iter_messages(sock):
+            kind = event.get("event")
+            if kind == "log":
+                if not quiet or event["level"] in ("WARNING", "ERROR"):
+                    print(event["message"], file=sys.stderr)
+            elif kind == "queued":
+                print(f"Daemon đang chạy job khác, chờ tới lượt ({event['waiting']} job phía trước)", file=sys.stderr)
+            elif kind == "progress":
+                if not quiet:
+                    mark = "✓" if event["ok"] else "✗"
+                    print(f"[{event['rows']}] {mark} dòng {event['line']}: {event['asin']}")
+            elif kind == "done":
+                print(f"Xong {event['rows']} dòng trong {event['seconds']:.1f}s: {event['output']}")
+                if event.get("failed"):
+                    print(f"ASIN lỗi: {event['failed']}")
+                code = 0 if event["output"] else 1
+            elif kind == "status":
+                print(json.dumps(event, ensure_ascii=False, indent=2))
+                code = 0
+            elif kind == "stopping":
+                print("Daemon đang dừng")
+                code = 0
+            elif kind == "error":
+                print(f"Lỗi: {event['message']}", file=sys.stderr)
+                code = 1
+    return code
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Gửi job cho scraper_daemon.py')
+    parser.add_argument('input', nargs='?', help='File CSV/JSONL chứa ASINs (cột Variant SKU)')
+    parser.add_argument('template', nargs='?', help='File CSV mẫu Shopify')
+    parser.add_argument('--quiet', action='store_true', help='Chỉ in cảnh báo, lỗi và kết quả cuối')
+    parser.add_argument('--status', action='store_true', help='Xem trạng thái daemon')
+    parser.add_argument('--shutdown', action='store_true', help='Dừng daemon (sau job đang chạy)')
+    args = parser.parse_args(argv)
+
+    if args.status:
+        return request({"command": "status"})
+    if args.shutdown:
+        return request({"command": "shutdown"})
+    if not args.input or not args.template:
+        parser.error("cần input và template")
+    # Daemon có thư mục làm việc riêng, gửi đường dẫn tuyệt đối
+    return request({
+        "command": "scrape",
+        "input": os.path.abspath(args.input),
+        "template": os.path.abspath(args.template),
+    }, quiet=args.quiet)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+"""Daemon giữ sẵn các module đã import và trình duyệt đã mở giữa các job
+
+Mỗi lần chạy script phải import pandas/selenium và mở chromedriver + Chrome trước ASIN đầu tiên; với
+nhiều job nhỏ, phần khởi động này chiếm phần lớn thời gian. Daemon làm việc đó một lần, sau đó nhận
+job (input, template) từ scrape_client.py qua Unix socket (CONFIG.DAEMON_SOCKET) và gửi tiến độ về.
+
+Ví dụ:
+    python scraper_daemon.py --browsers 3
+    python scraper_daemon.py --script "get file csv2.py"
+
+Script phải có ở cấp module: ScrapeWorker(logger), load_input, open_output, add_result, close_output
+(như get file csv5.py, get file csv2.py). Các job chạy lần lượt, dùng chung các trình duyệt.
+"""
+import os
+import time
+import socket
+import inspect
+import logging
+import argparse
+import functools
+import threading
+import socketserver
+
+from config import CONFIG
+from script_loader import load_script
+from driver_lifecycle import install_signal_handlers
+from http_fetcher import prefetch_infos
+from worker_pool import iter_file_results
+from metrics import get_metrics, MetricsExporter
+from page_cache import get_page_cache
+from csv_writer import failed_path_for
+from scrape_client import daemon_address, send_message, iter_messages
+
+
+class WarmWorkers:
+    """Các worker (trình duyệt) đã mở, được WorkerPool mượn cho từng job rồi trả lại thay vì đóng
+
+    Worker có restart_reason() (driver chết, quá số trang / RSS) thì bị đóng thật khi trả lại,
+    lần mượn sau tạo worker mới.
+    """
+
+    def __init__(self, create_worker, logger=None):
+        self.create_worker = create_worker
+        self.logger = logger or logging.getLogger(__name__)
+        self._idle = []
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def _create(self):
+        worker = self.create_worker()
+        with self._lock:
+            self.created += 1
+        return worker
+
+    def warm(self, count):
+        """Mở trước count trình duyệt"""
+        for _ in range(count - len(self._idle)):
+            try:
+                worker = self._create()
+            except Exception as e:
+                self.logger.error(f"Không mở được trình duyệt: {e}")
+                return
+            with self._lock:
+                self._idle.append(worker)
+        self.logger.info(f"Đã mở sẵn {len(self._idle)} trình duyệt")
+
+    def acquire(self):
+        """Dùng làm create_worker của WorkerPool"""
+        with self._lock:
+            worker = self._idle.pop() if self._idle else None
+        return _BorrowedWorker(self, worker if worker is not None else self._create())
+
+    def release(self, worker):
+        check = getattr(worker, 'restart_reason', None)
+        reason = check() if check is not None else None
+        if reason:
+            self.logger.info(f"Đóng trình duyệt ({reason})")
+            self._close(worker)
+            return
+        with self._lock:
+            self._idle.append(worker)
+
+    def _close(self, worker):
+        try:
+            worker.close()
+        except Exception as e:
+            self.logger.warning(f"Lỗi khi đóng trình duyệt: {e}")
+
+    def idle(self):
+        with self._lock:
+            return len(self._idle)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._close(worker)
+
+
+class _BorrowedWorker:
+    """Worker mượn từ WarmWorkers: close() trả trình duyệt lại thay vì đóng"""
+
+    def __init__(self, pool, worker):
+        self.pool = pool
+        self.worker = worker
+
+    def scrape(self, asin):
+        return self.worker.scrape(asin)
+
+    def restart_reason(self, failed=False):
+        check = getattr(self.worker, 'restart_reason', None)
+        return check(failed) if check is not None else None
+
+    def close(self):
+        self.pool.release(self.worker)
+
+
+class _ClientLogHandler(logging.Handler):
+    """Chuyển log của job về client"""
+
+    def __init__(self, send, level=logging.INFO):
+        super().__init__(level)
+        self.send = send
+        self.setFormatter(logging.Formatter('%(message)s'))
+
+    def emit(self, record):
+        self.send({"event": "log", "level": record.levelname, "message": self.format(record)})
+
+
+class ScraperDaemon:
+    def __init__(self, script=None, browsers=None, logger=None):
+        self.script = script or CONFIG.DAEMON_SCRIPT
+        self.browsers = browsers or CONFIG.WORKERS
+        self.logger = logger or logging.getLogger("scraper_daemon")
+        self.module = load_script(self.script, "scraper_daemon_script")
+        self.workers = WarmWorkers(lambda: self.module.ScrapeWorker(self.logger), self.logger)
+        self.started = time.time()
+        self.jobs_done = 0
+        self.waiting = 0
+        self.current = None
+        self._job_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self.server = None
+
+    def _prefetch(self, logger):
+        build = getattr(self.module, "build_amazon_info", None)
+        if build is None:
+            return None
+        # build_amazon_info(asin, fields) hoặc build_amazon_info(asin, fields, logger) tùy script
+        if "logger" in inspect.signature(build).parameters:
+            build = functools.partial(build, logger=logger)
+        return lambda asins: prefetch_infos(asins, build, logger)
+
+    def run_job(self, input_csv_path, sample_template_path, send):
+        """Chạy một job như process_file của script nhưng với trình duyệt đã mở sẵn"""
+        with self._state_lock:
+            waiting = self.waiting
+            self.waiting += 1
+        if waiting or self._job_lock.locked():
+            send({"event": "queued", "waiting": waiting + 1})
+        with self._job_lock:
+            with self._state_lock:
+                self.waiting -= 1
+                self.jobs_done += 1
+                number = self.jobs_done
+                self.current = input_csv_path
+
+            logger = logging.getLogger(f"scraper_daemon.job{number}")
+            handler = _ClientLogHandler(send)
+            logger.addHandler(handler)
+            start = time.perf_counter()
+            try:
+                self.logger.info(f"Job {number}: {input_csv_path}")
+                job = self.module.load_input(input_csv_path, sample_template_path, logger)
+                if job is None:
+                    send({"event": "error", "message": "File input không hợp lệ"})
+                    return
+                self.module.open_output(job)
+                rows = 0
+                try:
+                    for _, item, info in iter_file_results(
+                        [job["rows"]],
+                        self.workers.acquire,
+                        self.browsers,
+                        logger,
+                        prefetch=self._prefetch(logger),
+                        get_asin=lambda item: item[2]
+                    ):
+                        with get_metrics().phase("csv"):
+                            self.module.add_result(job, item, info)
+                        rows += 1
+                        send({"event": "progress", "rows": rows, "line": item[0], "asin": item[2],
+                              "ok": bool(info and info.get("Title"))})
+                except BaseException:
+                    job["writer"].abort()
+                    raise
+                output = self.module.close_output(job)
+                failed = failed_path_for(job["writer"].output_csv_path)
+                send({"event": "done", "rows": rows, "seconds": time.perf_counter() - start, "output": output,
+                      "failed": failed if os.path.exists(failed) else None})
+                self.logger.info(get_page_cache().summary())
+                self.logger.info(get_metrics().summary())
+            except Exception as e:
+                self.logger.error(f"Job {number} lỗi: {e}", exc_info=True)
+                send({"event": "error", "message": str(e)})
+            finally:
+                logger.removeHandler(handler)
+                with self._state_lock:
+                    self.current = None
+
+    def status(self):
+        with self._state_lock:
+            return {
+                "event": "status",
+                "pid": os.getpid(),
+                "script": self.script,
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "jobs": self.jobs_done,
+                "current": self.current,
+                "waiting": self.waiting,
+                "browsers_idle": self.workers.idle(),
+                "browsers_created": self.workers.created,
+            }
+
+    def handle(self, sock):
+        client = {"connected": True}
+
+        def send(message):
+            # Client đóng kết nối giữa chừng thì job vẫn chạy tới hết và ghi file output
+            if not client["connected"]:
+                return
+            try:
+                send_message(sock, message)
+            except OSError:
+                client["connected"] = False
+
+        for message in iter_messages(sock):
+            command = message.get("command")
+            if command == "scrape":
+                self.run_job(message["input"], message["template"], send)
+            elif command == "status":
+                send(self.status())
+            elif command == "shutdown":
+                send({"event": "stopping"})
+                # Chờ job đang chạy xong; shutdown() phải gọi từ luồng khác serve_forever
+                with self._job_lock:
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+            else:
+                send({"event": "error", "message": f"Lệnh không hợp lệ: {command}"})
+            return
+
+    def serve(self):
+        family, address = daemon_address()
+        daemon = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                daemon.handle(self.request)
+
+        if family == socket.AF_UNIX:
+            if os.path.exists(address):
+                try:
+                    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                        probe.connect(address)
+                    raise RuntimeError(f"Đã có daemon khác đang chạy tại {address}")
+                except ConnectionRefusedError:
+                    # Socket còn sót lại từ lần chạy trước bị dừng đột ngột
+                    os.remove(address)
+            server_class = socketserver.ThreadingUnixStreamServer
+        else:
+            server_class = socketserver.ThreadingTCPServer
+        server_class.daemon_threads = True
+
+        self.workers.warm(self.browsers)
+        self.server = server_class(address, Handler)
+        self.logger.info(f"Daemon sẵn sàng tại {address} ({self.script}, {self.browsers} trình duyệt)")
+        try:
+            # Metrics của mọi job ghi chung (CONFIG.METRICS_FILE, CONFIG.METRICS_TEXTFILE)
+            with MetricsExporter(logger=self.logger):
+                self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            if family == socket.AF_UNIX and os.path.exists(address):
+                os.remove(address)
+            self.workers.close()
+            self.logger.info(f"Daemon dừng sau {self.jobs_done} job")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Daemon scrape Amazon giữ sẵn trình duyệt, nhận job từ scrape_client.py')
+    parser.add_argument('--script', default=CONFIG.DAEMON_SCRIPT, help='Script dùng để scrape và ghi output')
+    parser.add_argument('--browsers', type=int, default=CONFIG.WORKERS, help='Số trình duyệt mở sẵn')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    install_signal_handlers()
+    ScraperDaemon(args.script, args.browsers).serve()
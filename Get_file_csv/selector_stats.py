@@ -0,0 +1,174 @@
+import os
+import json
+import logging
+import threading
+
+from config import CONFIG
+
+
+# Các trường mà HtmlExtractor / JsExtractor báo selector đã khớp, ứng với danh sách <trường>_selectors
+EXTRACTED_FIELDS = ("title", "detailed_description", "price", "brand")
+
+
+class SelectorStats:
+    """Thống kê số lần khớp / trượt của từng selector dự phòng, lưu qua các lần chạy
+
+    Các danh sách trong CONFIG.SELECTORS (price_selectors, brand_selectors, ...) được thử theo tỉ lệ
+    khớp giảm dần thay vì thứ tự cố định; selector trượt liên tiếp CONFIG.SELECTOR_DEAD_AFTER lần
+    (không lần nào khớp xen giữa) bị coi là đã chết và bị bỏ khỏi danh sách. Cứ CONFIG.SELECTOR_REPROBE_EVERY
+    lần lấy danh sách, selector đã chết được thử lại ở cuối (vd. bố cục A/B quay lại); khớp thì sống lại.
+
+    Mỗi mục: {"hits": số lần khớp, "misses": số lần trượt, "streak": số lần trượt liên tiếp gần nhất}.
+    Khi lưu, phần thay đổi của tiến trình này được cộng vào nội dung file hiện tại nên nhiều tiến
+    trình (shard) dùng chung được một file.
+    """
+
+    def __init__(self, path=None, dead_after=None, save_every=None, reprobe_every=None, logger=None):
+        self.path = path if path is not None else CONFIG.SELECTOR_STATS_FILE
+        self.dead_after = dead_after if dead_after is not None else CONFIG.SELECTOR_DEAD_AFTER
+        self.save_every = save_every if save_every is not None else CONFIG.SELECTOR_STATS_SAVE_EVERY
+        self.reprobe_every = reprobe_every if reprobe_every is not None else CONFIG.SELECTOR_REPROBE_EVERY
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._orders = {}
+        self._unsaved = 0
+        self.stats = self._read()
+
+    def _read(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Không đọc được thống kê selector {self.path}: {e}")
+            return {}
+
+    @staticmethod
+    def _apply(entry, hit):
+        name = "hits" if hit else "misses"
+        entry[name] = entry.get(name, 0) + 1
+        entry["streak"] = 0 if hit else entry.get("streak", 0) + 1
+
+    def record(self, key, selector, hit):
+        """Ghi một lần thử selector của danh sách key (vd. "price_selectors")"""
+        with self._lock:
+            self._apply(self.stats.setdefault(key, {}).setdefault(selector, {}), hit)
+            if not self.path:
+                return
+            # Phần thay đổi chưa lưu; "reset" cho biết streak trong file phải được thay chứ không cộng thêm
+            delta = self._pending.setdefault(key, {}).setdefault(selector, {})
+            if hit:
+                delta["reset"] = True
+            self._apply(delta, hit)
+            self._unsaved += 1
+            autosave = self.save_every and self._unsaved >= self.save_every
+        if autosave:
+            self.save()
+
+    def record_winner(self, key, selectors, winner):
+        """Các selector đứng trước winner trong danh sách đã được thử và trượt, winner khớp
+        (winner None là cả danh sách đều trượt)"""
+        for selector in selectors:
+            self.record(key, selector, selector == winner)
+            if selector == winner:
+                break
+
+    def record_extraction(self, matched, selectors=None):
+        """Ghi kết quả một lần trích xuất đã thử selector theo thứ tự trong selectors (HtmlExtractor, JsExtractor)"""
+        selectors = selectors or CONFIG.SELECTORS
+        for field in EXTRACTED_FIELDS:
+            key = f"{field}_selectors"
+            self.record_winner(key, selectors[key], matched.get(field))
+
+    def is_dead(self, key, selector):
+        entry = self.stats.get(key, {}).get(selector)
+        return bool(self.dead_after and entry and entry.get("streak", 0) >= self.dead_after)
+
+    @staticmethod
+    def hit_rate(entry):
+        # Làm trơn Laplace: selector chưa thử lần nào đứng ở mức 50%
+        return (entry.get("hits", 0) + 1) / (entry.get("hits", 0) + entry.get("misses", 0) + 2)
+
+    def ordered(self, key, selectors=None):
+        """Danh sách selector của key theo tỉ lệ khớp giảm dần, bỏ selector đã chết
+        (bằng nhau thì giữ thứ tự trong CONFIG; nếu mọi selector đều chết thì giữ lại selector tốt nhất).
+        Mỗi reprobe_every lần gọi, selector đã chết được nối vào cuối để thử lại."""
+        selectors = list(selectors if selectors is not None else CONFIG.SELECTORS[key])
+        with self._lock:
+            stats = self.stats.get(key, {})
+            ranked = sorted(selectors, key=lambda selector: -self.hit_rate(stats.get(selector, {})))
+            live = [selector for selector in ranked if not self.is_dead(key, selector)]
+            calls = self._orders[key] = self._orders.get(key, 0) + 1
+        if len(live) < len(ranked) and self.reprobe_every and calls % self.reprobe_every == 0:
+            return live + [selector for selector in ranked if selector not in live]
+        return live or ranked[:1]
+
+    def ordered_selectors(self, selectors=None):
+        """Bản sao của selectors (mặc định CONFIG.SELECTORS) với danh sách của mọi trường trong
+        EXTRACTED_FIELDS theo ordered(), dùng cho một lần trích xuất"""
+        selectors = selectors or CONFIG.SELECTORS
+        ordered = dict(selectors)
+        for field in EXTRACTED_FIELDS:
+            key = f"{field}_selectors"
+            ordered[key] = self.ordered(key, selectors[key])
+        return ordered
+
+    def save(self):
+        """Cộng phần thay đổi vào file (ghi file tạm rồi đổi tên)"""
+        if not self.path:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._unsaved = 0
+            if not pending:
+                return
+            data = self._read()
+            for key, deltas in pending.items():
+                for selector, delta in deltas.items():
+                    entry = data.setdefault(key, {}).setdefault(selector, {})
+                    streak = delta["streak"] if delta.get("reset") else entry.get("streak", 0) + delta.get("streak", 0)
+                    entry["hits"] = entry.get("hits", 0) + delta.get("hits", 0)
+                    entry["misses"] = entry.get("misses", 0) + delta.get("misses", 0)
+                    entry["streak"] = streak
+            self.stats = data
+            try:
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                self.logger.warning(f"Không lưu được thống kê selector {self.path}: {e}")
+
+    def summary(self):
+        self.save()
+        parts = []
+        for key, stats in self.stats.items():
+            known = [selector for selector in CONFIG.SELECTORS.get(key, []) if selector in stats]
+            if not known:
+                continue
+            ranked = sorted(known, key=lambda selector: -self.hit_rate(stats[selector]))
+            rates = []
+            for selector in ranked:
+                entry = stats[selector]
+                tried = entry.get("hits", 0) + entry.get("misses", 0)
+                rate = f"{selector} {entry.get('hits', 0)}/{tried}"
+                if self.is_dead(key, selector):
+                    rate += " (đã bỏ)"
+                rates.append(rate)
+            parts.append(f"{key}: " + ", ".join(rates))
+        return "Selector (khớp/thử): " + ("; ".join(parts) if parts else "chưa có dữ liệu")
+
+
+_selector_stats = None
+_selector_stats_lock = threading.Lock()
+
+
+def get_selector_stats():
+    """SelectorStats dùng chung cho cả lần chạy"""
+    global _selector_stats
+    with _selector_stats_lock:
+        if _selector_stats is None:
+            _selector_stats = SelectorStats()
+        return _selector_stats
@@ -0,0 +1,42 @@
+import time
+import threading
+from contextlib import contextmanager
+
+from metrics import get_metrics
+
+
+class PhaseTimer:
+    """Cộng dồn thời gian theo từng giai đoạn xử lý một ASIN (navigate, wait, extract, ...)
+
+    Mỗi lần đo cũng được đưa vào histogram chung của get_metrics() để xuất ra JSON/Prometheus.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+        get_metrics().observe(name, seconds)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def average(self, name):
+        count = self.counts.get(name, 0)
+        return self.totals[name] / count if count else 0.0
+
+    def summary(self):
+        if not self.totals:
+            return "Thời gian theo giai đoạn: chưa có dữ liệu"
+        parts = [f"{name} {total:.1f}s ({self.counts[name]} lần, tb {self.average(name):.2f}s)"
+                 for name, total in self.totals.items()]
+        return "Thời gian theo giai đoạn: " + ", ".join(parts)
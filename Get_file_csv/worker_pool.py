@@ -0,0 +1,407 @@
+import queue
+import logging
+import threading
+
+from config import CONFIG
+from metrics import get_metrics
+from retry_queue import RetryQueue
+from selector_stats import get_selector_stats
+from product_store import get_product_store
+from http_fetcher import close_http_fetcher
+
+
+class WorkerPool:
+    """Nhóm N trình duyệt sống suốt lần chạy, cùng lấy ASIN từ một hàng đợi chung
+
+    create_worker() được gọi trong từng luồng và phải trả về đối tượng có:
+        scrape(asin) -> dict thông tin sản phẩm (hoặc {} nếu lỗi)
+        close()      -> đóng driver
+    và tùy chọn:
+        restart_reason(failed=False) -> lý do cần tạo lại worker (driver chết, quá số trang, quá RSS)
+                                        hoặc None; failed=True khi ASIN vừa rồi không có kết quả
+
+    ASIN lỗi được đưa vào RetryQueue và chạy lại khi tới hạn, các worker không đứng chờ mà tiếp tục
+    với ASIN mới; kết quả (và on_result) chỉ có khi ASIN thành công hoặc lỗi vĩnh viễn.
+    """
+
+    def __init__(self, create_worker, size=None, logger=None, on_result=None, retries=None):
+        self.create_worker = create_worker
+        self.size = size or CONFIG.WORKERS
+        self.logger = logger or logging.getLogger(__name__)
+        self.on_result = on_result
+        self.retries = retries if retries is not None else RetryQueue(logger=self.logger)
+        self._finished = 0
+        self._finished_lock = threading.Lock()
+
+    def _finish(self, results, item):
+        with self._finished_lock:
+            self._finished += 1
+        results.put(item)
+
+    def _close_worker(self, index, worker):
+        try:
+            worker.close()
+        except Exception as e:
+            self.logger.warning(f"Worker {index}: lỗi khi đóng driver: {e}")
+
+    def _scrape(self, index, worker, asin):
+        try:
+            return worker.scrape(asin)
+        except Exception as e:
+            self.logger.error(f"Worker {index}: lỗi khi xử lý ASIN {asin}: {e}", exc_info=True)
+            get_metrics().note_failure(type(e).__name__)
+            return {}
+
+    def _create(self, index):
+        try:
+            return self.create_worker()
+        except Exception as e:
+            self.logger.error(f"Worker {index}: không tạo được driver: {e}", exc_info=True)
+            return None
+
+    def _run_worker(self, index, tasks, results):
+        worker = self._create(index)
+        if worker is None:
+            return
+
+        self.logger.info(f"Worker {index} đã sẵn sàng")
+        try:
+            while worker is not None:
+                task = tasks.get()
+                if task is None:
+                    break
+                key, asin, *tried = task
+                tried = tried[0] if tried else 0
+                attempts = 0
+                while True:
+                    result = self._scrape(index, worker, asin)
+                    check = getattr(worker, 'restart_reason', None)
+                    reason = check(failed=not result) if check is not None else None
+                    if not reason:
+                        break
+                    # Tạo lại driver; ASIN đang dở được chạy lại nếu lần này không có kết quả
+                    self.logger.info(f"Worker {index}: khởi động lại driver ({reason})")
+                    get_metrics().inc("driver_restarts_total")
+                    self._close_worker(index, worker)
+                    worker = self._create(index)
+                    if worker is None or result or attempts >= CONFIG.DRIVER_REQUEUE_LIMIT:
+                        break
+                    attempts += 1
+                    get_metrics().take_failure()
+                    self.logger.info(f"Worker {index}: chạy lại ASIN {asin} trên driver mới")
+                failure = get_metrics().record_page(result, asin=asin)
+                if failure and self.retries.schedule((key, asin), tried + 1, failure, asin):
+                    continue
+                if self.on_result is not None:
+                    self.on_result(asin, result)
+                self._finish(results, (key, result))
+        finally:
+            if worker is not None:
+                self._close_worker(index, worker)
+
+    def imap(self, jobs, stop=None):
+        """Xử lý (key, asin) từ một iterable đọc dần ở luồng riêng, trả về (key, kết quả) ngay khi
+        từng ASIN xong (không theo thứ tự)
+
+        Phần tử (key, asin, kết quả) đã có kết quả thì được trả thẳng, không cần trình duyệt.
+        Trình duyệt chỉ được mở khi có ASIN cần xử lý, tối đa self.size cái.
+        stop: Event tùy chọn, được đặt khi imap kết thúc; iterable có thể chờ lâu giữa hai phần tử
+              (vd. hàng đợi chung) dùng nó để dừng thay vì giữ luồng đọc mãi
+        """
+        tasks = queue.Queue(maxsize=self.size * 2)
+        results = queue.Queue()
+        threads = []
+        state = {"submitted": 0, "done": False, "error": None}
+        stop = stop or threading.Event()
+        self._finished = 0
+
+        def put_task(task):
+            while not stop.is_set():
+                try:
+                    tasks.put(task, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def requeue():
+            """Đưa các ASIN đã tới hạn chạy lại vào hàng đợi, kể cả khi luồng đọc đang chờ job mới"""
+            while not stop.is_set():
+                for (key, asin), tried in self.retries.pop_due():
+                    if not put_task((key, asin, tried)):
+                        return
+                stop.wait(min(0.5, self.retries.wait_time() or 0.5))
+
+        def feed():
+            try:
+                for job in jobs:
+                    if stop.is_set():
+                        return
+                    state["submitted"] += 1
+                    if len(job) == 3:
+                        key, _, result = job
+                        self._finish(results, (key, result))
+                        continue
+                    if len(threads) < self.size:
+                        thread = threading.Thread(target=self._run_worker,
+                                                  args=(len(threads) + 1, tasks, results), daemon=True)
+                        threads.append(thread)
+                        thread.start()
+                    if not put_task(job):
+                        return
+                # Hết ASIN mới: chờ các ASIN đang xử lý và các lần chạy lại còn hẹn
+                while self._finished < state["submitted"]:
+                    if stop.is_set() or not any(thread.is_alive() for thread in threads):
+                        return
+                    stop.wait(0.2)
+            except BaseException as e:
+                state["error"] = e
+            finally:
+                state["done"] = True
+                for _ in threads:
+                    put_task(None)
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        requeuer = threading.Thread(target=requeue, daemon=True)
+        requeuer.start()
+
+        received = 0
+        try:
+            while True:
+                try:
+                    item = results.get(timeout=1)
+                except queue.Empty:
+                    if not results.empty():
+                        continue
+                    if state["done"]:
+                        if state["error"] is not None:
+                            raise state["error"]
+                        if received >= state["submitted"]:
+                            break
+                    # Mọi worker đã dừng (vd. không tạo được driver) thì không chờ thêm
+                    workers_dead = not any(thread.is_alive() for thread in threads)
+                    if workers_dead and (state["done"] or len(threads) >= self.size):
+                        break
+                    continue
+                received += 1
+                yield item
+                if state["done"] and state["error"] is None and received >= state["submitted"]:
+                    break
+        finally:
+            stop.set()
+            feeder.join()
+            requeuer.join()
+            # Dừng sớm (lỗi phía người dùng kết quả): bỏ các ASIN còn trong hàng đợi để worker thoát
+            while True:
+                try:
+                    tasks.get_nowait()
+                except queue.Empty:
+                    break
+            for _ in threads:
+                tasks.put(None)
+            for thread in threads:
+                thread.join()
+
+        missing = state["submitted"] - received
+        if missing:
+            self.logger.error(f"{missing} ASIN không được xử lý do không còn worker nào hoạt động")
+        if self.retries.scheduled:
+            self.logger.info(self.retries.summary())
+
+    def run(self, jobs):
+        """Xử lý danh sách (key, asin), trả về dict key -> kết quả"""
+        return dict(self.imap(jobs))
+
+
+def iter_in_thread(iterable, stop, maxsize=0):
+    """Đọc iterable ở luồng riêng và trả các phần tử qua hàng đợi, để việc chậm bên trong iterable
+    (vd. tải HTTP) chạy song song với người đọc; dừng khi stop được đặt"""
+    items = queue.Queue(maxsize=maxsize)
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((done, e))
+            return
+        put((done, None))
+
+    threading.Thread(target=run, daemon=True).start()
+    while not stop.is_set():
+        try:
+            item, error = items.get(timeout=1)
+        except queue.Empty:
+            continue
+        if item is done:
+            if error is not None:
+                raise error
+            return
+        yield item
+
+
+def iter_file_results(file_jobs, create_worker, size=None, logger=None, prefetch=None, checkpoint=None,
+                      get_asin=None, chunk_size=None):
+    """Gom ASIN của mọi file vào một hàng đợi, trả về (file_index, dòng, kết quả) theo đúng
+    thứ tự dòng của từng file ngay khi các dòng phía trước đã xong
+
+    ASIN trùng giữa các dòng và các file chỉ được lấy một lần, kết quả được dùng cho mọi dòng.
+
+    file_jobs: danh sách các iterable (mỗi phần tử ứng với một file input), được đọc dần theo
+               từng khối chunk_size dòng nên ASIN đầu tiên được xử lý ngay, không chờ đọc hết file
+    get_asin: hàm lấy ASIN từ một dòng (mặc định dòng chính là ASIN)
+    prefetch: hàm tùy chọn nhận danh sách ASIN, trả về dict asin -> kết quả lấy được
+              mà không cần trình duyệt (vd. http_fetcher.prefetch_infos), gọi cho từng nhóm
+              HTTP_CONCURRENCY ASIN ở luồng riêng nên các trình duyệt nhận việc ngay, không chờ cả khối
+    checkpoint: CheckpointJournal tùy chọn; ASIN đã có trong nhật ký (khi --resume) được bỏ qua,
+                mọi kết quả mới được ghi vào nhật ký ngay khi xong
+
+    Kết quả thành công được lưu vào get_product_store(); khi chạy --incremental, ASIN còn mới trong kho
+    được lấy thẳng từ kho, không prefetch cũng không mở trình duyệt.
+    """
+    get_asin = get_asin or (lambda row: row)
+    chunk_size = chunk_size or CONFIG.INPUT_CHUNK_SIZE
+    logger = logger or logging.getLogger(__name__)
+
+    # Dòng đã đọc nhưng chưa xuất, kết quả đã có nhưng chưa tới lượt, theo từng file
+    rows = [{} for _ in file_jobs]
+    ready = [{} for _ in file_jobs]
+    next_row = [0] * len(file_jobs)
+    row_counts = [0] * len(file_jobs)
+
+    def read_chunks():
+        chunk = []
+        for file_index, file_rows in enumerate(file_jobs):
+            for row_index, row in enumerate(file_rows):
+                rows[file_index][row_index] = row
+                row_counts[file_index] = row_index + 1
+                chunk.append(((file_index, row_index), get_asin(row)))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    # Mỗi ASIN chỉ được scrape một lần dù xuất hiện ở nhiều dòng / nhiều file: các dòng trùng chờ
+    # chung kết quả (waiting), ASIN đã có kết quả được dùng lại ngay (finished)
+    lock = threading.Lock()
+    finished = {}
+    waiting = {}
+    stats = {"rows": 0, "unique": set(), "scraped": 0}
+    store = get_product_store()
+
+    def route(keys):
+        """Các job cho WorkerPool: (("row", dòng), asin, kết quả) khi đã có kết quả, (("asin", asin), asin)
+        cho lần đầu gặp một ASIN cần trình duyệt; dòng trùng với ASIN đang xử lý không tạo job mới"""
+        for key, asin in keys:
+            with lock:
+                if asin in finished:
+                    job = (("row", key), asin, finished[asin])
+                elif asin in waiting:
+                    waiting[asin].append(key)
+                    job = None
+                else:
+                    waiting[asin] = [key]
+                    stats["scraped"] += 1
+                    job = (("asin", asin), asin)
+            if job is not None:
+                yield job
+
+    def plan():
+        for chunk in read_chunks():
+            stats["rows"] += len(chunk)
+            stats["unique"].update(asin for _, asin in chunk)
+            with lock:
+                pending = [asin for asin in dict.fromkeys(asin for _, asin in chunk)
+                           if asin not in finished and asin not in waiting]
+            stored = store.fresh(pending) if pending else {}
+            if stored:
+                with lock:
+                    finished.update(stored)
+                pending = [asin for asin in pending if asin not in stored]
+            if prefetch is None or not pending:
+                yield from route(chunk)
+                continue
+
+            # Dòng đã có kết quả hoặc đang chờ ASIN của khối trước đi ngay; phần còn lại theo từng nhóm
+            # prefetch, ASIN nào không lấy được thì thành job cho trình duyệt ngay khi nhóm của nó xong
+            pending_set = set(pending)
+            yield from route([(key, asin) for key, asin in chunk if asin not in pending_set])
+            for start in range(0, len(pending), CONFIG.HTTP_CONCURRENCY):
+                batch = pending[start:start + CONFIG.HTTP_CONCURRENCY]
+                known = prefetch(batch)
+                if checkpoint is not None:
+                    for asin, info in known.items():
+                        checkpoint.record(asin, info)
+                store.put_many(known)
+                with lock:
+                    finished.update(known)
+                batch_set = set(batch)
+                yield from route([(key, asin) for key, asin in chunk if asin in batch_set])
+
+    def drain(file_index):
+        while next_row[file_index] in ready[file_index]:
+            row_index = next_row[file_index]
+            next_row[file_index] += 1
+            yield file_index, rows[file_index].pop(row_index), ready[file_index].pop(row_index)
+
+    try:
+        finished.update(checkpoint.load() if checkpoint is not None else {})
+
+        def on_result(asin, result):
+            if checkpoint is not None:
+                checkpoint.record(asin, result)
+            store.put(asin, result)
+
+        # Prefetch (HTTP) chạy ở luồng riêng, đi trước các trình duyệt tối đa một khối job
+        stop = threading.Event()
+        jobs = iter_in_thread(plan(), stop, maxsize=chunk_size) if prefetch is not None else plan()
+        for (kind, key), result in WorkerPool(create_worker, size, logger, on_result).imap(jobs, stop):
+            if kind == "row":
+                keys = [key]
+            else:
+                # Kết quả của một ASIN được chia cho mọi dòng đang chờ nó
+                with lock:
+                    keys = waiting.pop(key, [])
+                    finished[key] = result
+            for file_index, row_index in keys:
+                ready[file_index][row_index] = result
+            for file_index in dict.fromkeys(file_index for file_index, _ in keys):
+                yield from drain(file_index)
+
+        # Các dòng không được worker nào xử lý coi như lỗi
+        for file_index in range(len(file_jobs)):
+            for row_index in range(next_row[file_index], row_counts[file_index]):
+                yield file_index, rows[file_index].pop(row_index), ready[file_index].pop(row_index, {})
+
+        unique = len(stats["unique"])
+        if stats["rows"]:
+            logger.info(f"Dedup: {stats['rows']} dòng, {unique} ASIN khác nhau "
+                        f"({(stats['rows'] - unique) / stats['rows']:.0%} trùng lặp), "
+                        f"{stats['scraped']} ASIN cần trình duyệt")
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+        # Prefetch đã xong: đóng session HTTP dùng chung của lần chạy
+        close_http_fetcher()
+        get_selector_stats().save()
+
+
+def scrape_files(file_jobs, create_worker, size=None, logger=None, prefetch=None, checkpoint=None):
+    """Như iter_file_results nhưng chờ xong hết, trả về danh sách kết quả song song với file_jobs"""
+    results = [[] for _ in file_jobs]
+    for file_index, _, result in iter_file_results(file_jobs, create_worker, size, logger, prefetch, checkpoint):
+        results[file_index].append(result)
+    return results